@@ -4,17 +4,49 @@ Sistema SAT - Interfaz Web (Flask)
 Versión limpia, sin duplicados, lista para producción.
 """
 
-from flask import Flask, render_template, request, jsonify, flash, redirect, send_file
-from config import DB_CONFIG
+from functools import wraps
+import hmac
+from flask import (
+    Flask, render_template, stream_template, request, jsonify, flash, redirect, send_file,
+    session, make_response, g, has_request_context
+)
+from config import (
+    TABLAS_CONSULTA, ADMIN_TOKEN, TRABAJOS_CONFIG, CACHE_HTTP_CONFIG, SCREENING_CONFIG, SNAPSHOT_CONFIG,
+    METRICAS_CONFIG
+)
+from screening import consultar_rfcs, consultar_indice, resultados_por_linea, detalle_rfcs
+from db import obtener_conexion, estadisticas_pool, PoolAgotado
+from normalizacion import normalizar_rfc
+from consultas import (
+    buscar_por_rfc, buscar_por_nombre, pagina_tabla, contar_tabla,
+    columnas_tabla, situaciones_tabla, texto_legal_tabla, MAX_PAGINA_OFFSET
+)
+from cache_datos import obtener_version, en_cache, estampa_datos
+from exportacion import generar_csv
+from ingesta import procesar_carga, procesar_restauracion
+from backups import listar_backups, espacio_backups, limpiar_backups
+from snapshot import abrir_snapshot
+from trabajos import crear_trabajo, obtener_trabajo, ruta_resultado, eventos_trabajo
+from metricas import (
+    iniciar_contexto, terminar_contexto, observar, guardar, combinar_procesos, fijar_en, exposicion
+)
+from perfilado import (
+    ajustes, cambiar_ajustes, consultas_lentas, iniciar_perfil, terminar_perfil, listar_perfiles, ruta_perfil
+)
+from resumen import (
+    leer_resumen, refrescar_resumen, calcular_resumen, procesados_hoy,
+    leer_estadisticas, refrescar_estadisticas, calcular_estadisticas
+)
 import mysql.connector
-from datetime import datetime
-import pandas as pd
+from datetime import datetime, date, time, timezone
+from time import perf_counter
 import os
 import io
 import csv
+import itertools
 import traceback
 import json
-import dateutil.parser
+from urllib.parse import urlencode
 from werkzeug.utils import secure_filename
 
 # ---------------------------------------------------------
@@ -40,36 +72,227 @@ def allowed_file(filename):
 
 def get_db_connection():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
-    except mysql.connector.Error as e:
+        return obtener_conexion()
+    except (mysql.connector.Error, PoolAgotado) as e:
         print(f"Error de base de datos: {e}")
         return None
 
 
+def conexion_lectura():
+    """
+    Conexión para búsquedas, API y screening. Con SNAPSHOT_CONFIG['backend']
+    = 'snapshot' se lee del snapshot SQLite; con 'respaldo' se usa el
+    snapshot cuando MySQL no responde. El origen queda en X-Origen-Datos.
+    """
+    if SNAPSHOT_CONFIG['backend'] == 'snapshot':
+        conn = abrir_snapshot()
+        if conn:
+            return marcar_origen(conn)
+
+    conn = get_db_connection()
+    if conn is None and SNAPSHOT_CONFIG['respaldo']:
+        conn = abrir_snapshot()
+        if conn:
+            print(f"⚠️ MySQL no disponible; leyendo del snapshot {conn.version}")
+            return marcar_origen(conn)
+    return conn
+
+
+def marcar_origen(conn):
+    # Los trabajos en segundo plano no tienen petición a la cual marcar
+    if has_request_context():
+        g.origen_datos = f"snapshot {conn.version}"
+    return conn
+
+
+@app.after_request
+def origen_datos(respuesta):
+    if 'origen_datos' in g:
+        respuesta.headers['X-Origen-Datos'] = g.origen_datos
+    return respuesta
+
+
+@app.before_request
+def iniciar_metricas():
+    g.inicio_peticion = perf_counter()
+    iniciar_contexto(request.url_rule.rule if request.url_rule else 'sin_ruta')
+
+
+@app.after_request
+def registrar_metricas(respuesta):
+    """La duración y las consultas se registran al cerrar la respuesta (incluye el streaming)"""
+    if 'inicio_peticion' not in g:
+        return respuesta
+    inicio = g.inicio_peticion
+    etiquetas = {
+        'ruta': request.url_rule.rule if request.url_rule else 'sin_ruta',
+        'metodo': request.method,
+        'estado': respuesta.status_code
+    }
+
+    def cerrar():
+        terminar_contexto()
+        observar('sat_peticiones_duracion_segundos', perf_counter() - inicio, **etiquetas)
+        guardar()
+
+    respuesta.call_on_close(cerrar)
+    return respuesta
+
+
+@app.before_request
+def iniciar_perfilado():
+    """Perfil cProfile de la petición con ?perfilar=1 o X-Perfilar (solo administración, token en X-Admin-Token)"""
+    if not (request.args.get('perfilar') or request.headers.get('X-Perfilar')) or not es_admin():
+        return
+    perfil = iniciar_perfil(request.url_rule.rule if request.url_rule else request.path)
+    if perfil:
+        g.perfil, g.nombre_perfil = perfil
+        g.inicio_perfil = perf_counter()
+
+
+@app.after_request
+def registrar_perfil(respuesta):
+    """El perfil se cierra con la respuesta para incluir las plantillas en streaming"""
+    if 'perfil' not in g:
+        return respuesta
+    perfil, nombre, inicio = g.perfil, g.nombre_perfil, g.inicio_perfil
+    descripcion = f"{request.method} {request.full_path.rstrip('?')} → {respuesta.status_code}"
+    respuesta.headers['X-Perfil'] = nombre
+    respuesta.call_on_close(lambda: terminar_perfil(perfil, nombre, descripcion, perf_counter() - inicio))
+    return respuesta
+
+
+def es_admin():
+    """
+    Token de administración en el encabezado X-Admin-Token o en el campo
+    'token' de un formulario POST; nunca en la URL (quedaría en los logs de
+    acceso, el historial y el Referer)
+    """
+    token = request.headers.get('X-Admin-Token') or request.form.get('token', '')
+    return bool(ADMIN_TOKEN) and hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode())
+
+
+def requiere_admin(vista):
+    """Acciones administrativas: token en el encabezado X-Admin-Token o en el formulario (POST)"""
+    @wraps(vista)
+    def envoltura(*args, **kwargs):
+        if not es_admin():
+            return "No autorizado", 403
+        return vista(*args, **kwargs)
+    return envoltura
+
+
+def cache_http(max_age=0, pagina=False):
+    """
+    ETag y Last-Modified a partir de la versión de los datos; si el cliente ya
+    tiene esa versión responde 304 sin ejecutar la vista. Las páginas HTML
+    incluyen el día (muestran la fecha) y no se revalidan con mensajes flash
+    pendientes.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(*args, **kwargs):
+            estampa = estampa_datos() if CACHE_HTTP_CONFIG['habilitado'] else None
+            if estampa is None or (pagina and session.get('_flashes')):
+                return vista(*args, **kwargs)
+
+            version, actualizado = estampa
+            etag = f"v{version}"
+            modificado = actualizado
+            if pagina:
+                hoy = date.today()
+                etag += f"-{hoy:%Y%m%d}"
+                modificado = max(actualizado, datetime.combine(hoy, time.min))
+            modificado = modificado.astimezone(timezone.utc).replace(microsecond=0)
+
+            if request.if_none_match:
+                no_modificado = request.if_none_match.contains(etag)
+            else:
+                no_modificado = bool(request.if_modified_since and request.if_modified_since >= modificado)
+
+            respuesta = app.response_class(status=304) if no_modificado else make_response(vista(*args, **kwargs))
+            if respuesta.status_code not in (200, 304):
+                return respuesta
+
+            respuesta.set_etag(etag)
+            respuesta.last_modified = modificado
+            respuesta.cache_control.public = True
+            if max_age:
+                respuesta.cache_control.max_age = max_age
+            else:
+                respuesta.cache_control.no_cache = True
+            return respuesta
+        return envoltura
+    return decorador
+
+
 @app.context_processor
 def inject_now():
     return {'now': datetime.now(), 'app_name': 'Sistema SAT'}
 
 
 def buscar_rfc_en_tablas(rfc, cursor):
-    tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
-    encontradas = []
+    try:
+        return consultar_rfcs(cursor, [rfc]).get(rfc.strip().upper(), [])
+    except:
+        return []
+
+
+def fecha_parametro(nombre):
+    """Lee un parámetro AAAA-MM-DD de la URL; None si falta o es inválido"""
+    valor = request.args.get(nombre, '').strip()
+    try:
+        return datetime.strptime(valor, '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def leer_rfcs_archivo(archivo):
+    contenido = archivo.read().decode('latin1').splitlines()
+    return [line.strip().upper() for line in contenido if line.strip()]
+
+
+def resolver_rfcs(rfcs):
+    """Usa el índice mmap si está disponible; si no, consulta MySQL por conjuntos"""
+    encontradas = consultar_indice(rfcs)
+    if encontradas is not None:
+        return encontradas
+
+    conn = conexion_lectura()
+    if not conn:
+        raise RuntimeError("Error de conexión a la base de datos")
+
+    cursor = conn.cursor(dictionary=True)
+    try:
+        return consultar_rfcs(cursor, rfcs)
+    finally:
+        cursor.close()
+        conn.close()
 
-    for tabla in tablas:
-        try:
-            cursor.execute(f"SELECT COUNT(*) AS count FROM {tabla} WHERE UPPER(rfc) = %s", (rfc.upper(),))
-            if cursor.fetchone()['count'] > 0:
-                encontradas.append(tabla)
-        except:
-            pass
 
-    return encontradas
+def prefiere_json():
+    return (
+        request.args.get('formato') == 'json'
+        or request.accept_mimetypes.best_match(['text/html', 'application/json']) == 'application/json'
+    )
+
+
+def respuesta_trabajo(id_trabajo):
+    """Clientes de API reciben el id (202); el navegador va a la página de progreso"""
+    if prefiere_json():
+        return jsonify({
+            'id': id_trabajo,
+            'estado': f'/jobs/{id_trabajo}',
+            'eventos': f'/jobs/{id_trabajo}/eventos'
+        }), 202
+    return redirect(f'/jobs/{id_trabajo}')
 
 # ---------------------------------------------------------
 # DASHBOARD PRINCIPAL
 # ---------------------------------------------------------
 
 @app.route("/")
+@cache_http(CACHE_HTTP_CONFIG['max_age_paginas'], pagina=True)
 def index():
     conn = get_db_connection()
     if not conn:
@@ -78,68 +301,39 @@ def index():
     cursor = conn.cursor(dictionary=True)
 
     try:
-        tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
+        # Resumen precalculado en cada carga; si aún no existe se genera una vez
+        resumen = leer_resumen(cursor)
+        if resumen is None:
+            resumen = refrescar_resumen(cursor) or calcular_resumen(cursor)
+            conn.commit()
 
-        registros_por_tabla = {}
-        for tabla in tablas:
-            cursor.execute(f"SELECT COUNT(*) AS count FROM {tabla}")
-            registros_por_tabla[tabla] = cursor.fetchone()['count']
+        registros_por_tabla = resumen["registros_por_tabla"]
 
         tablas_json = {
             "labels": list(registros_por_tabla.keys()),
             "values": list(registros_por_tabla.values())
         }
 
-        cursor.execute("""
-            SELECT DATE(fecha) AS dia, COUNT(*) AS total
-            FROM Historial_Cargas
-            GROUP BY DATE(fecha)
-            ORDER BY dia DESC
-            LIMIT 7
-        """)
-        cargas = cursor.fetchall()
-
+        cargas = resumen["cargas_por_dia"]
         cargas_dias_json = {
-            "labels": [str(c["dia"]) for c in cargas][::-1],
+            "labels": [c["dia"] for c in cargas][::-1],
             "values": [c["total"] for c in cargas][::-1]
         }
 
-        cursor.execute("""
-            SELECT situacion_contribuyente AS situacion, COUNT(*) AS total
-            FROM Listado_Completo_69_B
-            GROUP BY situacion_contribuyente
-            ORDER BY total DESC
-        """)
-        situaciones = cursor.fetchall()
-
         estados_json = {
-            "labels": [s["situacion"] for s in situaciones],
-            "values": [s["total"] for s in situaciones]
+            "labels": [s["situacion"] for s in resumen["situaciones"]],
+            "values": [s["total"] for s in resumen["situaciones"]]
         }
 
-        total_registros = sum(registros_por_tabla.values())
-        total_tablas = len(tablas)
-
-        cursor.execute("SELECT fecha FROM Historial_Cargas ORDER BY fecha DESC LIMIT 1")
-        ultima = cursor.fetchone()
-        ultima_carga = ultima["fecha"] if ultima else "N/A"
-
-        cursor.execute("""
-            SELECT COUNT(*) AS total
-            FROM Historial_Cargas
-            WHERE DATE(fecha) = CURDATE()
-        """)
-        procesados_hoy = cursor.fetchone()["total"]
-
         cursor.close()
         conn.close()
 
         return render_template(
             "index.html",
-            total_registros=total_registros,
-            total_tablas=total_tablas,
-            ultima_carga=ultima_carga,
-            procesados_hoy=procesados_hoy,
+            total_registros=sum(registros_por_tabla.values()),
+            total_tablas=len(registros_por_tabla),
+            ultima_carga=resumen["ultima_carga"],
+            procesados_hoy=procesados_hoy(resumen),
             tablas_json=json.dumps(tablas_json),
             cargas_dias_json=json.dumps(cargas_dias_json),
             estados_json=json.dumps(estados_json)
@@ -161,93 +355,248 @@ def search():
     search_type = request.args.get('type', 'rfc')
 
     if not query:
-        return render_template('search.html', results=[], query='', search_type=search_type)
+        return render_template('search.html', results=[], hay_resultados=False, query='', search_type=search_type, page=1, hay_siguiente=False)
 
     query = query.upper()
 
-    conn = get_db_connection()
+    conn = conexion_lectura()
     if not conn:
         return "Error de conexión a la base de datos", 500
 
     cursor = conn.cursor(dictionary=True)
 
-    try:
-        results = []
-        tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = 50
+    hay_siguiente = False
 
+    try:
         if search_type == 'rfc':
-            for tabla in tablas:
-                cursor.execute(f"""
-                    SELECT *, '{tabla}' AS tabla_origen
-                    FROM {tabla}
-                    WHERE UPPER(rfc) = %s
-                    ORDER BY numero
-                """, (query,))
-                results.extend(cursor.fetchall())
+            filas = buscar_por_rfc(cursor, normalizar_rfc(query))
         else:
-            for tabla in tablas:
-                cursor.execute(f"""
-                    SELECT *, '{tabla}' AS tabla_origen
-                    FROM {tabla}
-                    WHERE UPPER(nombre_contribuyente) LIKE %s
-                    ORDER BY numero
-                    LIMIT 100
-                """, (f"%{query}%",))
-                results.extend(cursor.fetchall())
-
-        cursor.close()
-        conn.close()
-
-        return render_template(
-            'search.html',
-            results=results,
-            query=query,
-            search_type=search_type,
-            results_count=len(results)
-        )
+            pagina = list(buscar_por_nombre(cursor, query, page, per_page))
+            hay_siguiente = len(pagina) > per_page
+            filas = iter(pagina[:per_page])
+        primera = next(filas, None)
 
     except Exception as e:
         cursor.close()
         conn.close()
         return f"Error: {e}", 500
 
+    def generar():
+        try:
+            if primera is not None:
+                yield primera
+                yield from filas
+        finally:
+            cursor.close()
+            conn.close()
+
+    return stream_template(
+        'search.html',
+        results=generar(),
+        hay_resultados=primera is not None,
+        query=query,
+        search_type=search_type,
+        page=page,
+        hay_siguiente=hay_siguiente
+    )
+
 
 # ---------------------------------------------------------
 # API RFC
 # ---------------------------------------------------------
 
 @app.route('/api/contribuyente/<rfc>')
+@cache_http(CACHE_HTTP_CONFIG['max_age_api'])
 def api_contribuyente(rfc):
-    conn = get_db_connection()
+    tablas = TABLAS_CONSULTA
+
+    # Con el índice mmap solo se consultan las tablas donde aparece el RFC
+    encontradas = consultar_indice([rfc])
+    if encontradas is not None:
+        tablas = encontradas.get(rfc.strip().upper(), [])
+        if not tablas:
+            return jsonify([])
+
+    conn = conexion_lectura()
     if not conn:
         return jsonify({'error': 'Error de conexión a la base de datos'}), 500
 
     cursor = conn.cursor(dictionary=True)
-    tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
-    results = []
 
     try:
-        for tabla in tablas:
-            cursor.execute(f"SELECT * FROM {tabla} WHERE UPPER(rfc) = %s", (rfc.upper(),))
-            for row in cursor.fetchall():
-                row['tabla_origen'] = tabla
-                results.append(row)
-
-        cursor.close()
-        conn.close()
-        return jsonify(results)
+        filas = buscar_por_rfc(cursor, normalizar_rfc(rfc), tablas)
+        primera = next(filas, None)
 
     except Exception as e:
         cursor.close()
         conn.close()
         return jsonify({'error': str(e)}), 500
 
+    def generar():
+        try:
+            yield "["
+            if primera is not None:
+                yield app.json.dumps(primera)
+                for fila in filas:
+                    yield "," + app.json.dumps(fila)
+            yield "]"
+        finally:
+            cursor.close()
+            conn.close()
+
+    return app.response_class(generar(), mimetype='application/json')
+
+
+def rfcs_de_peticion():
+    """
+    RFCs del cuerpo: JSON (lista o {"rfcs": [...]}) o texto plano, uno por
+    línea. Se recorren en orden y sin copiarlos a otra lista.
+    """
+    if request.is_json:
+        datos = request.get_json(silent=True)
+        if isinstance(datos, dict):
+            datos = datos.get('rfcs')
+        if not isinstance(datos, list):
+            raise ValueError('Se esperaba una lista de RFCs o {"rfcs": [...]}')
+        return (str(rfc) for rfc in datos if rfc is not None), len(datos)
+
+    cuerpo = request.get_data()
+    try:
+        texto = cuerpo.decode('utf-8')
+    except UnicodeDecodeError:
+        texto = cuerpo.decode('latin1')
+    return io.StringIO(texto), texto.count('\n') + 1
+
+
+@app.route('/api/contribuyentes', methods=['POST'])
+def api_contribuyentes():
+    """
+    Consulta por lotes para integraciones: una línea NDJSON por RFC recibido
+    (mismo orden, incluidas repeticiones) con las listas donde aparece y sus
+    fechas de publicación. Cada bloque se responde en cuanto se resuelve.
+    """
+    try:
+        rfcs, cantidad = rfcs_de_peticion()
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if cantidad > SCREENING_CONFIG['max_rfcs_api']:
+        return jsonify({'error': f"Máximo {SCREENING_CONFIG['max_rfcs_api']} RFCs por petición"}), 413
+
+    conn = conexion_lectura()
+    if not conn:
+        return jsonify({'error': 'Error de conexión a la base de datos'}), 500
+
+    cursor = conn.cursor(dictionary=True)
+    normalizados = (normalizar_rfc(rfc) for rfc in rfcs)
+    normalizados = (rfc for rfc in normalizados if rfc)
+
+    def generar():
+        try:
+            for bloque in iter(lambda: list(itertools.islice(normalizados, SCREENING_CONFIG['bloque_api'])), []):
+                filas = detalle_rfcs(cursor, bloque)
+                lineas = []
+                for rfc in bloque:
+                    listas = filas.get(rfc, [])
+                    lineas.append(app.json.dumps({
+                        'rfc': rfc,
+                        'encontrado': bool(listas),
+                        'listas': listas
+                    }))
+                yield "\n".join(lineas) + "\n"
+        except Exception as e:
+            traceback.print_exc()
+            yield app.json.dumps({'error': str(e)}) + "\n"
+        finally:
+            cursor.close()
+            conn.close()
+
+    return app.response_class(
+        generar(),
+        mimetype='application/x-ndjson',
+        headers={'X-Accel-Buffering': 'no'}
+    )
+
+
+@app.route('/api/db_pool')
+@requiere_admin
+def api_db_pool():
+    return jsonify(estadisticas_pool())
+
+
+@app.route('/metrics')
+def metrics():
+    """Métricas de todos los workers en formato de texto de Prometheus"""
+    if not METRICAS_CONFIG['habilitado']:
+        return "Métricas deshabilitadas", 404
+
+    guardar(forzar=True)
+    series = combinar_procesos()
+
+    conn = get_db_connection()
+    if conn:
+        cursor = conn.cursor(dictionary=True)
+        try:
+            resumen = leer_resumen(cursor) or {}
+        finally:
+            cursor.close()
+            conn.close()
+        for tabla, total in resumen.get('registros_por_tabla', {}).items():
+            fijar_en(series, 'sat_tabla_registros', total, tabla=tabla)
+
+    return app.response_class(exposicion(series), mimetype='text/plain; version=0.0.4')
+
+
+# ---------------------------------------------------------
+# DIAGNÓSTICO DE RENDIMIENTO (consultas lentas y perfiles)
+# ---------------------------------------------------------
+
+@app.route('/diagnostico')
+@requiere_admin
+def diagnostico():
+    limite = min(request.args.get('limite', 50, type=int), 1000)
+    return jsonify({
+        'ajustes': ajustes(),
+        'consultas_lentas': consultas_lentas(limite),
+        'perfiles': listar_perfiles()
+    })
+
+
+@app.route('/diagnostico/ajustes', methods=['POST'])
+@requiere_admin
+def diagnostico_ajustes():
+    """Cambia los ajustes en todos los workers sin reiniciar (JSON o formulario)"""
+    cambios = request.get_json(silent=True)
+    if cambios is None:
+        cambios = {k: v for k, v in request.form.items() if k != 'token'}
+    if not isinstance(cambios, dict):
+        return jsonify({'error': 'Se esperaba un objeto JSON'}), 400
+    try:
+        return jsonify(cambiar_ajustes(cambios))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+
+@app.route('/diagnostico/perfiles/<nombre>')
+@requiere_admin
+def diagnostico_perfil(nombre):
+    """Resumen en texto (por defecto) o el .prof con ?formato=prof"""
+    formato = request.args.get('formato', 'txt')
+    ruta = ruta_perfil(nombre, formato)
+    if not ruta:
+        return "Perfil no encontrado", 404
+    if formato == 'prof':
+        return send_file(ruta, mimetype='application/octet-stream', as_attachment=True, download_name=f"{nombre}.prof")
+    return send_file(ruta, mimetype='text/plain; charset=utf-8')
+
 
 # ---------------------------------------------------------
 # ESTADÍSTICAS DETALLADAS
 # ---------------------------------------------------------
 
 @app.route('/estadisticas')
+@cache_http(CACHE_HTTP_CONFIG['max_age_paginas'], pagina=True)
 def estadisticas():
     conn = get_db_connection()
     if not conn:
@@ -256,68 +605,28 @@ def estadisticas():
     cursor = conn.cursor(dictionary=True)
 
     try:
-        tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
-
-        try:
-            cursor.execute("SELECT tabla, linea1, linea2 FROM Texto_Legal_Tablas")
-            textos_legales = cursor.fetchall()
-        except:
-            textos_legales = []
-
-        stats = {}
-        for tabla in tablas:
-            cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla}")
-            stats[tabla] = cursor.fetchone()['total']
-
-        duplicates = {}
-        for tabla in tablas:
-            cursor.execute(f"""
-                SELECT COUNT(*) AS duplicate_count
-                FROM (
-                    SELECT rfc, COUNT(*) AS count
-                    FROM {tabla}
-                    WHERE rfc IS NOT NULL
-                    GROUP BY rfc
-                    HAVING COUNT(*) > 1
-                ) AS dups
-            """)
-            duplicates[tabla] = cursor.fetchone()['duplicate_count']
-
-        cursor.execute("""
-            SELECT situacion_contribuyente, COUNT(*) AS count
-            FROM Listado_Completo_69_B
-            GROUP BY situacion_contribuyente
-            ORDER BY count DESC
-        """)
-        situaciones = cursor.fetchall()
-
-        cursor.execute("""
-            SELECT 
-                table_name,
-                MAX(fecha_actualizacion) AS ultima_actualizacion,
-                COUNT(*) AS total_registros
-            FROM (
-                SELECT 'Definitivos' AS table_name, fecha_actualizacion FROM Definitivos
-                UNION ALL SELECT 'Desvirtuados', fecha_actualizacion FROM Desvirtuados
-                UNION ALL SELECT 'Presuntos', fecha_actualizacion FROM Presuntos
-                UNION ALL SELECT 'SentenciasFavorables', fecha_actualizacion FROM SentenciasFavorables
-                UNION ALL SELECT 'Listado_Completo_69_B', fecha_actualizacion FROM Listado_Completo_69_B
-            ) AS all_tables
-            GROUP BY table_name
-            ORDER BY table_name
-        """)
-        actualizaciones = cursor.fetchall()
+        # Estadísticas precalculadas en cada carga; si aún no existen se generan una vez
+        registro = leer_estadisticas(cursor)
+        if registro is None:
+            registro = refrescar_estadisticas(cursor) or {
+                'datos': calcular_estadisticas(cursor), 'version': None, 'actualizado': None
+            }
+            conn.commit()
 
         cursor.close()
         conn.close()
 
+        datos = registro['datos']
         return render_template(
             'estadisticas.html',
-            stats=stats,
-            duplicates=duplicates,
-            situaciones=situaciones,
-            actualizaciones=actualizaciones,
-            textos_legales=textos_legales
+            stats=datos['stats'],
+            duplicates=datos['duplicates'],
+            calidad=datos['calidad'],
+            situaciones=datos['situaciones'],
+            actualizaciones=datos['actualizaciones'],
+            textos_legales=datos['textos_legales'],
+            version_datos=registro['version'],
+            calculado=registro['actualizado']
         )
 
     except Exception as e:
@@ -326,6 +635,28 @@ def estadisticas():
         return f"Error: {e}", 500
 
 
+@app.route('/estadisticas/recalcular', methods=['POST'])
+@requiere_admin
+def recalcular_estadisticas():
+    conn = get_db_connection()
+    if not conn:
+        return "Error de conexión a la base de datos", 500
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        if refrescar_estadisticas(cursor):
+            conn.commit()
+            flash("✅ Estadísticas recalculadas", "success")
+        else:
+            flash("No se pudieron recalcular las estadísticas", "danger")
+    finally:
+        cursor.close()
+        conn.close()
+
+    return redirect('/estadisticas')
+
+
 # ---------------------------------------------------------
 # TABLAS
 # ---------------------------------------------------------
@@ -343,7 +674,20 @@ def tablas():
 
 
 @app.route('/tabla/<nombre_tabla>')
+@cache_http(CACHE_HTTP_CONFIG['max_age_paginas'], pagina=True)
 def ver_tabla(nombre_tabla):
+    tablas_validas = {
+        'definitivos': 'Definitivos',
+        'desvirtuados': 'Desvirtuados',
+        'presuntos': 'Presuntos',
+        'sentenciasfavorables': 'SentenciasFavorables',
+        'listado_completo_69_b': 'Listado_Completo_69_B'
+    }
+
+    tabla_real = tablas_validas.get(nombre_tabla.lower())
+    if not tabla_real:
+        return "Tabla no válida", 400
+
     conn = get_db_connection()
     if not conn:
         return "Error de conexión a la base de datos", 500
@@ -351,43 +695,45 @@ def ver_tabla(nombre_tabla):
     cursor = conn.cursor(dictionary=True)
 
     try:
-        tablas_validas = {
-            'definitivos': 'Definitivos',
-            'desvirtuados': 'Desvirtuados',
-            'presuntos': 'Presuntos',
-            'sentenciasfavorables': 'SentenciasFavorables',
-            'listado_completo_69_b': 'Listado_Completo_69_B'
+        per_page = 50
+        page = max(request.args.get('page', 1, type=int), 1)
+        despues = request.args.get('despues', type=int)
+        antes = request.args.get('antes', type=int)
+
+        filtros = {
+            'situacion': request.args.get('situacion') or None,
+            'desde': fecha_parametro('desde'),
+            'hasta': fecha_parametro('hasta')
         }
+        filtros_qs = urlencode({k: v for k, v in filtros.items() if v})
 
-        tabla_real = tablas_validas.get(nombre_tabla.lower())
-        if not tabla_real:
-            return "Tabla no válida", 400
+        if despues is None and antes is None and page > MAX_PAGINA_OFFSET:
+            cursor.close()
+            conn.close()
+            return redirect(f"{request.path}?{filtros_qs}")
+
+        # Conteos y metadatos se recalculan solo cuando cambia la versión de los datos
+        version = obtener_version(cursor)
+        columnas = en_cache(version, ('columnas', tabla_real),
+                            lambda: columnas_tabla(cursor, tabla_real))
+        situaciones = en_cache(version, ('situaciones', tabla_real),
+                               lambda: situaciones_tabla(cursor, tabla_real))
+        texto_legal = en_cache(version, ('texto_legal', tabla_real),
+                               lambda: texto_legal_tabla(cursor, tabla_real))
+
+        # Solo se guardan los conteos de valores conocidos (tabla completa o una situación
+        # de la lista); los filtros libres harían crecer la caché sin límite
+        if filtros['desde'] is None and filtros['hasta'] is None and filtros['situacion'] in [None, *situaciones]:
+            total = en_cache(version, ('total', tabla_real, filtros['situacion']),
+                             lambda: contar_tabla(cursor, tabla_real, **filtros))
+        else:
+            total = contar_tabla(cursor, tabla_real, **filtros)
 
-        page = request.args.get('page', 1, type=int)
-        per_page = 50
-        offset = (page - 1) * per_page
-
-        cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla_real}")
-        total = cursor.fetchone()['total']
-
-        cursor.execute(f"""
-            SELECT * FROM {tabla_real}
-            ORDER BY numero
-            LIMIT %s OFFSET %s
-        """, (per_page, offset))
-        registros = cursor.fetchall()
-
-        cursor.execute(f"DESCRIBE {tabla_real}")
-        columnas = [col['Field'] for col in cursor.fetchall()]
-
-        cursor.execute("""
-            SELECT linea1, linea2 
-            FROM Texto_Legal_Tablas 
-            WHERE tabla = %s 
-            ORDER BY id DESC 
-            LIMIT 1
-        """, (tabla_real,))
-        texto_legal = cursor.fetchone()
+        registros, hay_anterior, hay_siguiente = pagina_tabla(
+            cursor, tabla_real, per_page,
+            despues=despues, antes=antes, offset=(page - 1) * per_page,
+            **filtros
+        )
 
         total_pages = (total + per_page - 1) // per_page
 
@@ -411,7 +757,12 @@ def ver_tabla(nombre_tabla):
             page=page,
             total_pages=total_pages,
             total=total,
-            texto_legal=texto_legal
+            texto_legal=texto_legal,
+            hay_anterior=hay_anterior,
+            hay_siguiente=hay_siguiente,
+            filtros=filtros,
+            filtros_qs=filtros_qs,
+            situaciones=situaciones
         )
 
     except Exception as e:
@@ -426,54 +777,59 @@ def ver_tabla(nombre_tabla):
 
 @app.route('/exportar/<nombre_tabla>')
 def exportar_tabla(nombre_tabla):
+    tablas_validas = {
+        'definitivos': 'Definitivos',
+        'desvirtuados': 'Desvirtuados',
+        'presuntos': 'Presuntos',
+        'sentenciasfavorables': 'SentenciasFavorables',
+        'listado_completo_69_b': 'Listado_Completo_69_B'
+    }
+
+    tabla_real = tablas_validas.get(nombre_tabla.lower())
+    if tabla_real is None:
+        return "Tabla no válida", 400
+
     conn = get_db_connection()
     if not conn:
         return "Error de conexión a la base de datos", 500
 
-    cursor = conn.cursor(dictionary=True)
+    comprimir = request.args.get('gzip') == '1'
 
     try:
-        tablas_validas = {
-            'definitivos': 'Definitivos',
-            'desvirtuados': 'Desvirtuados',
-            'presuntos': 'Presuntos',
-            'sentenciasfavorables': 'SentenciasFavorables',
-            'listado_completo_69_b': 'Listado_Completo_69_B'
-        }
+        meta = conn.cursor(dictionary=True)
+        version = obtener_version(meta)
+        columnas = en_cache(version, ('columnas', tabla_real), lambda: columnas_tabla(meta, tabla_real))
+        meta.close()
 
-        tabla_real = tablas_validas.get(nombre_tabla.lower())
-        if tabla_real is None:
-            return "Tabla no válida", 400
-
-        cursor.execute(f"SELECT * FROM {tabla_real} ORDER BY numero")
-        registros = cursor.fetchall()
-
-        output = io.StringIO()
-        writer = csv.writer(output)
-
-        if registros:
-            writer.writerow(registros[0].keys())
-
-        for registro in registros:
-            writer.writerow(registro.values())
-
-        output.seek(0)
-
-        cursor.close()
-        conn.close()
-
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype="text/csv",
-            as_attachment=True,
-            download_name=f"{tabla_real}_{datetime.now().strftime('%Y%m%d')}.csv"
-        )
+        # Cursor sin buffer: las filas llegan del servidor conforme se leen
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(columnas)} FROM {tabla_real} ORDER BY numero")
 
     except Exception as e:
-        cursor.close()
         conn.close()
         return f"Error: {e}", 500
 
+    def generar():
+        completo = False
+        try:
+            yield from generar_csv(cursor, columnas, comprimir)
+            completo = True
+        finally:
+            if completo:
+                cursor.close()
+                conn.close()
+            else:
+                # Descarga interrumpida: quedan filas sin leer en el servidor
+                conn.descartar()
+
+    nombre = f"{tabla_real}_{datetime.now().strftime('%Y%m%d')}.csv" + ('.gz' if comprimir else '')
+
+    return app.response_class(
+        generar(),
+        mimetype='application/gzip' if comprimir else 'text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{nombre}"'}
+    )
+
 
 # ---------------------------------------------------------
 # CARGA CSV (VERSIÓN FINAL Y CORREGIDA)
@@ -482,16 +838,6 @@ def exportar_tabla(nombre_tabla):
 @app.route('/carga_csv', methods=['GET', 'POST'])
 def carga_csv():
 
-    def convertir_fecha(valor):
-        if not valor or str(valor).strip() == "" or str(valor).lower() in ["nan", "null", "-", "--", "—"]:
-            return None
-        try:
-            valor = str(valor).replace("\n", " ").strip()
-            fecha = dateutil.parser.parse(valor, dayfirst=True, fuzzy=True)
-            return fecha.strftime("%Y-%m-%d")
-        except Exception:
-            return None
-
     if request.method == 'POST':
 
         # Validación inicial del archivo
@@ -524,221 +870,103 @@ def carga_csv():
             flash('Tabla destino no válida', 'danger')
             return redirect(request.url)
 
-        conn = None
-        cursor = None
-
-        try:
-            # Leer CSV (encabezados en línea 3)
-            df = pd.read_csv(archivo, header=2)
-
-            if df.empty:
-                flash('El archivo CSV está vacío', 'danger')
-                return redirect(request.url)
-
-            # Mapeos por tabla
-            mapeo_definitivos = {
-                "No.": "numero",
-                "RFC": "rfc",
-                "Nombre del Contribuyente": "nombre_contribuyente",
-                "Situación del contribuyente": "situacion_contribuyente",
-                "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
-                "Publicación página SAT presuntos": "publicacion_sat_presuntos",
-                "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
-                "Publicación DOF presuntos": "publicacion_dof_presuntos",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
-                "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
-                "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados",
-                "Número y fecha de oficio global de definitivos SAT": "oficio_definitivo_sat",
-                "Publicación página SAT definitivos": "publicacion_sat_definitivos",
-                "Número y fecha de oficio global de definitivos DOF": "oficio_definitivo_dof",
-                "Publicación DOF definitivos": "publicacion_dof_definitivos",
-                "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
-                "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
-                "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
-                "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
-            }
-
-            mapeo_presuntos = {
-                "No.": "numero",
-                "RFC": "rfc",
-                "Nombre del Contribuyente": "nombre_contribuyente",
-                "Situación del contribuyente": "situacion_contribuyente",
-                "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
-                "Publicación página SAT presuntos": "publicacion_sat_presuntos",
-                "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
-                "Publicación DOF presuntos": "publicacion_dof_presuntos"
-            }
-
-            mapeo_desvirtuados = {
-                "No.": "numero",
-                "RFC": "rfc",
-                "Nombre del Contribuyente": "nombre_contribuyente",
-                "Situación del contribuyente": "situacion_contribuyente",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
-                "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
-                "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados"
-            }
-
-            mapeo_sentencias = {
-                "No.": "numero",
-                "RFC": "rfc",
-                "Nombre del Contribuyente": "nombre_contribuyente",
-                "Situación del contribuyente": "situacion_contribuyente",
-                "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
-                "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
-                "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
-                "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
-            }
-
-            mapeo_listado_completo = {
-                "No.": "numero",
-                "RFC": "rfc",
-                "Nombre del Contribuyente": "nombre_contribuyente",
-                "Situación del contribuyente": "situacion_contribuyente",
-                "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
-                "Publicación página SAT presuntos": "publicacion_sat_presuntos",
-                "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
-                "Publicación DOF presuntos": "publicacion_dof_presuntos",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
-                "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
-                "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
-                "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados",
-                "Número y fecha de oficio global de definitivos SAT": "oficio_definitivo_sat",
-                "Publicación página SAT definitivos": "publicacion_sat_definitivos",
-                "Número y fecha de oficio global de definitivos DOF": "oficio_definitivo_dof",
-                "Publicación DOF definitivos": "publicacion_dof_definitivos",
-                "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
-                "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
-                "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
-                "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
-            }
-
-            mapeos = {
-                "Definitivos": mapeo_definitivos,
-                "Presuntos": mapeo_presuntos,
-                "Desvirtuados": mapeo_desvirtuados,
-                "SentenciasFavorables": mapeo_sentencias,
-                "Listado_Completo_69_B": mapeo_listado_completo
-            }
-
-            # Renombrar columnas según tabla
-            df.rename(columns=mapeos.get(tabla_real, {}), inplace=True)
-
-            # Conversión automática de fechas
-            columnas_fecha = [
-                "publicacion_sat_presuntos",
-                "publicacion_dof_presuntos",
-                "publicacion_sat_desvirtuados",
-                "publicacion_dof_desvirtuados",
-                "publicacion_sat_definitivos",
-                "publicacion_dof_definitivos",
-                "publicacion_sat_sentencia",
-                "publicacion_dof_sentencia",
-                "fecha_actualizacion"
-            ]
-
-            for col in columnas_fecha:
-                if col in df.columns:
-                    df[col] = df[col].apply(convertir_fecha)
-
-            # Conexión segura
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            # Leer texto legal (líneas 1 y 2)
-            archivo.stream.seek(0)
-            lineas = archivo.stream.read().decode('latin1').splitlines()
-            linea1 = lineas[0] if len(lineas) > 0 else ""
-            linea2 = lineas[1] if len(lineas) > 1 else ""
-
-            cursor.execute("DELETE FROM Texto_Legal_Tablas WHERE tabla = %s", (tabla_real,))
-            cursor.execute("""
-                INSERT INTO Texto_Legal_Tablas (tabla, linea1, linea2)
-                VALUES (%s, %s, %s)
-            """, (tabla_real, linea1, linea2))
-            conn.commit()
-
-            # Validar columnas ANTES de borrar nada
-            cursor.execute(f"DESCRIBE {tabla_real}")
-            columnas_tabla = [col['Field'] for col in cursor.fetchall()]
-
-            columnas_validas = [c for c in df.columns if c in columnas_tabla]
-
-            if not columnas_validas:
-                flash('El CSV no contiene columnas válidas para esta tabla. No se realizaron cambios.', 'danger')
-                return redirect(request.url)
-
-            # Crear backup
-            fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
-            tabla_backup = f"{tabla_real}_backup_{fecha}"
-
-            cursor.execute(f"CREATE TABLE {tabla_backup} AS SELECT * FROM {tabla_real}")
-            conn.commit()
+        incremental = request.form.get('incremental') in ('1', 'on', 'true')
+        id_trabajo = crear_trabajo(
+            'carga_csv', procesar_carga, archivo.filename, tabla_real, incremental, entrada=archivo
+        )
+        return respuesta_trabajo(id_trabajo)
 
-            flash(f"✅ Backup creado correctamente: <strong>{tabla_backup}</strong>", "info")
+    return render_template('carga_csv.html')
 
-            # Vaciar tabla original
-            cursor.execute(f"TRUNCATE TABLE {tabla_real}")
-            conn.commit()
 
-            # Insertar datos nuevos
-            df = df[columnas_validas]
-            df = df.where(pd.notnull(df), None)
+# ---------------------------------------------------------
+# CARGA MASIVA (VISTA DASHBOARD)
+# ---------------------------------------------------------
 
-            placeholders = ", ".join(["%s"] * len(columnas_validas))
-            columnas_sql = ", ".join(columnas_validas)
-            query = f"INSERT INTO {tabla_real} ({columnas_sql}) VALUES ({placeholders})"
+def procesar_screening(trabajo, ruta):
+    """Trabajo en segundo plano: consulta los RFCs del TXT por bloques y escribe el CSV de resultado"""
+    with open(ruta, 'rb') as archivo:
+        rfcs = leer_rfcs_archivo(archivo)
 
-            registros = df.values.tolist()
-            cursor.executemany(query, registros)
-            conn.commit()
+    trabajo.avanzar(rfcs_total=len(rfcs), rfcs_revisados=0, forzar=True)
 
-            total = cursor.rowcount
+    encontradas = {}
+    unicos = list(dict.fromkeys(rfcs))
+    bloque = TRABAJOS_CONFIG['bloque_screening']
+    for inicio in range(0, len(unicos), bloque):
+        encontradas.update(resolver_rfcs(unicos[inicio:inicio + bloque]))
+        trabajo.avanzar(rfcs_revisados=min(inicio + bloque, len(unicos)))
 
-            # Registrar en historial
-            cursor.execute("""
-                INSERT INTO Historial_Cargas (nombre_archivo, tabla, registros)
-                VALUES (%s, %s, %s)
-            """, (archivo.filename, tabla_real, total))
-            conn.commit()
+    encontrados = 0
+    destino = trabajo.ruta('resultado.csv')
+    with open(destino, 'w', newline='', encoding='utf-8') as salida:
+        writer = csv.writer(salida)
+        writer.writerow(['RFC', 'Encontrado', 'Tablas'])
+        for r in resultados_por_linea(rfcs, encontradas):
+            encontrados += r['encontrado']
+            writer.writerow([r['rfc'], 'SI' if r['encontrado'] else 'NO', ", ".join(r['tablas'])])
 
-            flash(
-                f"✅ Tabla {tabla_real} reemplazada correctamente<br>"
-                f"✅ Registros cargados: {total}",
-                "success"
-            )
-            return redirect(request.url)
+    trabajo.avanzar(encontrados=encontrados, no_encontrados=len(rfcs) - encontrados)
+    return {
+        'ruta': destino,
+        'nombre': f"resultado_carga_masiva_{datetime.now().strftime('%Y%m%d')}.csv"
+    }
 
-        except Exception as e:
-            traceback.print_exc()
-            flash(f"Error procesando el archivo: {str(e)}", "danger")
-            return redirect(request.url)
 
-        finally:
-            try:
-                if cursor:
-                    cursor.close()
-                if conn:
-                    conn.close()
-            except:
-                pass
+FILTROS_SCREENING = {'todos': None, 'encontrados': True, 'no_encontrados': False}
 
-    return render_template('carga_csv.html')
 
+def pagina_resultado_screening(id_trabajo, pagina, por_pagina, filtro='todos'):
+    """
+    (filas, hay_siguiente) de una página del CSV de resultado, o None si el
+    trabajo no tiene resultado. El CSV se lee en streaming: la memoria depende
+    del tamaño de la página, no del número de RFCs.
+    """
+    ruta, _ = ruta_resultado(id_trabajo)
+    if not ruta:
+        return None
+    buscado = FILTROS_SCREENING[filtro]
+    with open(ruta, newline='', encoding='utf-8') as archivo:
+        filas = (
+            {
+                'rfc': fila['RFC'],
+                'encontrado': fila['Encontrado'] == 'SI',
+                'tablas': fila['Tablas'].split(', ') if fila['Tablas'] else []
+            }
+            for fila in csv.DictReader(archivo)
+        )
+        if buscado is not None:
+            filas = (r for r in filas if r['encontrado'] == buscado)
+        inicio = (pagina - 1) * por_pagina
+        filas = list(itertools.islice(filas, inicio, inicio + por_pagina + 1))
+    return filas[:por_pagina], len(filas) > por_pagina
+
+
+def resumen_screening(trabajo):
+    """Totales del trabajo (se guardan en su progreso al terminar)"""
+    progreso = trabajo['progreso']
+    total = progreso.get('rfcs_total', 0)
+    encontrados = progreso.get('encontrados', 0)
+    return {
+        'todos': total,
+        'encontrados': encontrados,
+        'no_encontrados': progreso.get('no_encontrados', total - encontrados)
+    }
+
+
+def parametros_pagina_screening():
+    """(pagina, por_pagina, filtro) de la petición, dentro de los límites"""
+    pagina = max(request.args.get('pagina', 1, type=int), 1)
+    por_pagina = request.args.get('por_pagina', SCREENING_CONFIG['resultados_por_pagina'], type=int)
+    por_pagina = min(max(por_pagina, 1), SCREENING_CONFIG['max_por_pagina'])
+    filtro = request.args.get('filtro', 'todos')
+    if filtro not in FILTROS_SCREENING:
+        filtro = 'todos'
+    return pagina, por_pagina, filtro
 
-# ---------------------------------------------------------
-# CARGA MASIVA (VISTA DASHBOARD)
-# ---------------------------------------------------------
 
 @app.route('/carga_masiva', methods=['GET', 'POST'])
 def carga_masiva():
-    resultados = []
-    total_rfcs = 0
-    encontrados = 0
-    no_encontrados = 0
-
     if request.method == 'POST':
         archivo = request.files.get('archivo')
 
@@ -746,51 +974,34 @@ def carga_masiva():
             flash('No seleccionaste ningún archivo TXT', 'danger')
             return redirect('/carga_masiva')
 
-        try:
-            contenido = archivo.read().decode('latin1').splitlines()
-            rfcs = [line.strip().upper() for line in contenido if line.strip()]
-            total_rfcs = len(rfcs)
-
-            conn = get_db_connection()
-            cursor = conn.cursor(dictionary=True)
-
-            tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
-
-            for rfc in rfcs:
-                encontrado = False
-                tablas_encontradas = []
-
-                for tabla in tablas:
-                    cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla} WHERE UPPER(rfc) = %s", (rfc,))
-                    if cursor.fetchone()['total'] > 0:
-                        encontrado = True
-                        tablas_encontradas.append(tabla)
+        return respuesta_trabajo(crear_trabajo('screening', procesar_screening, entrada=archivo))
 
-                resultados.append({
-                    'rfc': rfc,
-                    'encontrado': encontrado,
-                    'tablas': tablas_encontradas
-                })
+    id_trabajo = request.args.get('trabajo')
+    if not id_trabajo:
+        return render_template('carga_masiva.html', id_trabajo=None, totales=None)
 
-                if encontrado:
-                    encontrados += 1
-                else:
-                    no_encontrados += 1
-
-            cursor.close()
-            conn.close()
-
-        except Exception as e:
-            traceback.print_exc()
-            flash(f"Error procesando el archivo: {str(e)}", 'danger')
-            return redirect('/carga_masiva')
+    # Resultados de un trabajo terminado: resumen y una página; las demás
+    # páginas se piden a /jobs/<id>/resultados
+    trabajo = obtener_trabajo(id_trabajo)
+    pagina, por_pagina, filtro = parametros_pagina_screening()
+    leida = None
+    if trabajo and trabajo['tipo'] == 'screening':
+        leida = pagina_resultado_screening(id_trabajo, pagina, por_pagina, filtro)
+    if leida is None:
+        return redirect(f'/jobs/{id_trabajo}')
+    resultados, hay_siguiente = leida
+    totales = resumen_screening(trabajo)
 
     return render_template(
         'carga_masiva.html',
         resultados=resultados,
-        total_rfcs=total_rfcs,
-        encontrados=encontrados,
-        no_encontrados=no_encontrados
+        totales=totales,
+        total_paginas=max(-(-totales[filtro] // por_pagina), 1),
+        pagina=pagina,
+        por_pagina=por_pagina,
+        filtro=filtro,
+        hay_siguiente=hay_siguiente,
+        id_trabajo=id_trabajo
     )
 
 
@@ -835,68 +1046,73 @@ def descargar_csv():
         flash('No seleccionaste ningún archivo TXT', 'danger')
         return redirect('/carga_masiva')
 
-    conn = None
-    cursor = None
-
-    try:
-        contenido = archivo.read().decode('latin1').splitlines()
-        rfcs = [line.strip().upper() for line in contenido if line.strip()]
-
-        conn = get_db_connection()
-        cursor = conn.cursor(dictionary=True)
+    # El CSV se descarga desde /jobs/<id>/resultado cuando el trabajo termina
+    return respuesta_trabajo(crear_trabajo('screening', procesar_screening, entrada=archivo))
 
-        tablas = ['Definitivos', 'Desvirtuados', 'Presuntos', 'SentenciasFavorables', 'Listado_Completo_69_B']
 
-        resultados = []
+# ---------------------------------------------------------
+# TRABAJOS EN SEGUNDO PLANO
+# ---------------------------------------------------------
 
-        for rfc in rfcs:
-            encontrado = False
-            tablas_encontradas = []
+@app.route('/jobs/<id_trabajo>')
+def ver_trabajo(id_trabajo):
+    trabajo = obtener_trabajo(id_trabajo)
 
-            for tabla in tablas:
-                cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla} WHERE UPPER(rfc) = %s", (rfc,))
-                if cursor.fetchone()['total'] > 0:
-                    encontrado = True
-                    tablas_encontradas.append(tabla)
+    if prefiere_json():
+        if trabajo is None:
+            return jsonify({'error': 'Trabajo no encontrado'}), 404
+        return jsonify(trabajo)
 
-            resultados.append({
-                'rfc': rfc,
-                'encontrado': 'SI' if encontrado else 'NO',
-                'tablas': ", ".join(tablas_encontradas) if tablas_encontradas else ''
-            })
+    if trabajo is None:
+        return "Trabajo no encontrado", 404
+    return render_template('trabajo.html', trabajo=trabajo)
 
-        # Crear CSV en memoria
-        output = io.StringIO()
-        writer = csv.writer(output)
-        writer.writerow(['RFC', 'Encontrado', 'Tablas'])
 
-        for r in resultados:
-            writer.writerow([r['rfc'], r['encontrado'], r['tablas']])
+@app.route('/jobs/<id_trabajo>/eventos')
+def eventos(id_trabajo):
+    return app.response_class(
+        eventos_trabajo(id_trabajo),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
 
-        output.seek(0)
 
-        return send_file(
-            io.BytesIO(output.getvalue().encode('utf-8')),
-            mimetype="text/csv",
-            as_attachment=True,
-            download_name=f"resultado_carga_masiva_{datetime.now().strftime('%Y%m%d')}.csv"
-        )
+@app.route('/jobs/<id_trabajo>/resultados')
+def resultados_trabajo(id_trabajo):
+    """Una página de resultados de screening en JSON (?pagina, ?por_pagina, ?filtro)"""
+    trabajo = obtener_trabajo(id_trabajo)
+    if trabajo is None or trabajo['tipo'] != 'screening':
+        return jsonify({'error': 'Trabajo no encontrado'}), 404
+
+    pagina, por_pagina, filtro = parametros_pagina_screening()
+    leida = pagina_resultado_screening(id_trabajo, pagina, por_pagina, filtro)
+    if leida is None:
+        return jsonify({'error': 'El trabajo no tiene un resultado disponible', 'estado': trabajo['estado']}), 409
+    resultados, hay_siguiente = leida
+    totales = resumen_screening(trabajo)
+
+    return jsonify({
+        'pagina': pagina,
+        'por_pagina': por_pagina,
+        'filtro': filtro,
+        'total': totales[filtro],
+        'total_paginas': max(-(-totales[filtro] // por_pagina), 1),
+        'hay_siguiente': hay_siguiente,
+        'totales': totales,
+        'resultados': resultados
+    })
+
+
+@app.route('/jobs/<id_trabajo>/resultado')
+def resultado_trabajo(id_trabajo):
+    ruta, nombre = ruta_resultado(id_trabajo)
+    if not ruta:
+        return "El trabajo no tiene un resultado disponible", 404
+    return send_file(ruta, mimetype='text/csv', as_attachment=True, download_name=nombre)
 
-    except Exception as e:
-        traceback.print_exc()
-        flash(f"Error generando CSV: {str(e)}", 'danger')
-        return redirect('/carga_masiva')
 
-    finally:
-        try:
-            if cursor:
-                cursor.close()
-            if conn:
-                conn.close()
-        except:
-            pass
 # ---------------------------------------------------------
-# BACKUPS - LISTADO DE TABLAS BACKUP
+# BACKUPS - CATÁLOGO DEL ALMACÉN COMPRIMIDO
 # ---------------------------------------------------------
 
 @app.route('/backups')
@@ -908,20 +1124,14 @@ def backups():
     cursor = conn.cursor(dictionary=True)
 
     try:
-        # Buscar tablas que sean backups
-        cursor.execute("""
-            SELECT table_name 
-            FROM information_schema.tables
-            WHERE table_schema = DATABASE()
-            AND table_name LIKE '%_backup_%'
-            ORDER BY table_name DESC
-        """)
-        tablas = cursor.fetchall()
+        tabla = request.args.get('tabla', '').strip() or None
+        registros = listar_backups(cursor, tabla)
+        espacio = espacio_backups(cursor)
 
         cursor.close()
         conn.close()
 
-        return render_template('backups.html', tablas=tablas)
+        return render_template('backups.html', backups=registros, espacio=espacio, tabla=tabla)
 
     except Exception as e:
         cursor.close()
@@ -929,6 +1139,33 @@ def backups():
         return f"Error: {e}", 500
 
 
+@app.route('/backups/<int:id_backup>/restaurar', methods=['POST'])
+@requiere_admin
+def restaurar_backup(id_backup):
+    id_trabajo = crear_trabajo('restauracion', procesar_restauracion, id_backup)
+    return respuesta_trabajo(id_trabajo)
+
+
+@app.route('/backups/limpiar', methods=['POST'])
+@requiere_admin
+def limpiar_almacen_backups():
+    conn = get_db_connection()
+    if not conn:
+        return "Error de conexión a la base de datos", 500
+
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        resultado = limpiar_backups(conn, cursor)
+        flash(f"🧹 Generaciones eliminadas: {resultado['generaciones']} | "
+              f"archivos borrados: {resultado['archivos']} ({resultado['bytes'] // 1024} KB)", "success")
+    finally:
+        cursor.close()
+        conn.close()
+
+    return redirect('/backups')
+
+
 # ---------------------------------------------------------
 # PUNTO DE ENTRADA (OPCIONAL EN GUNICORN)
 # ---------------------------------------------------------
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Almacén de backups comprimidos con catálogo
+Cada generación reemplazada (o restaurada) se guarda como un archivo gzip
+de líneas JSON en lugar de quedar como tabla <tabla>_backup_<fecha>. El
+archivo se nombra con el SHA-256 de su contenido, así que dos generaciones
+idénticas comparten el mismo archivo. La tabla Backups es el catálogo
+(listado indexado por tabla y fecha) y 'limpiar_backups' aplica la política
+de retención de BACKUP_CONFIG y borra los archivos sin referencias.
+
+Uso:
+    python backups.py --importar-tablas   # pasa las tablas *_backup_* al almacén
+    python backups.py --limpiar           # aplica la política de retención
+"""
+
+import os
+import re
+import time
+import gzip
+import json
+import uuid
+import hashlib
+import argparse
+from datetime import datetime, timedelta
+
+from config import BACKUP_CONFIG
+
+# Derivadas o propias de cada carga: no forman parte del respaldo
+COLUMNAS_EXCLUIDAS = {"hash_fila", "fecha_actualizacion"}
+
+EXTENSION = ".jsonl.gz"
+
+# Backups que solo guardan algunas filas (las que reemplazó una carga incremental):
+# no se restauran como tabla completa y tienen su propia ventana de 'conservar'
+MOTIVOS_PARCIALES = {"incremental_filas"}
+
+# ---------------------------------------------------------
+# Archivos
+# ---------------------------------------------------------
+
+def ruta_archivo(digest):
+    return os.path.join(BACKUP_CONFIG["carpeta"], digest[:2], digest + EXTENSION)
+
+
+def columnas_respaldo(cursor, tabla):
+    """Columnas de datos en orden de la tabla (sin autoincrementales ni derivadas)"""
+    cursor.execute(f"DESCRIBE {tabla}")
+    return [
+        col["Field"] for col in cursor.fetchall()
+        if col["Field"] not in COLUMNAS_EXCLUIDAS and "auto_increment" not in (col.get("Extra") or "")
+    ]
+
+
+def escribir_snapshot(cursor, origen, tabla, filtro=None):
+    """
+    Vuelca 'origen' (o solo las filas que cumplen 'filtro') a un archivo
+    comprimido, ordenado para que el contenido sea determinista.
+    Devuelve (digest, registros, bytes, nuevo).
+    """
+    columnas = columnas_respaldo(cursor, origen)
+    os.makedirs(BACKUP_CONFIG["carpeta"], exist_ok=True)
+    temporal = os.path.join(BACKUP_CONFIG["carpeta"], f".{uuid.uuid4().hex}.tmp")
+
+    digest = hashlib.sha256()
+    registros = 0
+    try:
+        with open(temporal, "wb") as salida, gzip.GzipFile(fileobj=salida, mode="wb", mtime=0) as archivo:
+            def escribir(valor):
+                linea = (json.dumps(valor, ensure_ascii=False, default=str) + "\n").encode("utf-8")
+                digest.update(linea)
+                archivo.write(linea)
+
+            escribir({"tabla": tabla, "columnas": columnas})
+            lista = ", ".join(columnas)
+            where = f"WHERE {filtro}" if filtro else ""
+            cursor.execute(f"SELECT {lista} FROM {origen} {where} ORDER BY {lista}")
+            while True:
+                filas = cursor.fetchmany(BACKUP_CONFIG["tamano_lote"])
+                if not filas:
+                    break
+                for fila in filas:
+                    escribir([fila[c] for c in columnas])
+                registros += len(filas)
+
+        digest = digest.hexdigest()
+        destino = ruta_archivo(digest)
+        nuevo = not os.path.exists(destino)
+        if nuevo:
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            os.replace(temporal, destino)
+        else:
+            # El archivo vuelve a estar en uso: la limpieza respeta el periodo de gracia
+            os.utime(destino)
+        return digest, registros, os.path.getsize(destino), nuevo
+    finally:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+
+
+def leer_snapshot(digest):
+    """Devuelve (encabezado, iterador de filas) de un archivo del almacén"""
+    archivo = gzip.open(ruta_archivo(digest), "rt", encoding="utf-8")
+    encabezado = json.loads(archivo.readline())
+
+    def filas():
+        with archivo:
+            for linea in archivo:
+                yield json.loads(linea)
+
+    return encabezado, filas()
+
+# ---------------------------------------------------------
+# Catálogo
+# ---------------------------------------------------------
+
+def respaldar_tabla(cursor, origen, tabla, motivo, creado=None, filtro=None):
+    """
+    Guarda 'origen' como generación de 'tabla' y la registra en el catálogo.
+    La tabla 'origen' se borra aparte y solo después del commit: DROP TABLE
+    confirma la transacción implícitamente en MySQL.
+    """
+    digest, registros, tamano, nuevo = escribir_snapshot(cursor, origen, tabla, filtro)
+    cursor.execute("""
+        INSERT INTO Backups (tabla, archivo, registros, bytes, motivo, creado)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, (tabla, digest, registros, tamano, motivo, creado or datetime.now()))
+    id_backup = cursor.lastrowid
+    return {"id": id_backup, "registros": registros, "bytes": tamano, "deduplicado": not nuevo}
+
+
+def listar_backups(cursor, tabla=None, limite=200):
+    if tabla:
+        cursor.execute("""
+            SELECT id, tabla, archivo, registros, bytes, motivo, creado
+            FROM Backups WHERE tabla = %s ORDER BY creado DESC LIMIT %s
+        """, (tabla, limite))
+    else:
+        cursor.execute("""
+            SELECT id, tabla, archivo, registros, bytes, motivo, creado
+            FROM Backups ORDER BY creado DESC LIMIT %s
+        """, (limite,))
+    return cursor.fetchall()
+
+
+def obtener_backup(cursor, id_backup):
+    cursor.execute("""
+        SELECT id, tabla, archivo, registros, bytes, motivo, creado
+        FROM Backups WHERE id = %s
+    """, (id_backup,))
+    return cursor.fetchone()
+
+
+def espacio_backups(cursor):
+    """Bytes ocupados en disco (cada archivo compartido cuenta una vez) y generaciones"""
+    cursor.execute("""
+        SELECT COUNT(*) AS generaciones, COUNT(DISTINCT archivo) AS archivos
+        FROM Backups
+    """)
+    totales = cursor.fetchone()
+    cursor.execute("""
+        SELECT COALESCE(SUM(bytes), 0) AS bytes
+        FROM (SELECT archivo, MAX(bytes) AS bytes FROM Backups GROUP BY archivo) AS a
+    """)
+    totales["bytes"] = int(cursor.fetchone()["bytes"])
+    return totales
+
+# ---------------------------------------------------------
+# Retención
+# ---------------------------------------------------------
+
+def limpiar_backups(conn, cursor):
+    """
+    Por tabla se conservan siempre las 'conservar' generaciones completas más
+    recientes (y aparte las 'conservar' parciales más recientes);
+    las demás se eliminan cuando son más antiguas que 'dias' (0 = de inmediato).
+    Los archivos se borran después del commit del catálogo y solo si ninguna
+    fila confirmada los usa y llevan más de 'gracia_minutos' sin cambios: una
+    carga en curso puede haber escrito su archivo sin confirmar aún su fila.
+    """
+    limite = datetime.now() - timedelta(days=BACKUP_CONFIG["dias"])
+    cursor.execute("SELECT id, tabla, motivo, creado FROM Backups ORDER BY tabla, creado DESC, id DESC")
+    eliminar = []
+    por_tabla = {}
+    for fila in cursor.fetchall():
+        grupo = (fila["tabla"], fila["motivo"] in MOTIVOS_PARCIALES)
+        posicion = por_tabla[grupo] = por_tabla.get(grupo, 0) + 1
+        if posicion > BACKUP_CONFIG["conservar"] and fila["creado"] < limite:
+            eliminar.append((fila["id"],))
+    if eliminar:
+        cursor.executemany("DELETE FROM Backups WHERE id = %s", eliminar)
+    conn.commit()
+
+    cursor.execute("SELECT DISTINCT archivo FROM Backups")
+    referenciados = {fila["archivo"] for fila in cursor.fetchall()}
+
+    gracia = time.time() - BACKUP_CONFIG["gracia_minutos"] * 60
+    archivos = 0
+    liberados = 0
+    for raiz, _, nombres in os.walk(BACKUP_CONFIG["carpeta"]):
+        for nombre in nombres:
+            if not nombre.endswith(EXTENSION) or nombre[:-len(EXTENSION)] in referenciados:
+                continue
+            ruta = os.path.join(raiz, nombre)
+            if os.path.getmtime(ruta) > gracia:
+                continue
+            liberados += os.path.getsize(ruta)
+            os.remove(ruta)
+            archivos += 1
+
+    return {"generaciones": len(eliminar), "archivos": archivos, "bytes": liberados}
+
+# ---------------------------------------------------------
+# Tablas *_backup_* anteriores al almacén
+# ---------------------------------------------------------
+
+PATRON_TABLA_BACKUP = re.compile(r"^(?P<tabla>.+)_backup_(?P<fecha>\d{8}_\d{6})(?:_[0-9a-f]{8})?$")
+
+
+def importar_tablas_backup(conn, cursor):
+    """Pasa cada tabla <tabla>_backup_<fecha>[_<sufijo>] al almacén y la elimina"""
+    cursor.execute("""
+        SELECT table_name AS nombre
+        FROM information_schema.tables
+        WHERE table_schema = DATABASE() AND table_name LIKE '%\\_backup\\_%'
+        ORDER BY table_name
+    """)
+    importadas = 0
+    for fila in cursor.fetchall():
+        coincidencia = PATRON_TABLA_BACKUP.match(fila["nombre"])
+        if not coincidencia:
+            continue
+        creado = datetime.strptime(coincidencia["fecha"], "%Y%m%d_%H%M%S")
+        respaldo = respaldar_tabla(cursor, fila["nombre"], coincidencia["tabla"], "tabla_anterior", creado)
+        conn.commit()
+        cursor.execute(f"DROP TABLE IF EXISTS {fila['nombre']}")
+        importadas += 1
+        print(f"✅ {fila['nombre']} → backup #{respaldo['id']} "
+              f"({respaldo['registros']} registros, {respaldo['bytes'] // 1024} KB)")
+    return importadas
+
+
+def main():
+    from db import obtener_conexion
+
+    parser = argparse.ArgumentParser(description="Almacén de backups del Sistema SAT")
+    parser.add_argument("--importar-tablas", action="store_true",
+                        help="Convierte las tablas *_backup_* en backups comprimidos y las elimina")
+    parser.add_argument("--limpiar", action="store_true", help="Aplica la política de retención")
+    args = parser.parse_args()
+
+    conn = obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        if args.importar_tablas:
+            print(f"\n📦 Tablas importadas: {importar_tablas_backup(conn, cursor)}")
+        if args.limpiar or args.importar_tablas:
+            resultado = limpiar_backups(conn, cursor)
+            print(f"🧹 Generaciones eliminadas: {resultado['generaciones']} | "
+                  f"archivos borrados: {resultado['archivos']} ({resultado['bytes'] // 1024} KB)")
+        espacio = espacio_backups(cursor)
+        print(f"💾 {espacio['generaciones']} generaciones en {espacio['archivos']} archivos "
+              f"({espacio['bytes'] // 1024} KB)")
+    finally:
+        cursor.close()
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
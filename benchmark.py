@@ -0,0 +1,1032 @@
+#!/usr/bin/env python3
+"""
+Benchmarks del Sistema SAT
+Mide el tiempo de las operaciones críticas contra la base configurada en config.py
+
+Uso:
+    python benchmark.py screening --tamanos 100 1000 10000 20000
+    python benchmark.py pool --hilos 20 --tamano 5 [--mysql]
+    python benchmark.py lookup --repeticiones 200
+    python benchmark.py exportar --filas 10000 100000 500000
+    python benchmark.py ingesta --multiplicar 1 10 [--mysql]
+    python benchmark.py fechas --multiplicar 1 10
+    python benchmark.py concurrencia --peticiones 5000 --latencia-ms 5
+    python benchmark.py suite --escalas 1 10 100 --salida resultados.json [--comparar anterior.json]
+"""
+
+import io
+import os
+import asyncio
+import csv
+import sys
+import argparse
+import random
+import resource
+import sqlite3
+import string
+import glob
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import mysql.connector
+from config import DB_CONFIG, TABLAS_CONSULTA
+from screening import consultar_rfcs
+from db import PoolConexiones, PoolAgotado
+from consultas import buscar_por_rfc
+from exportacion import generar_csv
+from ingesta import MAPEOS, COLUMNAS_FECHA, leer_lotes, normalizar_lote, filas_lote, cargar
+from normalizacion import convertir_fecha, normalizar_fechas
+from datetime import datetime
+
+import pandas as pd
+
+# ---------------------------------------------------------
+# Utilidades
+# ---------------------------------------------------------
+
+def conectar():
+    try:
+        return mysql.connector.connect(**DB_CONFIG)
+    except Exception as e:
+        print("❌ Error conectando a la base de datos:", e)
+        exit(1)
+
+
+def medir(funcion, *args):
+    inicio = time.perf_counter()
+    funcion(*args)
+    return time.perf_counter() - inicio
+
+
+def percentil(valores, p):
+    valores = sorted(valores)
+    if not valores:
+        return 0.0
+    k = min(len(valores) - 1, int(round(p / 100 * (len(valores) - 1))))
+    return valores[k]
+
+
+def rfc_aleatorio():
+    letras = "".join(random.choices(string.ascii_uppercase, k=3))
+    fecha = f"{random.randint(0, 99):02d}{random.randint(1, 12):02d}{random.randint(1, 28):02d}"
+    homoclave = "".join(random.choices(string.ascii_uppercase + string.digits, k=3))
+    return letras + fecha + homoclave
+
+
+def lista_rfcs(cursor, tamano, proporcion_reales=0.3):
+    """Mezcla RFCs reales del listado con RFCs aleatorios (no encontrados)"""
+    reales = int(tamano * proporcion_reales)
+    cursor.execute("SELECT rfc FROM Listado_Completo_69_B ORDER BY RAND() LIMIT %s", (reales,))
+    rfcs = [row["rfc"].upper() for row in cursor.fetchall() if row["rfc"]]
+    rfcs += [rfc_aleatorio() for _ in range(tamano - len(rfcs))]
+    random.shuffle(rfcs)
+    return rfcs
+
+# ---------------------------------------------------------
+# Screening (carga masiva)
+# ---------------------------------------------------------
+
+def screening_por_rfc(cursor, rfcs):
+    """Implementación anterior: un SELECT COUNT(*) por RFC y por tabla"""
+    for rfc in rfcs:
+        for tabla in TABLAS_CONSULTA:
+            cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla} WHERE UPPER(rfc) = %s", (rfc,))
+            cursor.fetchone()
+
+
+def bench_screening(args):
+    conn = conectar()
+    cursor = conn.cursor(dictionary=True)
+
+    print("\n📊 SCREENING: tiempo vs tamaño de lista")
+    print(f"{'RFCs':>8} {'por RFC (s)':>12} {'conjuntos (s)':>14} {'mejora':>8}")
+
+    for tamano in args.tamanos:
+        rfcs = lista_rfcs(cursor, tamano)
+
+        t_conjuntos = medir(consultar_rfcs, cursor, rfcs)
+
+        if tamano <= args.max_por_rfc:
+            t_por_rfc = medir(screening_por_rfc, cursor, rfcs)
+            mejora = f"{t_por_rfc / t_conjuntos:.1f}x" if t_conjuntos else "-"
+            print(f"{tamano:>8} {t_por_rfc:>12.3f} {t_conjuntos:>14.3f} {mejora:>8}")
+        else:
+            print(f"{tamano:>8} {'(omitido)':>12} {t_conjuntos:>14.3f} {'-':>8}")
+
+    cursor.close()
+    conn.close()
+
+# ---------------------------------------------------------
+# Pool de conexiones
+# ---------------------------------------------------------
+
+def bench_pool(args):
+    """
+    Estresa el pool con varios hilos y verifica sus garantías:
+    nunca más de 'tamano' conexiones prestadas, reciclado y descarte por ping.
+    Sin --mysql usa SQLite en memoria como sustituto de la base.
+    """
+    if args.mysql:
+        fabrica = lambda: mysql.connector.connect(**DB_CONFIG)
+    else:
+        fabrica = lambda: sqlite3.connect(":memory:", check_same_thread=False)
+
+    pool = PoolConexiones(fabrica, tamano=args.tamano, pre_ping=True,
+                          reciclar_segundos=args.reciclar, timeout_segundos=args.timeout)
+    maximo_en_uso = [0]
+    errores = []
+    lock = threading.Lock()
+
+    def trabajador():
+        for _ in range(args.iteraciones):
+            try:
+                conn = pool.obtener()
+            except PoolAgotado as e:
+                errores.append(str(e))
+                continue
+            with lock:
+                maximo_en_uso[0] = max(maximo_en_uso[0], pool.estadisticas()["en_uso"])
+            cursor = conn.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchall()
+            cursor.close()
+            time.sleep(args.trabajo_ms / 1000)
+            conn.close()
+
+    inicio = time.perf_counter()
+    hilos = [threading.Thread(target=trabajador) for _ in range(args.hilos)]
+    for h in hilos:
+        h.start()
+    for h in hilos:
+        h.join()
+    duracion = time.perf_counter() - inicio
+
+    # Una conexión muerta en el pool debe descartarse en el siguiente préstamo
+    conn = pool.obtener()
+    conn._conexion.close()
+    conn.close()
+    pool.obtener().close()
+
+    stats = pool.estadisticas()
+    print("\n📊 POOL DE CONEXIONES")
+    for clave in sorted(stats):
+        print(f"   {clave:<20} {stats[clave]}")
+    print(f"   {'duracion_s':<20} {duracion:.3f}")
+    print(f"   {'timeouts_hilos':<20} {len(errores)}")
+
+    assert maximo_en_uso[0] <= args.tamano, "Se prestaron más conexiones que el tamaño del pool"
+    assert stats["en_uso"] == 0, "Quedaron conexiones sin devolver"
+    assert stats["creadas"] <= args.tamano + stats["recicladas"] + stats["descartadas"]
+    assert stats["descartadas"] >= 1, "La conexión cerrada no se descartó con el pre-ping"
+    print("✅ Verificaciones del pool correctas")
+    pool.cerrar()
+
+# ---------------------------------------------------------
+# Búsqueda individual (/search y /api/contribuyente)
+# ---------------------------------------------------------
+
+def lookup_por_tabla(cursor, rfc):
+    """Implementación anterior: un SELECT * por tabla"""
+    resultados = []
+    for tabla in TABLAS_CONSULTA:
+        cursor.execute(f"SELECT * FROM {tabla} WHERE UPPER(rfc) = %s", (rfc,))
+        resultados.extend(cursor.fetchall())
+    return resultados
+
+
+def lookup_union(cursor, rfc):
+    return list(buscar_por_rfc(cursor, rfc))
+
+
+def bench_lookup(args):
+    conn = conectar()
+    cursor = conn.cursor(dictionary=True)
+    rfcs = lista_rfcs(cursor, args.repeticiones, proporcion_reales=0.5)
+
+    print("\n📊 LOOKUP POR RFC: latencia por consulta (ms)")
+    print(f"{'método':<14} {'p50':>8} {'p95':>8} {'p99':>8} {'total (s)':>10}")
+
+    for nombre, funcion in (("por tabla", lookup_por_tabla), ("UNION ALL", lookup_union)):
+        tiempos = [medir(funcion, cursor, rfc) * 1000 for rfc in rfcs]
+        print(f"{nombre:<14} {percentil(tiempos, 50):>8.2f} {percentil(tiempos, 95):>8.2f} "
+              f"{percentil(tiempos, 99):>8.2f} {sum(tiempos) / 1000:>10.3f}")
+
+    cursor.close()
+    conn.close()
+
+# ---------------------------------------------------------
+# Exportación CSV (memoria pico)
+# ---------------------------------------------------------
+
+COLUMNAS_EXPORTAR = ["numero", "rfc", "nombre_contribuyente", "situacion_contribuyente",
+                     "publicacion_sat_presuntos", "publicacion_dof_presuntos"]
+
+
+def crear_tabla_sqlite(ruta, filas):
+    """Tabla sustituta con el layout básico del listado 69-B"""
+    db = sqlite3.connect(ruta)
+    db.execute(f"CREATE TABLE Listado_Completo_69_B ({', '.join(c + ' TEXT' for c in COLUMNAS_EXPORTAR)})")
+    lote = []
+    for i in range(1, filas + 1):
+        lote.append((i, rfc_aleatorio(), f"CONTRIBUYENTE DE PRUEBA {i} SA DE CV", "Definitivo",
+                     "2020-01-15", "2020-02-01"))
+        if len(lote) == 10000:
+            db.executemany(f"INSERT INTO Listado_Completo_69_B VALUES ({', '.join('?' * len(COLUMNAS_EXPORTAR))})", lote)
+            lote = []
+    if lote:
+        db.executemany(f"INSERT INTO Listado_Completo_69_B VALUES ({', '.join('?' * len(COLUMNAS_EXPORTAR))})", lote)
+    db.commit()
+    db.close()
+
+
+def exportar_en_memoria(cursor):
+    """Implementación anterior: fetchall → StringIO → BytesIO"""
+    registros = cursor.fetchall()
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(COLUMNAS_EXPORTAR)
+    for registro in registros:
+        writer.writerow(registro)
+    return io.BytesIO(output.getvalue().encode("utf-8"))
+
+
+def medir_exportacion(args):
+    """Se ejecuta en un proceso nuevo para que ru_maxrss refleje solo esta exportación"""
+    db = sqlite3.connect(args.db)
+    cursor = db.cursor()
+    cursor.execute(f"SELECT {', '.join(COLUMNAS_EXPORTAR)} FROM Listado_Completo_69_B ORDER BY numero")
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if args.medir == "memoria":
+        exportar_en_memoria(cursor)
+    else:
+        for _ in generar_csv(cursor, COLUMNAS_EXPORTAR, comprimir=args.medir == "gzip"):
+            pass
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f"{base} {pico}")
+
+
+def bench_exportar(args):
+    if args.medir:
+        return medir_exportacion(args)
+
+    print("\n📊 EXPORTACIÓN CSV: RSS pico del proceso (MB) — SQLite como sustituto")
+    print(f"{'filas':>10} {'en memoria':>12} {'streaming':>12} {'streaming gz':>14}")
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        for filas in args.filas:
+            ruta = os.path.join(carpeta, f"export_{filas}.db")
+            crear_tabla_sqlite(ruta, filas)
+            picos = []
+            for modo in ("memoria", "stream", "gzip"):
+                salida = subprocess.run(
+                    [sys.executable, __file__, "exportar", "--medir", modo, "--db", ruta],
+                    capture_output=True, text=True, check=True
+                ).stdout.split()
+                picos.append(int(salida[-1]) / 1024)  # ru_maxrss está en KB en Linux
+            print(f"{filas:>10} {picos[0]:>12.1f} {picos[1]:>12.1f} {picos[2]:>14.1f}")
+
+# ---------------------------------------------------------
+# Ingesta de CSV (/carga_csv)
+# ---------------------------------------------------------
+
+TABLA_INGESTA = "bench_ingesta"
+COLUMNAS_INGESTA = list(dict.fromkeys(MAPEOS["Listado_Completo_69_B"].values())) + ["nombre_busqueda"]
+
+
+class CursorSqlite:
+    """Adapta los %s de mysql-connector a los ? de SQLite"""
+
+    def __init__(self, conexion):
+        self._cursor = conexion.cursor()
+
+    def execute(self, sql, parametros=()):
+        return self._cursor.execute(sql.replace("%s", "?"), parametros)
+
+    def executemany(self, sql, filas):
+        return self._cursor.executemany(sql.replace("%s", "?"), filas)
+
+    def close(self):
+        self._cursor.close()
+
+
+def archivo_multiplicado(origen, destino, veces):
+    """Copia el encabezado (3 líneas) y repite las filas de datos 'veces' veces"""
+    with open(origen, "rb") as f:
+        lineas = f.readlines()
+    with open(destino, "wb") as f:
+        f.writelines(lineas[:3])
+        for _ in range(veces):
+            f.writelines(lineas[3:])
+
+
+def conectar_ingesta(args):
+    if args.mysql:
+        conn = conectar()
+        return conn, conn.cursor()
+    conn = sqlite3.connect(args.db)
+    return conn, CursorSqlite(conn)
+
+
+def ingesta_anterior(conn, cursor, ruta):
+    """Implementación anterior: todo el archivo en un DataFrame y un solo executemany"""
+    df = pd.read_csv(ruta, header=2)
+    df = normalizar_lote(df, "Listado_Completo_69_B")[0]
+    filas = filas_lote(df, COLUMNAS_INGESTA)
+    placeholders = ", ".join(["%s"] * len(COLUMNAS_INGESTA))
+    cursor.executemany(f"INSERT INTO {TABLA_INGESTA} ({', '.join(COLUMNAS_INGESTA)}) VALUES ({placeholders})", filas)
+    conn.commit()
+    return len(filas)
+
+
+def medir_ingesta(args):
+    """Se ejecuta en un proceso nuevo para que ru_maxrss refleje solo esta carga"""
+    conn, cursor = conectar_ingesta(args)
+    cursor.execute(f"DELETE FROM {TABLA_INGESTA}")
+    conn.commit()
+
+    base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    inicio = time.perf_counter()
+    if args.medir == "anterior":
+        total = ingesta_anterior(conn, cursor, args.archivo)
+    else:
+        with open(args.archivo, "rb") as f:
+            lotes = (filas_lote(df, COLUMNAS_INGESTA) for df, *_ in leer_lotes(f, "Listado_Completo_69_B", args.lote))
+            total = cargar(conn, cursor, TABLA_INGESTA, COLUMNAS_INGESTA, lotes, args.medir)["registros"]
+    segundos = time.perf_counter() - inicio
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    conn.close()
+    print(f"{total} {segundos} {base} {pico}")
+
+
+def bench_ingesta(args):
+    if args.medir:
+        return medir_ingesta(args)
+
+    modos = ["anterior", "lotes"] + (["load_data"] if args.mysql else [])
+    destino = "MySQL" if args.mysql else "SQLite como sustituto"
+    print(f"\n📊 INGESTA CSV ({destino}, lote de {args.lote} filas): filas/s y RSS pico (MB)")
+    print(f"{'archivo':<28} {'filas':>8} " + " ".join(f"{m + ' f/s':>16} {m + ' MB':>15}" for m in modos))
+
+    with tempfile.TemporaryDirectory() as carpeta:
+        base = ["--db", os.path.join(carpeta, "ingesta.db")]
+        if args.mysql:
+            conn = conectar()
+            cursor = conn.cursor()
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_INGESTA}")
+            cursor.execute(f"CREATE TABLE {TABLA_INGESTA} LIKE Listado_Completo_69_B")
+            base = ["--mysql"]
+        else:
+            conn = sqlite3.connect(base[1])
+            conn.execute(f"CREATE TABLE {TABLA_INGESTA} ({', '.join(c + ' TEXT' for c in COLUMNAS_INGESTA)})")
+            conn.commit()
+
+        try:
+            for origen in sorted(glob.glob(os.path.join(args.datos, "*.csv"))):
+                for veces in args.multiplicar:
+                    ruta = os.path.join(carpeta, f"x{veces}_{os.path.basename(origen)}")
+                    archivo_multiplicado(origen, ruta, veces)
+                    nombre = f"{os.path.basename(origen)} x{veces}"
+                    columnas = []
+                    for modo in modos:
+                        proceso = subprocess.run(
+                            [sys.executable, __file__, "ingesta", "--medir", modo, "--archivo", ruta,
+                             "--lote", str(args.lote)] + base,
+                            capture_output=True, text=True
+                        )
+                        if proceso.returncode != 0:
+                            break
+                        salida = proceso.stdout.split()
+                        filas, segundos, pico = int(salida[-4]), float(salida[-3]), int(salida[-1]) / 1024
+                        columnas.append(f"{filas / segundos if segundos else 0:>16.0f} {pico:>15.1f}")
+                    if proceso.returncode != 0:
+                        print(f"{nombre:<28} ⚠️ {proceso.stderr.strip().splitlines()[-1]}")
+                        continue
+                    print(f"{nombre:<28} {filas:>8} " + " ".join(columnas))
+        finally:
+            if args.mysql:
+                cursor.execute(f"DROP TABLE IF EXISTS {TABLA_INGESTA}")
+            conn.close()
+
+# ---------------------------------------------------------
+# Fechas de publicación
+# ---------------------------------------------------------
+
+def parse_fecha_anterior(valor):
+    """Implementación anterior de init_db.py: strptime por celda"""
+    if pd.isna(valor):
+        return None
+    try:
+        return datetime.strptime(str(valor), "%d/%m/%Y").date()
+    except Exception:
+        return None
+
+
+def columnas_fecha_muestra(carpeta):
+    """Columnas de fecha de todos los CSV de data/ como un solo DataFrame de texto"""
+    partes = []
+    for ruta in sorted(glob.glob(os.path.join(carpeta, "*.csv"))):
+        for codificacion in ("utf-8", "latin1"):
+            try:
+                df = pd.read_csv(ruta, header=2, dtype=str, encoding=codificacion)
+                break
+            except UnicodeDecodeError:
+                continue
+        df = df.rename(columns=MAPEOS["Listado_Completo_69_B"])
+        partes.append(df[[c for c in COLUMNAS_FECHA if c in df.columns]])
+    return pd.concat(partes, ignore_index=True)
+
+
+def bench_fechas(args):
+    muestra = columnas_fecha_muestra(args.datos)
+    columnas = list(muestra.columns)
+
+    print(f"\n📊 FECHAS DE PUBLICACIÓN ({len(columnas)} columnas de {args.datos}/)")
+    print(f"{'celdas':>10} {'dateutil/celda':>15} {'strptime/celda':>15} {'vectorizado':>12} {'vs dateutil':>12}")
+
+    for veces in args.multiplicar:
+        df = pd.concat([muestra] * veces, ignore_index=True)
+        celdas = df.size
+
+        inicio = time.perf_counter()
+        esperado = {c: df[c].apply(convertir_fecha) for c in columnas}
+        t_dateutil = time.perf_counter() - inicio
+
+        t_strptime = medir(lambda: [df[c].apply(parse_fecha_anterior) for c in columnas])
+
+        copia = df.copy()
+        inicio = time.perf_counter()
+        copia, conteo = normalizar_fechas(copia, columnas)
+        t_vectorizado = time.perf_counter() - inicio
+
+        for c in columnas:
+            assert list(copia[c]) == [v if v is not None and not pd.isna(v) else None for v in esperado[c]], \
+                f"El resultado vectorizado difiere del análisis celda por celda en {c}"
+
+        print(f"{celdas:>10} {t_dateutil:>14.3f}s {t_strptime:>14.3f}s {t_vectorizado:>11.3f}s "
+              f"{t_dateutil / t_vectorizado:>11.1f}x")
+
+    print(f"\n   Caminos (última medición): {conteo}")
+    print("✅ Mismo resultado que convertir_fecha celda por celda")
+
+# ---------------------------------------------------------
+# Concurrencia: app Flask (síncrona) vs servicio_async
+# ---------------------------------------------------------
+
+def fila_simulada(rfc):
+    return {
+        "orden_tabla": 0, "tabla_origen": "Definitivos", "numero": 1, "rfc": rfc,
+        "nombre_contribuyente": "CONTRIBUYENTE DE PRUEBA SA DE CV",
+        "situacion_contribuyente": "Definitivo", "publicacion_sat": None, "publicacion_dof": None
+    }
+
+
+class CursorSimulado:
+    """Base sustituta: cada consulta bloquea el hilo 'latencia' segundos"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.filas = []
+
+    def execute(self, sql, parametros=()):
+        time.sleep(self.latencia)
+        self.filas = [fila_simulada(parametros[0])]
+
+    def fetchmany(self, tamano):
+        filas, self.filas = self.filas, []
+        return filas
+
+    def close(self):
+        pass
+
+
+class ConexionSimulada:
+    def __init__(self, latencia):
+        self.latencia = latencia
+
+    def cursor(self, dictionary=True):
+        return CursorSimulado(self.latencia)
+
+    def close(self):
+        pass
+
+
+class CursorAsincronoSimulado:
+    """Base sustituta: cada consulta espera 'latencia' segundos sin bloquear el loop"""
+
+    def __init__(self, latencia):
+        self.latencia = latencia
+        self.filas = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def execute(self, sql, parametros=()):
+        await asyncio.sleep(self.latencia)
+        self.filas = [fila_simulada(parametros[0])]
+
+    async def fetchall(self):
+        return self.filas
+
+
+class PoolAsincronoSimulado:
+    """Mismo contrato que el pool de aiomysql (acquire/release) con 'maximo' conexiones"""
+
+    def __init__(self, latencia, maximo):
+        self.latencia = latencia
+        self.semaforo = asyncio.Semaphore(maximo)
+
+    async def acquire(self):
+        await self.semaforo.acquire()
+        return self
+
+    def cursor(self):
+        return CursorAsincronoSimulado(self.latencia)
+
+    def release(self, conn):
+        self.semaforo.release()
+
+
+async def clientes(args, rfcs, atender):
+    """
+    'concurrencia' clientes; cada uno envía su siguiente petición al recibir
+    la anterior. La latencia incluye la espera en la cola del servidor.
+    """
+    pendientes = iter(rfcs)
+    tiempos = []
+
+    async def cliente():
+        for rfc in pendientes:
+            inicio = time.perf_counter()
+            await atender(rfc)
+            tiempos.append(time.perf_counter() - inicio)
+
+    inicio = time.perf_counter()
+    await asyncio.gather(*(cliente() for _ in range(args.concurrencia)))
+    return tiempos, time.perf_counter() - inicio
+
+
+def carga_sincrona(args, rfcs):
+    """App Flask: un worker de gunicorn atiende con 'hilos_sync' hilos"""
+    import app as aplicacion
+    from config import CACHE_HTTP_CONFIG
+
+    CACHE_HTTP_CONFIG["habilitado"] = False
+    aplicacion.get_db_connection = lambda: ConexionSimulada(args.latencia_ms / 1000)
+    cliente = aplicacion.app.test_client()
+
+    def peticion(rfc):
+        respuesta = cliente.get(f"/api/contribuyente/{rfc}")
+        assert respuesta.status_code == 200 and respuesta.get_json()[0]["rfc"] == rfc
+
+    async def correr():
+        loop = asyncio.get_running_loop()
+        with ThreadPoolExecutor(max_workers=args.hilos_sync) as worker:
+            return await clientes(args, rfcs, lambda rfc: loop.run_in_executor(worker, peticion, rfc))
+
+    return asyncio.run(correr())
+
+
+def carga_asincrona(args, rfcs):
+    """servicio_async en el mismo loop que los clientes; el límite es su pool"""
+    import servicio_async
+
+    async def peticion(rfc):
+        respuesta = {}
+
+        async def recibir():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def enviar(mensaje):
+            if mensaje["type"] == "http.response.start":
+                respuesta["estado"] = mensaje["status"]
+            else:
+                respuesta["cuerpo"] = mensaje["body"]
+
+        scope = {"type": "http", "method": "GET", "path": f"/api/contribuyente/{rfc}", "query_string": b""}
+        await servicio_async.app(scope, recibir, enviar)
+        assert respuesta["estado"] == 200 and rfc.encode() in respuesta["cuerpo"]
+
+    async def correr():
+        servicio_async.usar_pool(PoolAsincronoSimulado(args.latencia_ms / 1000, args.pool_async))
+        return await clientes(args, rfcs, peticion)
+
+    return asyncio.run(correr())
+
+
+def bench_concurrencia(args):
+    """
+    Un proceso de cada modelo contra la misma base simulada (latencia fija
+    por consulta): la app Flask queda limitada por sus hilos; el servicio
+    asíncrono por las conexiones de su pool.
+    """
+    rfcs = [rfc_aleatorio() for _ in range(args.peticiones)]
+
+    print(f"\n📊 CONCURRENCIA: {args.peticiones} búsquedas por RFC, {args.concurrencia} clientes "
+          f"simultáneos, {args.latencia_ms} ms por consulta")
+    print(f"{'modelo':<34} {'pet/s':>9} {'p50 (ms)':>9} {'p95 (ms)':>9} {'p99 (ms)':>9}")
+
+    resultados = (
+        (f"Flask ({args.hilos_sync} hilos)", carga_sincrona(args, rfcs)),
+        (f"ASGI (pool de {args.pool_async} conexiones)", carga_asincrona(args, rfcs)),
+    )
+    for nombre, (tiempos, total) in resultados:
+        tiempos = [t * 1000 for t in tiempos]
+        print(f"{nombre:<34} {len(tiempos) / total:>9.0f} {percentil(tiempos, 50):>9.1f} "
+              f"{percentil(tiempos, 95):>9.1f} {percentil(tiempos, 99):>9.1f}")
+
+# ---------------------------------------------------------
+# Suite por puntos de entrada (listados sintéticos, base local)
+# ---------------------------------------------------------
+
+PUNTOS_SUITE = ["init_db", "carga_csv", "carga_masiva", "search", "exportar_tabla"]
+
+
+def resultado_punto(punto, tiempos, unidades, unidad, base, detalle=None):
+    """Registro del JSON de la suite; el rendimiento es sobre el tiempo medido"""
+    milisegundos = [t * 1000 for t in tiempos]
+    total = sum(tiempos)
+    return {
+        "punto": punto,
+        "repeticiones": len(tiempos),
+        "latencia_ms": {
+            "p50": round(percentil(milisegundos, 50), 2),
+            "p95": round(percentil(milisegundos, 95), 2),
+            "p99": round(percentil(milisegundos, 99), 2),
+            "max": round(max(milisegundos, default=0), 2),
+            "media": round(total * 1000 / len(tiempos), 2) if tiempos else 0.0
+        },
+        "rendimiento": {"valor": round(unidades / total, 1) if total else 0.0, "unidad": f"{unidad}/s"},
+        "memoria_mb": {
+            "base": round(base / 1024, 1),
+            "pico": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        },
+        "detalle": detalle or {}
+    }
+
+
+def contar_tabla(tabla):
+    from db import obtener_conexion
+    conn = obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla}")
+    total = cursor.fetchone()["total"]
+    cursor.close()
+    conn.close()
+    return total
+
+
+def ejecutar_trabajo(cliente, ruta, archivo, datos=None):
+    """POST como cliente de API (202 + id) y espera a que el trabajo termine"""
+    from trabajos import obtener_trabajo
+
+    with open(archivo, "rb") as f:
+        respuesta = cliente.post(
+            ruta, data={**(datos or {}), "archivo": (f, os.path.basename(archivo))},
+            headers={"Accept": "application/json"}
+        )
+    if respuesta.status_code != 202:
+        raise RuntimeError(f"{ruta} respondió {respuesta.status_code}")
+    id_trabajo = respuesta.get_json()["id"]
+    while True:
+        trabajo = obtener_trabajo(id_trabajo)
+        if trabajo["terminado"]:
+            break
+        time.sleep(0.02)
+    if trabajo["estado"] == "error":
+        raise RuntimeError(f"{ruta}: {trabajo['error']}")
+    return trabajo
+
+
+def punto_init_db(args, base):
+    import init_db
+
+    tiempos = []
+    for _ in range(args.repeticiones):
+        from db import obtener_conexion
+        conn = obtener_conexion()
+        cursor = conn.cursor()
+        for tabla in TABLAS_CONSULTA:
+            cursor.execute(f"DELETE FROM {tabla}")
+        conn.commit()
+        cursor.close()
+        conn.close()
+
+        sys.argv = ["init_db.py"]
+        inicio = time.perf_counter()
+        init_db.main()
+        tiempos.append(time.perf_counter() - inicio)
+
+    filas = contar_tabla("Listado_Completo_69_B")
+    etapas = {nombre: round(segundos, 3) for nombre, segundos in init_db.TIEMPOS.items()}
+    return [resultado_punto("init_db", tiempos, filas * len(tiempos), "filas", base,
+                            {"filas": filas, "etapas_s": etapas})]
+
+
+def punto_carga_csv(args, base):
+    import app as aplicacion
+
+    archivo = os.path.join("data", "Definitivos.csv")
+    tamano = os.path.getsize(archivo)
+    excede = tamano > aplicacion.app.config["MAX_CONTENT_LENGTH"]
+    if excede:
+        # Se mide igual; en producción la subida se rechazaría con 413
+        aplicacion.app.config["MAX_CONTENT_LENGTH"] = tamano + 1024 * 1024
+    cliente = aplicacion.app.test_client()
+
+    tiempos = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        trabajo = ejecutar_trabajo(cliente, "/carga_csv", archivo, {"tabla": "definitivos"})
+        tiempos.append(time.perf_counter() - inicio)
+
+    filas = trabajo["progreso"].get("filas_insertadas", 0)
+    return [resultado_punto("carga_csv", tiempos, filas * len(tiempos), "filas", base, {
+        "tabla": "Definitivos",
+        "filas": filas,
+        "bytes": tamano,
+        "excede_max_content_length": excede
+    })]
+
+
+def punto_carga_masiva(args, base, muestra):
+    import app as aplicacion
+
+    azar = random.Random(args.semilla)
+    rfcs = [azar.choice(muestra["rfcs"]) if azar.random() < 0.5 else rfc_aleatorio() for _ in range(args.rfcs)]
+    archivo = "rfcs.txt"
+    with open(archivo, "w", encoding="latin1") as f:
+        f.write("\n".join(rfcs) + "\n")
+    cliente = aplicacion.app.test_client()
+
+    tiempos = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        trabajo = ejecutar_trabajo(cliente, "/carga_masiva", archivo)
+        tiempos.append(time.perf_counter() - inicio)
+
+    return [resultado_punto("carga_masiva", tiempos, args.rfcs * len(tiempos), "rfcs", base, {
+        "rfcs": args.rfcs,
+        "encontrados": trabajo["progreso"].get("encontrados", 0)
+    })]
+
+
+def consumir(respuesta):
+    """Lee la respuesta por fragmentos (como un cliente real) y devuelve los bytes"""
+    total = 0
+    try:
+        for fragmento in respuesta.response:
+            total += len(fragmento)
+    finally:
+        respuesta.close()
+    if respuesta.status_code != 200:
+        raise RuntimeError(f"Respuesta {respuesta.status_code}")
+    return total
+
+
+def punto_search(args, base, muestra):
+    import app as aplicacion
+
+    azar = random.Random(args.semilla)
+    cliente = aplicacion.app.test_client()
+    consultas = {
+        "rfc": [azar.choice(muestra["rfcs"]) if azar.random() < 0.5 else rfc_aleatorio()
+                for _ in range(args.busquedas)],
+        "nombre": [" ".join(azar.choice(muestra["nombres"]).split()[:2]) for _ in range(args.busquedas)]
+    }
+
+    resultados = []
+    for tipo, valores in consultas.items():
+        tiempos = []
+        for valor in valores:
+            inicio = time.perf_counter()
+            consumir(cliente.get("/search", query_string={"q": valor, "type": tipo}))
+            tiempos.append(time.perf_counter() - inicio)
+        resultados.append(resultado_punto(f"search?type={tipo}", tiempos, len(tiempos), "peticiones", base))
+    return resultados
+
+
+def punto_exportar_tabla(args, base):
+    import app as aplicacion
+
+    cliente = aplicacion.app.test_client()
+    tiempos = []
+    for _ in range(args.repeticiones):
+        inicio = time.perf_counter()
+        tamano = consumir(cliente.get("/exportar/listado_completo_69_b"))
+        tiempos.append(time.perf_counter() - inicio)
+
+    filas = contar_tabla("Listado_Completo_69_B")
+    return [resultado_punto("exportar_tabla", tiempos, filas * len(tiempos), "filas", base,
+                            {"filas": filas, "bytes": tamano})]
+
+
+def medir_punto_suite(args):
+    """
+    Proceso hijo (cwd = carpeta de la escala): un punto de entrada contra la
+    base local. Imprime en la última línea la lista de resultados en JSON.
+    """
+    import db
+    import json
+    from sustituto_db import pool_sustituto
+
+    db.usar_pool(pool_sustituto(os.path.join(args.carpeta, "sustituto.db")))
+    with open(os.path.join(args.carpeta, "muestra.json")) as f:
+        muestra = json.load(f)
+
+    salida = sys.stdout
+    sys.stdout = open(os.devnull, "w")  # init_db y los trabajos imprimen su progreso
+    try:
+        import app  # noqa: F401  (la importación no cuenta como memoria del punto)
+        base = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if args.punto in ("carga_masiva", "search"):
+            resultados = globals()[f"punto_{args.punto}"](args, base, muestra)
+        else:
+            resultados = globals()[f"punto_{args.punto}"](args, base)
+    finally:
+        sys.stdout.close()
+        sys.stdout = salida
+    print(json.dumps(resultados))
+
+
+def commit_actual():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def comparar_informes(anterior, actual):
+    """Diferencias de p95 y rendimiento por (escala, punto) contra un JSON anterior"""
+    previos = {(r["escala"], r["punto"]): r for r in anterior["resultados"] if "error" not in r}
+    print(f"\n📊 COMPARACIÓN con {anterior.get('commit') or 'informe anterior'}")
+    print(f"{'escala':>7} {'punto':<22} {'p95 antes':>11} {'p95 ahora':>11} {'rend. antes':>12} {'rend. ahora':>12}")
+    for r in actual["resultados"]:
+        previo = previos.get((r["escala"], r["punto"]))
+        if previo is None or "error" in r:
+            continue
+        cambio = (r["rendimiento"]["valor"] / previo["rendimiento"]["valor"] - 1) * 100 \
+            if previo["rendimiento"]["valor"] else 0.0
+        print(f"{r['escala']:>6g}x {r['punto']:<22} {previo['latencia_ms']['p95']:>11.1f} "
+              f"{r['latencia_ms']['p95']:>11.1f} {previo['rendimiento']['valor']:>12.1f} "
+              f"{r['rendimiento']['valor']:>12.1f} ({cambio:+.0f}%)")
+
+
+def bench_suite(args):
+    """
+    Por cada escala: genera los listados sintéticos, crea la base local y
+    ejecuta cada punto de entrada en su propio proceso (memoria pico aislada).
+    """
+    import json
+    import platform
+    from datos_sinteticos import generar, ARCHIVO_LISTADO
+    from sustituto_db import crear_base
+
+    if args.punto:
+        return medir_punto_suite(args)
+
+    print(f"\n📊 SUITE: {', '.join(args.puntos)} — listados sintéticos, SQLite como sustituto de MySQL")
+    print(f"{'escala':>7} {'filas':>9} {'punto':<22} {'p50 (ms)':>10} {'p95 (ms)':>10} {'p99 (ms)':>10} "
+          f"{'rendimiento':>20} {'RSS pico (MB)':>14}")
+
+    resultados = []
+    with tempfile.TemporaryDirectory(dir=args.temporal) as raiz:
+        for escala in args.escalas:
+            carpeta = os.path.join(raiz, f"x{escala:g}")
+            filas, muestra = generar(os.path.join(carpeta, "data"), escala, args.semilla)
+            crear_base(os.path.join(carpeta, "sustituto.db"))
+            with open(os.path.join(carpeta, "muestra.json"), "w") as f:
+                json.dump(muestra, f)
+
+            for punto in args.puntos:
+                proceso = subprocess.run(
+                    [sys.executable, os.path.abspath(__file__), "suite", "--punto", punto, "--carpeta", carpeta,
+                     "--repeticiones", str(args.repeticiones), "--busquedas", str(args.busquedas),
+                     "--rfcs", str(args.rfcs), "--semilla", str(args.semilla)],
+                    cwd=carpeta, capture_output=True, text=True
+                )
+                comun = {"escala": escala, "filas_listado": filas[ARCHIVO_LISTADO]}
+                if proceso.returncode != 0:
+                    error = (proceso.stderr.strip().splitlines() or ["sin salida"])[-1]
+                    resultados.append({**comun, "punto": punto, "error": error})
+                    print(f"{escala:>6g}x {filas[ARCHIVO_LISTADO]:>9} {punto:<22} ⚠️ {error}")
+                    continue
+                for r in json.loads(proceso.stdout.strip().splitlines()[-1]):
+                    r = {**comun, **r}
+                    resultados.append(r)
+                    rendimiento = f"{r['rendimiento']['valor']:.0f} {r['rendimiento']['unidad']}"
+                    print(f"{escala:>6g}x {r['filas_listado']:>9} {r['punto']:<22} {r['latencia_ms']['p50']:>10.1f} "
+                          f"{r['latencia_ms']['p95']:>10.1f} {r['latencia_ms']['p99']:>10.1f} "
+                          f"{rendimiento:>20} {r['memoria_mb']['pico']:>14.1f}")
+
+    informe = {
+        "commit": commit_actual(),
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "base": "sqlite (sustituto_db.py)",
+        "parametros": {
+            "escalas": args.escalas,
+            "repeticiones": args.repeticiones,
+            "busquedas": args.busquedas,
+            "rfcs": args.rfcs,
+            "semilla": args.semilla
+        },
+        "resultados": resultados
+    }
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(informe, f, indent=2, ensure_ascii=False)
+    print(f"\n✅ Resultados en {args.salida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            comparar_informes(json.load(f), informe)
+
+# ---------------------------------------------------------
+# Punto de entrada
+# ---------------------------------------------------------
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks del Sistema SAT")
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("screening", help="Consulta masiva de RFCs")
+    p.add_argument("--tamanos", type=int, nargs="+", default=[100, 1000, 5000, 20000])
+    p.add_argument("--max-por-rfc", type=int, default=5000,
+                   help="Tamaño máximo para medir la implementación por RFC")
+    p.set_defaults(func=bench_screening)
+
+    p = sub.add_parser("pool", help="Pool de conexiones (SQLite como sustituto o --mysql)")
+    p.add_argument("--hilos", type=int, default=20)
+    p.add_argument("--iteraciones", type=int, default=50)
+    p.add_argument("--tamano", type=int, default=5)
+    p.add_argument("--trabajo-ms", type=float, default=2.0)
+    p.add_argument("--reciclar", type=float, default=0.5)
+    p.add_argument("--timeout", type=float, default=10)
+    p.add_argument("--mysql", action="store_true", help="Usar la base MySQL de config.py")
+    p.set_defaults(func=bench_pool)
+
+    p = sub.add_parser("lookup", help="Búsqueda por RFC: 5 consultas vs UNION ALL")
+    p.add_argument("--repeticiones", type=int, default=200)
+    p.set_defaults(func=bench_lookup)
+
+    p = sub.add_parser("exportar", help="Memoria pico de /exportar: en memoria vs streaming")
+    p.add_argument("--filas", type=int, nargs="+", default=[10000, 100000, 500000])
+    p.add_argument("--medir", choices=["memoria", "stream", "gzip"], help=argparse.SUPPRESS)
+    p.add_argument("--db", help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_exportar)
+
+    p = sub.add_parser("ingesta", help="Carga de los CSV de data/: filas/s y memoria pico")
+    p.add_argument("--datos", default="data")
+    p.add_argument("--multiplicar", type=int, nargs="+", default=[1, 10],
+                   help="Repite las filas de cada archivo para simular listados más grandes")
+    p.add_argument("--lote", type=int, default=5000)
+    p.add_argument("--mysql", action="store_true", help="Usar la base MySQL de config.py (incluye LOAD DATA)")
+    p.add_argument("--medir", choices=["anterior", "lotes", "load_data"], help=argparse.SUPPRESS)
+    p.add_argument("--archivo", help=argparse.SUPPRESS)
+    p.add_argument("--db", help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_ingesta)
+
+    p = sub.add_parser("fechas", help="Conversión de fechas: por celda vs vectorizada")
+    p.add_argument("--datos", default="data")
+    p.add_argument("--multiplicar", type=int, nargs="+", default=[1, 10])
+    p.set_defaults(func=bench_fechas)
+
+    p = sub.add_parser("concurrencia", help="Búsquedas simultáneas: app Flask vs servicio_async (base simulada)")
+    p.add_argument("--peticiones", type=int, default=5000)
+    p.add_argument("--latencia-ms", type=float, default=5.0, help="Duración simulada de cada consulta")
+    p.add_argument("--hilos-sync", type=int, default=4, help="Hilos del worker de gunicorn (Dockerfile: --threads 4)")
+    p.add_argument("--concurrencia", type=int, default=1000, help="Clientes simultáneos contra cada modelo")
+    p.add_argument("--pool-async", type=int, default=50, help="Conexiones del pool asíncrono")
+    p.set_defaults(func=bench_concurrencia)
+
+    p = sub.add_parser("suite", help="Puntos de entrada con listados sintéticos a varias escalas (JSON)")
+    p.add_argument("--escalas", type=float, nargs="+", default=[1, 10, 100],
+                   help="Múltiplos del tamaño real del listado (1 = 13,940 filas)")
+    p.add_argument("--puntos", nargs="+", choices=PUNTOS_SUITE, default=PUNTOS_SUITE)
+    p.add_argument("--repeticiones", type=int, default=3, help="Ejecuciones de cada carga y exportación")
+    p.add_argument("--busquedas", type=int, default=300, help="Peticiones a /search por tipo")
+    p.add_argument("--rfcs", type=int, default=10000, help="RFCs del archivo de /carga_masiva")
+    p.add_argument("--semilla", type=int, default=69)
+    p.add_argument("--salida", default="benchmark_suite.json")
+    p.add_argument("--comparar", help="JSON de una ejecución anterior para mostrar las diferencias")
+    p.add_argument("--temporal", help="Carpeta para los datos generados (por defecto la del sistema)")
+    p.add_argument("--punto", choices=PUNTOS_SUITE, help=argparse.SUPPRESS)
+    p.add_argument("--carpeta", help=argparse.SUPPRESS)
+    p.set_defaults(func=bench_suite)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
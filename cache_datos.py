@@ -0,0 +1,124 @@
+"""
+Versión global de los datos y caché por proceso
+Los datos solo cambian cuando carga_csv o init_db terminan una carga, y en ese
+momento incrementan el contador de la tabla Version_Datos. Cada worker guarda
+en memoria lo que ya calculó (conteos, columnas, texto legal) junto con la
+versión en que lo calculó, y lo descarta en cuanto la versión cambia.
+
+La misma versión es la estampa de las respuestas HTTP (ETag/Last-Modified):
+'estampa_datos' la lee como máximo cada CACHE_HTTP_CONFIG['segundos_version']
+por proceso, así que un 304 normalmente no toca MySQL.
+"""
+
+import time
+import threading
+
+from config import CACHE_HTTP_CONFIG
+
+_cache = {}
+_cache_version = None
+_lock = threading.Lock()
+
+_estampa = None
+_estampa_leida = 0.0
+
+# ---------------------------------------------------------
+# Versión de los datos
+# ---------------------------------------------------------
+
+def obtener_version(cursor):
+    """Lectura por llave primaria; None si la tabla aún no existe"""
+    try:
+        cursor.execute("SELECT version FROM Version_Datos WHERE id = 1")
+        fila = cursor.fetchone()
+    except Exception:
+        return None
+    if not fila:
+        return None
+    return fila["version"] if isinstance(fila, dict) else fila[0]
+
+
+def incrementar_version(cursor):
+    """Marca que los datos cambiaron; se llama después de confirmar una carga"""
+    try:
+        cursor.execute("""
+            INSERT INTO Version_Datos (id, version, actualizado)
+            VALUES (1, 1, NOW())
+            ON DUPLICATE KEY UPDATE version = version + 1, actualizado = NOW()
+        """)
+        cursor.execute("SELECT version FROM Version_Datos WHERE id = 1")
+        fila = cursor.fetchone()
+        olvidar_estampa()
+        return fila["version"] if isinstance(fila, dict) else fila[0]
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar la versión de los datos: {e}")
+        return None
+
+
+def estampa_datos():
+    """(version, actualizado) de Version_Datos; None si no hay conexión o la tabla no existe"""
+    global _estampa, _estampa_leida
+
+    if _estampa is not None and time.monotonic() - _estampa_leida < CACHE_HTTP_CONFIG["segundos_version"]:
+        return _estampa
+
+    from db import obtener_conexion
+    try:
+        conn = obtener_conexion()
+    except Exception:
+        return None
+    cursor = conn.cursor(dictionary=True)
+    try:
+        cursor.execute("SELECT version, actualizado FROM Version_Datos WHERE id = 1")
+        fila = cursor.fetchone()
+    except Exception:
+        fila = None
+    finally:
+        cursor.close()
+        conn.close()
+
+    _estampa = (fila["version"], fila["actualizado"]) if fila else None
+    _estampa_leida = time.monotonic()
+    return _estampa
+
+# ---------------------------------------------------------
+# Caché
+# ---------------------------------------------------------
+
+def en_cache(version, clave, calcular):
+    """
+    Devuelve el valor guardado para 'clave' si se calculó con la misma versión;
+    si no, lo calcula. Sin versión (tabla inexistente) nunca se guarda nada.
+    """
+    global _cache, _cache_version
+
+    if version is None:
+        return calcular()
+
+    with _lock:
+        if version != _cache_version:
+            _cache = {}
+            _cache_version = version
+        if clave in _cache:
+            return _cache[clave]
+
+    valor = calcular()
+
+    with _lock:
+        if version == _cache_version:
+            _cache[clave] = valor
+    return valor
+
+
+def olvidar_estampa():
+    """Este proceso relee la versión en la siguiente petición (los demás al vencer su intervalo)"""
+    global _estampa
+    _estampa = None
+
+
+def limpiar_cache():
+    global _cache, _cache_version
+    with _lock:
+        _cache = {}
+        _cache_version = None
+    olvidar_estampa()
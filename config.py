@@ -2,6 +2,8 @@
 Configuración centralizada para el sistema SAT
 """
 
+import os
+
 # Configuración de conexión a la base de datos
 DB_CONFIG = {
     "host": "dev_mysql-sat",
@@ -10,6 +12,37 @@ DB_CONFIG = {
     "database": "satdb"
 }
 
+# Token para acciones administrativas (recalcular estadísticas, diagnóstico).
+# Vacío = acciones administrativas deshabilitadas.
+ADMIN_TOKEN = os.environ.get('SAT_ADMIN_TOKEN', '')
+
+# Gunicorn (gunicorn.conf.py). Con 'hilos' > 1 gunicorn usa el worker gthread:
+# cada worker atiende varias peticiones a la vez (p. ej. /jobs/<id>/eventos
+# mientras corre otra petición) y cada una puede ocupar una conexión del pool
+GUNICORN_CONFIG = {
+    'workers': int(os.environ.get('GUNICORN_WORKERS', '1')),
+    'hilos': int(os.environ.get('GUNICORN_THREADS', '4'))
+}
+
+# Trabajos en segundo plano (/carga_csv, /carga_masiva, /descargar_csv)
+TRABAJOS_CONFIG = {
+    'carpeta': 'trabajos',          # base SQLite de trabajos, archivos subidos y resultados
+    'hilos': 2,                     # trabajos simultáneos por proceso
+    'retencion_horas': 72,          # los trabajos terminados se borran después de este tiempo
+    'intervalo_progreso': 0.5,      # segundos mínimos entre escrituras de progreso
+    'sse_segundos': 25,             # duración máxima de cada conexión de /jobs/<id>/eventos
+    'bloque_screening': 5000        # RFCs por consulta en la carga masiva
+}
+
+# Pool de conexiones (uno por worker de gunicorn)
+DB_POOL_CONFIG = {
+    # Una conexión por hilo de petición y hasta dos por trabajo en segundo plano
+    'tamano': GUNICORN_CONFIG['hilos'] + 2 * TRABAJOS_CONFIG['hilos'],
+    'pre_ping': True,            # verificar la conexión antes de prestarla
+    'reciclar_segundos': 1800,   # cerrar conexiones más antiguas que esto
+    'timeout_segundos': 10       # espera máxima por una conexión libre
+}
+
 
 # Rutas de archivos CSV - COMPLETO
 CSV_FILES = {
@@ -21,11 +54,78 @@ CSV_FILES = {
     'Listado_Completo_69_B': 'data/Listado_Completo_69-B.csv'
 }
 
+# Tablas consultadas por búsquedas, API y carga masiva (orden de presentación)
+TABLAS_CONSULTA = [
+    'Definitivos',
+    'Desvirtuados',
+    'Presuntos',
+    'SentenciasFavorables',
+    'Listado_Completo_69_B'
+]
+
+# Configuración del motor de consulta masiva de RFCs
+SCREENING_CONFIG = {
+    'tamano_lote': 1000,          # RFCs por lote en consultas IN (...)
+    'umbral_tabla_temporal': 2000,  # a partir de cuántos RFCs usar tabla temporal
+    'bloque_api': 5000,            # RFCs por bloque en POST /api/contribuyentes (cada bloque se responde al resolverse)
+    'max_rfcs_api': 500000,        # RFCs máximos por petición a POST /api/contribuyentes
+    'resultados_por_pagina': 100,  # filas por página en /carga_masiva y /jobs/<id>/resultados
+    'max_por_pagina': 1000
+}
+
+# Índice de RFCs compartido (mmap) para consultas sin pasar por MySQL
+RFC_INDEX_CONFIG = {
+    'habilitado': False,
+    'ruta': 'indices/rfc_index.json'
+}
+
+# Snapshot SQLite de solo lectura (snapshot.py) para búsquedas, API y screening
+SNAPSHOT_CONFIG = {
+    'ruta': 'snapshots/snapshot.json',
+    'backend': 'mysql',            # 'mysql' | 'snapshot' (lecturas siempre desde el snapshot)
+    'respaldo': True,              # si MySQL no responde, las lecturas usan el snapshot
+    'reconstruir_en_carga': True   # encolar la regeneración (trabajo 'snapshot') al terminar cada carga
+}
+
+# Métricas Prometheus (/metrics); cada worker escribe las suyas en la carpeta y /metrics las suma
+METRICAS_CONFIG = {
+    'habilitado': True,
+    'carpeta': 'metricas',
+    'intervalo_segundos': 5    # frecuencia con que cada proceso guarda sus series
+}
+
+# Diagnóstico de rendimiento (perfilado.py): consultas lentas con EXPLAIN y perfiles por petición.
+# Los valores marcados como ajustables se cambian sin reiniciar con POST /diagnostico/ajustes
+PERFILADO_CONFIG = {
+    'habilitado': True,             # vigilar los cursores (cambiarlo requiere reiniciar)
+    'carpeta': 'perfilado',
+    'consultas_lentas_ms': 500,     # ajustable; 0 = no registrar consultas lentas
+    'explain': True,                # ajustable; EXPLAIN automático de los SELECT lentos
+    'perfilado_peticiones': True,   # ajustable; ?perfilar=1 o X-Perfilar con el token de administración
+    'revisar_ajustes_segundos': 2,  # cada cuánto revisa cada worker si cambiaron los ajustes
+    'max_parametros': 20,           # parámetros que se guardan por consulta
+    'max_bytes_registro': 10 * 1024 * 1024,  # consultas_lentas.jsonl se rota a .1 al superarlo
+    'max_perfiles': 50
+}
+
+# Servicio de consulta asíncrono (servicio_async.py, uvicorn)
+ASYNC_CONFIG = {
+    'pool_minimo': 2,
+    'pool_maximo': 50,          # conexiones por proceso; las consultas de más esperan turno
+    'reciclar_segundos': 1800,
+    'timeout_segundos': 10      # espera máxima por una conexión libre (503 al agotarse)
+}
+
 # Configuración de importación - ACTUALIZADO
 IMPORT_CONFIG = {
     'skip_rows': 2,
     'encoding': 'utf-8',
     'date_format': '%d/%m/%Y',
+    # Filas por bloque en /carga_csv (cada bloque se inserta en su propia transacción)
+    'tamano_lote': 5000,
+    # LOAD DATA LOCAL INFILE desde un archivo temporal normalizado.
+    # Requiere local_infile=ON en el servidor; si no, se usan los bloques.
+    'load_data_local': False,
     'fechas_actualizacion': {
         'ListadoGlobalDefinitivo': '2025-06-13',
         'Definitivos': '2025-10-31',
@@ -36,6 +136,23 @@ IMPORT_CONFIG = {
     }
 }
 
+# Caché HTTP condicional (ETag/Last-Modified a partir de Version_Datos)
+CACHE_HTTP_CONFIG = {
+    'habilitado': True,
+    'segundos_version': 2,   # cada worker relee Version_Datos como máximo con esta frecuencia
+    'max_age_api': 60,       # Cache-Control de /api/contribuyente: un proxy o navegador la sirve sin preguntar
+    'max_age_paginas': 0     # páginas HTML: 0 = no-cache (se revalidan siempre con ETag → 304)
+}
+
+# Almacén de backups comprimidos (generaciones reemplazadas por /carga_csv)
+BACKUP_CONFIG = {
+    'carpeta': 'backups',   # archivos <sha256>.jsonl.gz; generaciones idénticas comparten archivo
+    'conservar': 5,         # generaciones más recientes por tabla que nunca se eliminan
+    'dias': 30,             # las demás se eliminan al superar esta antigüedad (0 = de inmediato)
+    'gracia_minutos': 60,   # archivos sin referencia más recientes que esto no se borran (cargas en curso)
+    'tamano_lote': 5000     # filas por lectura al respaldar y por inserción al restaurar
+}
+
 # Configuración de la base de datos
 DB_SETTINGS = {
     'charset': 'utf8mb4',
@@ -0,0 +1,279 @@
+"""
+Consultas de contribuyentes combinadas en un solo viaje a la base
+Cada búsqueda arma un UNION ALL sobre las tablas del SAT con un literal
+tabla_origen y solo las columnas que usan las plantillas y la API.
+"""
+
+import mysql.connector
+from config import TABLAS_CONSULTA
+from normalizacion import plegar_texto
+
+# Columnas de publicación propias de cada tabla (SAT, DOF).
+# En el listado completo se toma la etapa más reciente disponible.
+COLUMNAS_PUBLICACION = {
+    "Definitivos": ("publicacion_sat_definitivos", "publicacion_dof_definitivos"),
+    "Desvirtuados": ("publicacion_sat_desvirtuados", "publicacion_dof_desvirtuados"),
+    "Presuntos": ("publicacion_sat_presuntos", "publicacion_dof_presuntos"),
+    "SentenciasFavorables": ("publicacion_sat_sentencia", "publicacion_dof_sentencia"),
+    "Listado_Completo_69_B": (
+        "COALESCE(publicacion_sat_sentencia, publicacion_sat_definitivos, "
+        "publicacion_sat_desvirtuados, publicacion_sat_presuntos)",
+        "COALESCE(publicacion_dof_sentencia, publicacion_dof_definitivos, "
+        "publicacion_dof_desvirtuados, publicacion_dof_presuntos)"
+    )
+}
+
+# Columna de fecha para filtrar rangos en /tabla/<nombre_tabla>.
+# En el listado completo todas las filas tienen la publicación de presunción.
+COLUMNA_FECHA_FILTRO = {
+    "Definitivos": "publicacion_sat_definitivos",
+    "Desvirtuados": "publicacion_sat_desvirtuados",
+    "Presuntos": "publicacion_sat_presuntos",
+    "SentenciasFavorables": "publicacion_sat_sentencia",
+    "Listado_Completo_69_B": "publicacion_sat_presuntos"
+}
+
+TAMANO_FETCH = 500
+
+# Errores de MySQL cuando aún no se aplica la migración del índice FULLTEXT
+ERRORES_SIN_FULLTEXT = (1054, 1191)  # columna desconocida, índice FULLTEXT inexistente
+
+# ---------------------------------------------------------
+# Construcción de SQL
+# ---------------------------------------------------------
+
+def _select_tabla(tabla, orden, extra=""):
+    sat, dof = COLUMNAS_PUBLICACION[tabla]
+    return (
+        f"SELECT {orden} AS orden_tabla, '{tabla}' AS tabla_origen, numero, rfc, "
+        f"nombre_contribuyente, situacion_contribuyente, "
+        f"{sat} AS publicacion_sat, {dof} AS publicacion_dof{extra} "
+        f"FROM {tabla}"
+    )
+
+
+def sql_por_rfc(tablas=None):
+    """Un parámetro %s por tabla; todos reciben el mismo RFC"""
+    tablas = tablas or TABLAS_CONSULTA
+    partes = [f"{_select_tabla(t, i)} WHERE rfc = %s" for i, t in enumerate(tablas)]
+    return " UNION ALL ".join(partes) + " ORDER BY orden_tabla, numero"
+
+
+def sql_por_rfcs(cantidad, tablas=None):
+    """'cantidad' parámetros %s por tabla (los mismos RFCs en cada rama)"""
+    tablas = tablas or TABLAS_CONSULTA
+    placeholders = ", ".join(["%s"] * cantidad)
+    partes = [f"{_select_tabla(t, i)} WHERE rfc IN ({placeholders})" for i, t in enumerate(tablas)]
+    return " UNION ALL ".join(partes) + " ORDER BY orden_tabla, numero"
+
+
+def sql_por_nombre(tablas=None, limite=100):
+    """
+    Un parámetro %s (patrón LIKE) por tabla; máximo 'limite' filas por tabla.
+    Cada rama va en una tabla derivada (no entre paréntesis) para que el
+    snapshot SQLite acepte la misma consulta.
+    """
+    tablas = tablas or TABLAS_CONSULTA
+    partes = [
+        f"SELECT * FROM ({_select_tabla(t, i, ', 0 AS relevancia')} "
+        f"WHERE UPPER(nombre_contribuyente) LIKE %s ORDER BY numero LIMIT {int(limite)}) AS rama_{i}"
+        for i, t in enumerate(tablas)
+    ]
+    return " UNION ALL ".join(partes) + " ORDER BY orden_tabla, numero"
+
+
+def sql_por_nombre_fulltext(tablas=None, limite=100):
+    """
+    Dos parámetros %s (consulta booleana) por tabla. Cada rama trae como
+    máximo 'limite' filas, suficiente para paginar el resultado combinado.
+    """
+    tablas = tablas or TABLAS_CONSULTA
+    match = "MATCH(nombre_busqueda) AGAINST (%s IN BOOLEAN MODE)"
+    partes = [
+        f"({_select_tabla(t, i, f', {match} AS relevancia')} "
+        f"WHERE {match} ORDER BY relevancia DESC, numero LIMIT {int(limite)})"
+        for i, t in enumerate(tablas)
+    ]
+    return " UNION ALL ".join(partes) + " ORDER BY relevancia DESC, orden_tabla, numero"
+
+
+def consulta_booleana(nombre):
+    """
+    'Ñandú sa' → '+"NANDU" +"SA"' (cada palabra es obligatoria).
+    Se omiten palabras de una letra, más cortas que el token ngram (2).
+    """
+    plegado = plegar_texto(nombre) or ""
+    return " ".join(f'+"{palabra}"' for palabra in plegado.split() if len(palabra) >= 2)
+
+# ---------------------------------------------------------
+# Ejecución
+# ---------------------------------------------------------
+
+def iterar_filas(cursor, tamano=TAMANO_FETCH):
+    """Entrega las filas por bloques sin cargar todo el resultado en memoria"""
+    while True:
+        filas = cursor.fetchmany(tamano)
+        if not filas:
+            break
+        for fila in filas:
+            if isinstance(fila, dict):
+                fila.pop("orden_tabla", None)
+            yield fila
+
+
+def buscar_por_rfc(cursor, rfc, tablas=None):
+    tablas = tablas or TABLAS_CONSULTA
+    cursor.execute(sql_por_rfc(tablas), (rfc,) * len(tablas))
+    return iterar_filas(cursor)
+
+
+def buscar_por_rfcs(cursor, rfcs, tablas=None):
+    """Filas de todos los RFCs de la lista (ya normalizados y sin repetir) en una consulta"""
+    tablas = tablas or TABLAS_CONSULTA
+    cursor.execute(sql_por_rfcs(len(rfcs), tablas), tuple(rfcs) * len(tablas))
+    return iterar_filas(cursor)
+
+
+def consultas_por_nombre(nombre, pagina=1, por_pagina=50, tablas=None):
+    """
+    ((sql, parámetros) FULLTEXT, (sql, parámetros) LIKE de respaldo) para una
+    página de por_pagina + 1 filas; None si el nombre no tiene palabras útiles.
+    """
+    tablas = tablas or TABLAS_CONSULTA
+    termino = consulta_booleana(nombre)
+    if not termino:
+        return None
+
+    offset = (max(pagina, 1) - 1) * por_pagina
+    paginacion = f" LIMIT {int(por_pagina) + 1} OFFSET {int(offset)}"
+    return (
+        (sql_por_nombre_fulltext(tablas, offset + por_pagina + 1) + paginacion,
+         (termino,) * 2 * len(tablas)),
+        (sql_por_nombre(tablas, offset + por_pagina + 1) + paginacion,
+         (f"%{nombre.upper()}%",) * len(tablas))
+    )
+
+
+def buscar_por_nombre(cursor, nombre, pagina=1, por_pagina=50, tablas=None):
+    """
+    Búsqueda por nombre ordenada por relevancia, sin distinguir acentos ni
+    mayúsculas ('ÑANDU' encuentra 'NANDU'). Devuelve hasta por_pagina + 1
+    filas para que la vista sepa si existe una página siguiente.
+    Si la base aún no tiene el índice FULLTEXT usa LIKE como respaldo.
+    """
+    consultas = consultas_por_nombre(nombre, pagina, por_pagina, tablas)
+    if consultas is None:
+        return iter([])
+    fulltext, respaldo = consultas
+
+    # El snapshot SQLite no tiene índice FULLTEXT
+    if getattr(cursor, "motor", "mysql") == "sqlite":
+        cursor.execute(*respaldo)
+        return iterar_filas(cursor)
+
+    try:
+        cursor.execute(*fulltext)
+    except mysql.connector.Error as e:
+        if e.errno not in ERRORES_SIN_FULLTEXT:
+            raise
+        cursor.execute(*respaldo)
+
+    return iterar_filas(cursor)
+
+# ---------------------------------------------------------
+# Vista de tabla (/tabla/<nombre_tabla>)
+# ---------------------------------------------------------
+
+# Columnas auxiliares que no se muestran ni se exportan
+COLUMNAS_INTERNAS = {"nombre_busqueda", "hash_fila", "fecha_actualizacion"}
+
+
+def _filtros_tabla(tabla, situacion=None, desde=None, hasta=None):
+    condiciones = []
+    parametros = []
+    if situacion:
+        condiciones.append("situacion_contribuyente = %s")
+        parametros.append(situacion)
+    if desde:
+        condiciones.append(f"{COLUMNA_FECHA_FILTRO[tabla]} >= %s")
+        parametros.append(desde)
+    if hasta:
+        condiciones.append(f"{COLUMNA_FECHA_FILTRO[tabla]} <= %s")
+        parametros.append(hasta)
+    return condiciones, parametros
+
+
+def contar_tabla(cursor, tabla, situacion=None, desde=None, hasta=None):
+    condiciones, parametros = _filtros_tabla(tabla, situacion, desde, hasta)
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {tabla} {where}", tuple(parametros))
+    return cursor.fetchone()["total"]
+
+
+def columnas_tabla(cursor, tabla):
+    cursor.execute(f"DESCRIBE {tabla}")
+    return [col["Field"] for col in cursor.fetchall() if col["Field"] not in COLUMNAS_INTERNAS]
+
+
+def situaciones_tabla(cursor, tabla):
+    cursor.execute(f"""
+        SELECT DISTINCT situacion_contribuyente AS situacion
+        FROM {tabla}
+        WHERE situacion_contribuyente IS NOT NULL
+        ORDER BY situacion
+    """)
+    return [row["situacion"] for row in cursor.fetchall()]
+
+
+def texto_legal_tabla(cursor, tabla):
+    cursor.execute("""
+        SELECT linea1, linea2
+        FROM Texto_Legal_Tablas
+        WHERE tabla = %s
+        ORDER BY id DESC
+        LIMIT 1
+    """, (tabla,))
+    return cursor.fetchone()
+
+
+# Los enlaces antiguos con ?page=N (sin llave) usan OFFSET, que lee y descarta
+# todas las filas anteriores; más allá de esta página se vuelve a la primera
+MAX_PAGINA_OFFSET = 20
+
+
+def pagina_tabla(cursor, tabla, por_pagina, despues=None, antes=None, offset=None,
+                 situacion=None, desde=None, hasta=None):
+    """
+    Paginación por llave (keyset) sobre numero: cada página cuesta lo mismo
+    sin importar qué tan lejos esté. 'despues' avanza, 'antes' retrocede;
+    'offset' solo se usa para enlaces antiguos con ?page=N.
+    Devuelve (registros, hay_anterior, hay_siguiente).
+    """
+    condiciones, parametros = _filtros_tabla(tabla, situacion, desde, hasta)
+    orden = "ASC"
+
+    if antes is not None:
+        condiciones.append("numero < %s")
+        parametros.append(antes)
+        orden = "DESC"
+    elif despues is not None:
+        condiciones.append("numero > %s")
+        parametros.append(despues)
+
+    where = f"WHERE {' AND '.join(condiciones)}" if condiciones else ""
+    sql = f"SELECT * FROM {tabla} {where} ORDER BY numero {orden} LIMIT %s"
+    parametros.append(por_pagina + 1)
+    if offset and antes is None and despues is None:
+        sql += " OFFSET %s"
+        parametros.append(offset)
+
+    cursor.execute(sql, tuple(parametros))
+    registros = cursor.fetchall()
+    hay_mas = len(registros) > por_pagina
+    registros = registros[:por_pagina]
+
+    if antes is not None:
+        registros.reverse()
+        return registros, hay_mas, True
+
+    return registros, despues is not None or bool(offset), hay_mas
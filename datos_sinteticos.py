@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Listados 69-B sintéticos para benchmarks
+Genera el Listado Completo y los cuatro listados por situación con el mismo
+formato que publica el SAT, a N veces el tamaño real:
+- dos líneas de texto legal antes de los encabezados (encabezados en la línea 3)
+- columnas vacías sobrantes al final de cada fila
+- Listado_Completo_69-B.csv en latin1 (como lo lee init_db.py) y los
+  listados por situación en UTF-8 con BOM (como se descargan del SAT)
+- nombres con comas, acentos, '&' y algún salto de línea dentro de la celda
+- RFCs en minúsculas o con espacios, filas sin RFC, fechas dobles
+  ("dd/mm/aaaa - dd/mm/aaaa") y publicaciones vacías
+
+La generación es determinista (misma semilla → mismos archivos).
+
+Uso:
+    python datos_sinteticos.py --escala 10 --carpeta /tmp/sat_x10
+"""
+
+import os
+import csv
+import random
+import argparse
+from datetime import date, timedelta
+
+# Filas de los listados publicados (data/, octubre de 2025)
+FILAS_REALES = {
+    "Definitivo": 11116,
+    "Desvirtuado": 338,
+    "Presunto": 863,
+    "Sentencia Favorable": 1623
+}
+
+ARCHIVOS = {
+    "Definitivo": "Definitivos.csv",
+    "Desvirtuado": "Desvirtuados.csv",
+    "Presunto": "Presuntos.csv",
+    "Sentencia Favorable": "SentenciasFavorables.csv"
+}
+
+ARCHIVO_LISTADO = "Listado_Completo_69-B.csv"
+
+ENCABEZADOS = [
+    "No.",
+    "RFC",
+    "Nombre del Contribuyente",
+    "Situación del contribuyente",
+    "Número y fecha de oficio global de presunción SAT",
+    "Publicación página SAT presuntos",
+    "Número y fecha de oficio global de presunción DOF",
+    "Publicación DOF presuntos",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT",
+    "Publicación página SAT desvirtuados",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF",
+    "Publicación DOF desvirtuados",
+    "Número y fecha de oficio global de definitivos SAT",
+    "Publicación página SAT definitivos",
+    "Número y fecha de oficio global de definitivos DOF",
+    "Publicación DOF definitivos",
+    "Número y fecha de oficio global de sentencia favorable SAT",
+    "Publicación página SAT sentencia favorable",
+    "Número y fecha de oficio global de sentencia favorable DOF",
+    "Publicación DOF sentencia favorable"
+]
+
+COLUMNAS_SOBRANTES = 3
+
+TEXTO_LEGAL = (
+    "Información actualizada al 31 de octubre de 2025; los listados a que se hace mención, son de "
+    "carácter público, y pueden ser consultados en el Portal del Servicio de Administración Tributaria "
+    "https://www.gob.mx/sat -acciones y programas- rubro General, NOTIFICACIÓN A CONTRIBUYENTES CON "
+    "OPERACIONES PRESUNTAMENTE INEXISTENTES Y LISTADOS DEFINITIVOS- mismos que, al encontrarse firmados "
+    "mediante firma electrónica (SIFEN), cuentan con el carácter de original, de conformidad con lo "
+    "establecido en los artículos 38 y 17-D del Código Fiscal de la Federación."
+)
+TITULO = "Listado completo de contribuyentes (Artículo 69-B del CFF)"
+
+# Etapas que tiene cada situación (par oficio/publicación SAT y DOF por etapa)
+ETAPAS = {
+    "Presunto": ["presuncion"],
+    "Desvirtuado": ["presuncion", "desvirtuado"],
+    "Definitivo": ["presuncion", "definitivo"],
+    "Sentencia Favorable": ["presuncion", "definitivo", "sentencia"]
+}
+ORDEN_ETAPAS = ["presuncion", "desvirtuado", "definitivo", "sentencia"]
+
+MESES = [
+    "enero", "febrero", "marzo", "abril", "mayo", "junio",
+    "julio", "agosto", "septiembre", "octubre", "noviembre", "diciembre"
+]
+
+PALABRAS = [
+    "ASESORES", "ADMINISTRADORES", "AGRICOLAS", "AMÉRICA", "COMERCIALIZADORA", "CONSTRUCTORA",
+    "SERVICIOS", "INTEGRALES", "GRUPO", "CORPORATIVO", "DISTRIBUIDORA", "LOGÍSTICA", "PEÑA",
+    "TRANSPORTES", "DEL", "NORTE", "SURESTE", "CONSULTORÍA", "ESPECIALIZADA", "YUCATÁN",
+    "SOLUCIONES", "EMPRESARIALES", "INGENIERÍA", "PROYECTOS", "HIDROELÉCTRICOS", "OPERADORA",
+    "NACIONALES", "MEJORA", "ESTRATEGIA", "ACUÍCOLA", "ALTA", "DIRECCIÓN", "INMOBILIARIA"
+]
+NOMBRES = ["JOSÉ", "MARÍA", "SALVADOR", "GUADALUPE", "JUAN", "ANA", "LUIS", "NOÉ", "SOFÍA", "RAÚL"]
+APELLIDOS = ["ALBARRÁN", "BALDERAS", "NÚÑEZ", "PÉREZ", "GÓMEZ", "IBAÑEZ", "LÓPEZ", "MUÑOZ", "ORTEGA"]
+SOCIEDADES = ["S.A. DE C.V.", "S. DE R.L. DE C.V.", "S.C.", "S.A.P.I. DE C.V.", "S.A. DE CV."]
+
+LETRAS = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+HOMOCLAVE = LETRAS + "0123456789"
+
+# ---------------------------------------------------------
+# Valores
+# ---------------------------------------------------------
+
+def _rfc(azar, moral):
+    letras = "".join(azar.choice(LETRAS) for _ in range(3 if moral else 4))
+    fecha = date(1950, 1, 1) + timedelta(days=azar.randrange(27000))
+    rfc = letras + fecha.strftime("%y%m%d") + "".join(azar.choice(HOMOCLAVE) for _ in range(3))
+
+    sorteo = azar.random()
+    if sorteo < 0.005:
+        return ""
+    if sorteo < 0.015:
+        return rfc.lower()
+    if sorteo < 0.025:
+        return f" {rfc[:4]} {rfc[4:]} "
+    return rfc
+
+
+def _nombre(azar, moral):
+    if not moral:
+        return f"{azar.choice(APELLIDOS)} {azar.choice(APELLIDOS)} {azar.choice(NOMBRES)}"
+    palabras = " ".join(azar.sample(PALABRAS, azar.randint(2, 5)))
+    if azar.random() < 0.05:
+        palabras = palabras.replace(" ", " & ", 1)
+    separador = ", \n" if azar.random() < 0.002 else ", "
+    return f"{palabras}{separador}{azar.choice(SOCIEDADES)}"
+
+
+def _oficio(azar, fecha):
+    oficio = f"500-05-{fecha.year}-{azar.randint(1000, 39999)} de fecha {fecha.day} de {MESES[fecha.month - 1]} de {fecha.year}"
+    return oficio, fecha.strftime("%d/%m/%Y")
+
+
+def _fila(azar, numero, situacion):
+    moral = azar.random() < 0.85
+    fila = [numero, _rfc(azar, moral), _nombre(azar, moral), situacion]
+
+    fecha = date(2014, 1, 1) + timedelta(days=azar.randrange(4000))
+    etapas = ETAPAS[situacion]
+    for etapa in ORDEN_ETAPAS:
+        if etapa not in etapas:
+            fila += ["", "", "", ""]
+            continue
+        oficio, publicacion_sat = _oficio(azar, fecha)
+        dof = fecha + timedelta(days=azar.randint(10, 60))
+        publicacion_dof = dof.strftime("%d/%m/%Y")
+        if etapa == "sentencia" and azar.random() < 0.03:
+            # Dos resoluciones en la misma celda, como en el listado real
+            anterior = fecha - timedelta(days=azar.randint(200, 400))
+            oficio = f"{oficio} // {_oficio(azar, anterior)[0]}"
+            publicacion_sat = f"{publicacion_sat} - {anterior.strftime('%d/%m/%Y')}"
+        elif azar.random() < 0.01:
+            publicacion_dof = ""
+        fila += [oficio, publicacion_sat, oficio, publicacion_dof]
+        fecha += timedelta(days=azar.randint(90, 500))
+
+    return fila + [""] * COLUMNAS_SOBRANTES
+
+# ---------------------------------------------------------
+# Archivos
+# ---------------------------------------------------------
+
+def _abrir(ruta, codificacion):
+    archivo = open(ruta, "w", newline="", encoding=codificacion, errors="replace")
+    writer = csv.writer(archivo)
+    ancho = len(ENCABEZADOS) + COLUMNAS_SOBRANTES
+    writer.writerow([TEXTO_LEGAL] + [""] * (ancho - 1))
+    writer.writerow([TITULO] + [""] * (ancho - 1))
+    writer.writerow(ENCABEZADOS + [""] * COLUMNAS_SOBRANTES)
+    return archivo, writer
+
+
+def generar(carpeta, escala=1, semilla=69):
+    """
+    Escribe los cinco CSV en 'carpeta'. Devuelve {archivo: filas} y la
+    muestra de RFCs y nombres que usan las búsquedas del benchmark.
+    """
+    os.makedirs(carpeta, exist_ok=True)
+    azar = random.Random(semilla)
+
+    listado, writer_listado = _abrir(os.path.join(carpeta, ARCHIVO_LISTADO), "latin1")
+    filas = {ARCHIVO_LISTADO: 0}
+    muestra = {"rfcs": [], "nombres": []}
+    numero = 0
+    try:
+        for situacion, reales in FILAS_REALES.items():
+            archivo, writer = _abrir(os.path.join(carpeta, ARCHIVOS[situacion]), "utf-8-sig")
+            with archivo:
+                for i in range(1, int(reales * escala) + 1):
+                    numero += 1
+                    fila = _fila(azar, i, situacion)
+                    writer.writerow(fila)
+                    writer_listado.writerow([numero] + fila[1:])
+                    if fila[1] and azar.random() < 0.01:
+                        muestra["rfcs"].append(fila[1].replace(" ", "").upper())
+                        muestra["nombres"].append(fila[2].split(",")[0])
+                filas[ARCHIVOS[situacion]] = i
+        filas[ARCHIVO_LISTADO] = numero
+    finally:
+        listado.close()
+
+    return filas, muestra
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Listados 69-B sintéticos")
+    parser.add_argument("--escala", type=float, default=1, help="Múltiplo del tamaño real (1 = 13,940 filas)")
+    parser.add_argument("--carpeta", default="datos_sinteticos")
+    parser.add_argument("--semilla", type=int, default=69)
+    args = parser.parse_args()
+
+    filas, _ = generar(args.carpeta, args.escala, args.semilla)
+    for nombre, total in filas.items():
+        ruta = os.path.join(args.carpeta, nombre)
+        print(f"✅ {ruta:<50} {total:>10} filas {os.path.getsize(ruta) / 1048576:>8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
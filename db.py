@@ -0,0 +1,251 @@
+"""
+Capa de conexiones a la base de datos
+Pool de conexiones reutilizables por proceso (cada worker de gunicorn tiene
+el suyo) con verificación previa (pre-ping), reciclado por antigüedad,
+tiempo máximo de espera y estadísticas de uso.
+
+Las conexiones se devuelven al pool con conn.close(), así que el código
+existente que abre y cierra conexiones no necesita cambios.
+"""
+
+import os
+import time
+import queue
+import threading
+
+import mysql.connector
+from config import DB_CONFIG, DB_POOL_CONFIG
+from metricas import medir_cursor
+from perfilado import vigilar_cursor
+
+
+class PoolAgotado(Exception):
+    """No hubo una conexión libre dentro del tiempo de espera configurado"""
+
+# ---------------------------------------------------------
+# Conexión prestada por el pool
+# ---------------------------------------------------------
+
+class ConexionPool:
+    """Envuelve una conexión real; close() la devuelve al pool en lugar de cerrarla"""
+
+    def __init__(self, pool, conexion, creada):
+        self._pool = pool
+        self._conexion = conexion
+        self._creada = creada
+
+    def __getattr__(self, nombre):
+        if self._conexion is None:
+            raise AttributeError(f"La conexión ya fue devuelta al pool ({nombre})")
+        return getattr(self._conexion, nombre)
+
+    def cursor(self, *args, **kwargs):
+        # Cada execute cuenta en las métricas de la ruta o trabajo en curso;
+        # las consultas lentas se registran con un EXPLAIN en esta misma conexión
+        return vigilar_cursor(
+            medir_cursor(self.__getattr__("cursor")(*args, **kwargs)),
+            lambda: self.__getattr__("cursor")(dictionary=True)
+        )
+
+    def close(self):
+        if self._conexion is not None:
+            conexion, self._conexion = self._conexion, None
+            self._pool._devolver(conexion, self._creada)
+
+    def descartar(self):
+        """Cierra la conexión real en lugar de devolverla (p. ej. con resultados sin leer)"""
+        if self._conexion is not None:
+            conexion, self._conexion = self._conexion, None
+            self._pool._descartar(conexion)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __del__(self):
+        # Evita fugas si una ruta termina sin cerrar la conexión
+        try:
+            self.close()
+        except Exception:
+            pass
+
+# ---------------------------------------------------------
+# Pool
+# ---------------------------------------------------------
+
+class PoolConexiones:
+
+    def __init__(self, fabrica, tamano=10, pre_ping=True, reciclar_segundos=1800, timeout_segundos=10):
+        self.fabrica = fabrica
+        self.tamano = tamano
+        self.pre_ping = pre_ping
+        self.reciclar_segundos = reciclar_segundos
+        self.timeout_segundos = timeout_segundos
+
+        self._inactivas = queue.LifoQueue()
+        self._cupos = threading.BoundedSemaphore(tamano)
+        self._lock = threading.Lock()
+        self._stats = {
+            "en_uso": 0,
+            "creadas": 0,
+            "prestamos": 0,
+            "esperas": 0,
+            "timeouts": 0,
+            "recicladas": 0,
+            "descartadas": 0,
+            "espera_total_ms": 0.0,
+            "espera_max_ms": 0.0
+        }
+
+    def _sumar(self, **valores):
+        with self._lock:
+            for clave, valor in valores.items():
+                self._stats[clave] += valor
+
+    def _esta_viva(self, conexion):
+        try:
+            if hasattr(conexion, "ping"):
+                conexion.ping(reconnect=False)
+            else:
+                cursor = conexion.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def _cerrar(self, conexion):
+        try:
+            conexion.close()
+        except Exception:
+            pass
+
+    def _tomar_inactiva(self):
+        while True:
+            try:
+                conexion, creada = self._inactivas.get_nowait()
+            except queue.Empty:
+                return None, None
+
+            if self.reciclar_segundos and time.monotonic() - creada > self.reciclar_segundos:
+                self._cerrar(conexion)
+                self._sumar(recicladas=1)
+                continue
+
+            if self.pre_ping and not self._esta_viva(conexion):
+                self._cerrar(conexion)
+                self._sumar(descartadas=1)
+                continue
+
+            return conexion, creada
+
+    def obtener(self):
+        inicio = time.perf_counter()
+
+        if not self._cupos.acquire(blocking=False):
+            self._sumar(esperas=1)
+            if not self._cupos.acquire(timeout=self.timeout_segundos):
+                self._sumar(timeouts=1)
+                raise PoolAgotado(
+                    f"Sin conexiones libres después de {self.timeout_segundos}s (tamaño {self.tamano})"
+                )
+
+        try:
+            conexion, creada = self._tomar_inactiva()
+            if conexion is None:
+                conexion = self.fabrica()
+                creada = time.monotonic()
+                self._sumar(creadas=1)
+        except Exception:
+            self._cupos.release()
+            raise
+
+        espera_ms = (time.perf_counter() - inicio) * 1000
+        with self._lock:
+            self._stats["en_uso"] += 1
+            self._stats["prestamos"] += 1
+            self._stats["espera_total_ms"] += espera_ms
+            self._stats["espera_max_ms"] = max(self._stats["espera_max_ms"], espera_ms)
+
+        return ConexionPool(self, conexion, creada)
+
+    def _devolver(self, conexion, creada):
+        try:
+            # Descarta transacciones abiertas que la ruta no confirmó
+            conexion.rollback()
+            self._inactivas.put((conexion, creada))
+        except Exception:
+            self._cerrar(conexion)
+            self._sumar(descartadas=1)
+        finally:
+            self._sumar(en_uso=-1)
+            self._cupos.release()
+
+    def _descartar(self, conexion):
+        self._cerrar(conexion)
+        self._sumar(descartadas=1, en_uso=-1)
+        self._cupos.release()
+
+    def estadisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats["tamano"] = self.tamano
+        stats["inactivas"] = self._inactivas.qsize()
+        stats["espera_promedio_ms"] = round(stats["espera_total_ms"] / stats["prestamos"], 3) if stats["prestamos"] else 0.0
+        stats["espera_total_ms"] = round(stats["espera_total_ms"], 3)
+        stats["espera_max_ms"] = round(stats["espera_max_ms"], 3)
+        return stats
+
+    def cerrar(self):
+        while True:
+            try:
+                conexion, _ = self._inactivas.get_nowait()
+            except queue.Empty:
+                break
+            self._cerrar(conexion)
+
+# ---------------------------------------------------------
+# Pool del proceso
+# ---------------------------------------------------------
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool():
+    """Crea el pool de forma perezosa; se recrea si el proceso fue bifurcado (fork)"""
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        with _pool_lock:
+            if _pool is None or _pool_pid != os.getpid():
+                _pool = PoolConexiones(
+                    lambda: mysql.connector.connect(**DB_CONFIG),
+                    tamano=DB_POOL_CONFIG["tamano"],
+                    pre_ping=DB_POOL_CONFIG["pre_ping"],
+                    reciclar_segundos=DB_POOL_CONFIG["reciclar_segundos"],
+                    timeout_segundos=DB_POOL_CONFIG["timeout_segundos"]
+                )
+                _pool_pid = os.getpid()
+    return _pool
+
+
+def usar_pool(pool):
+    """Sustituye el pool del proceso (benchmarks con una base local)"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        _pool = pool
+        _pool_pid = os.getpid()
+
+
+def obtener_conexion():
+    return obtener_pool().obtener()
+
+
+def estadisticas_pool():
+    stats = obtener_pool().estadisticas()
+    stats["pid"] = os.getpid()
+    return stats
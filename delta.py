@@ -0,0 +1,233 @@
+"""
+Importación incremental (delta) por hash de fila
+Cada fila guarda en hash_fila el MD5 de sus columnas de datos, calculado
+siempre por MySQL con la misma expresión, así que el hash de la tabla viva y
+el de la carga nueva son comparables. La carga nueva se escribe primero en
+una tabla de staging; después se comparan los hashes por RFC y en la tabla
+viva solo se aplican las altas, cambios y bajas, en una sola transacción:
+los id de las filas afectadas van a una tabla temporal y se aplican con un
+DELETE y un INSERT ... SELECT con JOIN.
+Los cambios de situación (p. ej. Presunto → Definitivo) quedan en
+Cambios_Situacion.
+
+'numero' no entra en el hash: el SAT renumera el listado en cada
+publicación y una fila nueva desplazaría el número de todas las
+siguientes. El número se actualiza en su lugar en las filas sin cambios.
+"""
+
+from collections import defaultdict
+
+# Columnas que no forman parte del contenido publicado por el SAT (o que
+# cambian en cada publicación sin que cambie el contribuyente)
+COLUMNAS_SIN_HASH = {"hash_fila", "nombre_busqueda", "fecha_actualizacion", "numero"}
+
+TABLA_DELTA = "tmp_delta_filas"
+TAMANO_BLOQUE = 5000
+
+# ---------------------------------------------------------
+# Hash de fila
+# ---------------------------------------------------------
+
+def columnas_hash(cursor, tabla):
+    """Columnas de datos en orden alfabético (sin autoincrementales ni auxiliares)"""
+    cursor.execute(f"DESCRIBE {tabla}")
+    columnas = [
+        col["Field"] for col in cursor.fetchall()
+        if col["Field"] not in COLUMNAS_SIN_HASH and "auto_increment" not in (col.get("Extra") or "")
+    ]
+    return sorted(columnas)
+
+
+def expresion_hash(columnas):
+    """MD5 de los valores separados por el carácter 31; NULL cuenta como vacío"""
+    valores = ", ".join(f"COALESCE(CAST({c} AS CHAR), '')" for c in columnas)
+    return f"MD5(CONCAT_WS(CHAR(31), {valores}))"
+
+
+def tiene_hash(cursor, tabla):
+    cursor.execute(f"SHOW COLUMNS FROM {tabla} LIKE 'hash_fila'")
+    return cursor.fetchone() is not None
+
+
+def actualizar_hashes(cursor, tabla, columnas=None, solo_vacios=True):
+    """Calcula hash_fila en el servidor; no hace nada si la migración 006 no se aplicó"""
+    if not tiene_hash(cursor, tabla):
+        return 0
+    columnas = columnas or columnas_hash(cursor, tabla)
+    where = "WHERE hash_fila IS NULL" if solo_vacios else ""
+    cursor.execute(f"UPDATE {tabla} SET hash_fila = {expresion_hash(columnas)} {where}")
+    return cursor.rowcount
+
+# ---------------------------------------------------------
+# Comparación
+# ---------------------------------------------------------
+
+def _estado_por_rfc(cursor, tabla):
+    """{rfc: [(hash, situacion, id), ...]} leído por bloques"""
+    cursor.execute(f"SELECT id, rfc, hash_fila, situacion_contribuyente FROM {tabla}")
+    estado = defaultdict(list)
+    while True:
+        filas = cursor.fetchmany(TAMANO_BLOQUE)
+        if not filas:
+            break
+        for fila in filas:
+            estado[fila["rfc"]].append((fila["hash_fila"], fila["situacion_contribuyente"], fila["id"]))
+    return estado
+
+
+def _ids_por_hash(filas):
+    ids = defaultdict(list)
+    for h, _, id_fila in filas:
+        ids[h].append(id_fila)
+    return ids
+
+
+def comparar(actual, nuevo):
+    """
+    Compara los hashes de cada RFC como multiconjuntos (un RFC puede
+    aparecer varias veces). Devuelve (altas, cambios, bajas, sin_cambios,
+    transiciones): altas son (rfc, hash, id_staging); bajas son
+    (rfc, hash, id_viva); cambios son (rfc, id_viva, id_staging);
+    transiciones son (rfc, situacion_anterior, situacion_nueva).
+    """
+    altas, cambios, bajas, transiciones = [], [], [], []
+    sin_cambios = 0
+
+    for rfc in actual.keys() | nuevo.keys():
+        anteriores = _ids_por_hash(actual.get(rfc, []))
+        nuevos = _ids_por_hash(nuevo.get(rfc, []))
+
+        restantes = []
+        solo_nuevos = []
+        for h, ids in anteriores.items():
+            comunes = min(len(ids), len(nuevos.get(h, ())))
+            sin_cambios += comunes
+            restantes.extend((h, i) for i in ids[comunes:])
+        for h, ids in nuevos.items():
+            comunes = min(len(ids), len(anteriores.get(h, ())))
+            solo_nuevos.extend((h, i) for i in ids[comunes:])
+
+        pares = min(len(restantes), len(solo_nuevos))
+        cambios.extend((rfc, viejo, i) for (_, viejo), (_, i) in zip(restantes[:pares], solo_nuevos[:pares]))
+        bajas.extend((rfc, h, i) for h, i in restantes[pares:])
+        altas.extend((rfc, h, i) for h, i in solo_nuevos[pares:])
+
+        situacion_anterior = actual[rfc][0][1] if rfc in actual else None
+        situacion_nueva = nuevo[rfc][0][1] if rfc in nuevo else None
+        if situacion_anterior != situacion_nueva:
+            transiciones.append((rfc, situacion_anterior, situacion_nueva))
+
+    return altas, cambios, bajas, sin_cambios, transiciones
+
+# ---------------------------------------------------------
+# Aplicación
+# ---------------------------------------------------------
+
+def cargar_filas_delta(cursor, eliminar, insertar):
+    """
+    Tabla temporal de sesión con los id de las filas a eliminar de la tabla
+    viva (origen 'v') y a copiar de staging (origen 's'), para aplicar el
+    delta con un solo DELETE y un solo INSERT con JOIN por llave primaria.
+    """
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {TABLA_DELTA}")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {TABLA_DELTA} (
+            origen CHAR(1) NOT NULL,
+            id BIGINT NOT NULL,
+            PRIMARY KEY (origen, id)
+        )
+    """)
+    filas = [("v", i) for i in eliminar] + [("s", i) for i in insertar]
+    for inicio in range(0, len(filas), TAMANO_BLOQUE):
+        cursor.executemany(
+            f"INSERT INTO {TABLA_DELTA} (origen, id) VALUES (%s, %s)", filas[inicio:inicio + TAMANO_BLOQUE]
+        )
+
+
+def renumerar(cursor, tabla, staging):
+    """Copia 'numero' de staging a las filas con el mismo RFC y hash (UPDATE con JOIN por idx_rfc_hash)"""
+    cursor.execute(f"""
+        UPDATE {tabla} t
+        JOIN {staging} s ON s.rfc = t.rfc AND s.hash_fila = t.hash_fila
+        SET t.numero = s.numero
+        WHERE NOT (t.numero <=> s.numero)
+    """)
+    return cursor.rowcount
+
+
+def aplicar_delta(conn, cursor, tabla, staging, respaldar=None):
+    """
+    Aplica en 'tabla' solo las diferencias con 'staging' (misma estructura).
+    Un cambio se aplica como baja de la fila anterior y alta de la nueva.
+    'respaldar(filtro)' se llama antes de modificar la tabla cuando hay filas
+    que se eliminan o reemplazan; 'filtro' es la condición SQL que las
+    selecciona en 'tabla'. Devuelve un resumen con los conteos.
+    """
+    if not tiene_hash(cursor, tabla):
+        raise ValueError(
+            f"{tabla} no tiene la columna hash_fila; aplica las migraciones (python migraciones.py)"
+        )
+
+    columnas = columnas_hash(cursor, tabla)
+    actualizar_hashes(cursor, tabla, columnas)
+    actualizar_hashes(cursor, staging, columnas, solo_vacios=False)
+    conn.commit()
+
+    altas, cambios, bajas, sin_cambios, transiciones = comparar(
+        _estado_por_rfc(cursor, tabla), _estado_por_rfc(cursor, staging)
+    )
+
+    # Columnas que se copian de staging (incluye auxiliares como nombre_busqueda)
+    cursor.execute(f"DESCRIBE {tabla}")
+    copiar = [
+        col["Field"] for col in cursor.fetchall()
+        if col["Field"] != "fecha_actualizacion" and "auto_increment" not in (col.get("Extra") or "")
+    ]
+    columnas_sql = ", ".join(copiar)
+    columnas_staging = ", ".join(f"s.{c}" for c in copiar)
+
+    eliminar = [i for _, _, i in bajas] + [viejo for _, viejo, _ in cambios]
+    insertar = [i for _, _, i in altas] + [i for _, _, i in cambios]
+
+    try:
+        cargar_filas_delta(cursor, eliminar, insertar)
+        # Confirmadas aparte: un rollback del respaldo no debe vaciar la tabla temporal
+        conn.commit()
+        if eliminar and respaldar:
+            respaldar(f"id IN (SELECT id FROM {TABLA_DELTA} WHERE origen = 'v')")
+
+        if eliminar:
+            cursor.execute(f"""
+                DELETE t FROM {tabla} t
+                JOIN {TABLA_DELTA} k ON k.id = t.id
+                WHERE k.origen = 'v'
+            """)
+        if insertar:
+            cursor.execute(f"""
+                INSERT INTO {tabla} ({columnas_sql})
+                SELECT {columnas_staging} FROM {staging} s
+                JOIN {TABLA_DELTA} k ON k.id = s.id
+                WHERE k.origen = 's'
+            """)
+        if transiciones:
+            cursor.executemany("""
+                INSERT INTO Cambios_Situacion (tabla, rfc, situacion_anterior, situacion_nueva)
+                VALUES (%s, %s, %s, %s)
+            """, [(tabla, *t) for t in transiciones])
+        renumeradas = renumerar(cursor, tabla, staging)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {TABLA_DELTA}")
+
+    return {
+        "tabla": tabla,
+        "altas": len(altas),
+        "cambios": len(cambios),
+        "bajas": len(bajas),
+        "sin_cambios": sin_cambios,
+        "renumeradas": renumeradas,
+        "transiciones": len(transiciones)
+    }
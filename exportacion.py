@@ -0,0 +1,41 @@
+"""
+Exportación de tablas a CSV por streaming
+Las filas se leen del servidor por bloques con un cursor sin buffer y cada
+bloque se escribe, se codifica (y opcionalmente se comprime con gzip) y se
+entrega de inmediato, así que la memoria del worker no depende del tamaño
+de la tabla.
+"""
+
+import io
+import csv
+import zlib
+
+TAMANO_BLOQUE = 1000
+
+
+def generar_csv(cursor, columnas, comprimir=False, tamano_bloque=TAMANO_BLOQUE):
+    """Genera el CSV en fragmentos de bytes a partir de un cursor ya ejecutado"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    compresor = zlib.compressobj(wbits=31) if comprimir else None  # 31 = formato gzip
+
+    def vaciar():
+        datos = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return compresor.compress(datos) if compresor else datos
+
+    writer.writerow(columnas)
+    yield vaciar()
+
+    while True:
+        filas = cursor.fetchmany(tamano_bloque)
+        if not filas:
+            break
+        writer.writerows(fila.values() if isinstance(fila, dict) else fila for fila in filas)
+        fragmento = vaciar()
+        if fragmento:
+            yield fragmento
+
+    if compresor:
+        yield compresor.flush()
@@ -0,0 +1,12 @@
+"""
+Configuración de gunicorn (se lee sola desde el directorio de trabajo)
+Con threads > 1 gunicorn usa el worker gthread: cada worker atiende
+GUNICORN_CONFIG['hilos'] peticiones a la vez, y el pool de conexiones de
+db.py se dimensiona con el mismo valor (DB_POOL_CONFIG en config.py).
+"""
+
+from config import GUNICORN_CONFIG
+
+bind = "0.0.0.0:8000"
+workers = GUNICORN_CONFIG["workers"]
+threads = GUNICORN_CONFIG["hilos"]
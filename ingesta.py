@@ -0,0 +1,631 @@
+"""
+Ingesta por lotes de los CSV del SAT (/carga_csv)
+El archivo se lee en bloques de IMPORT_CONFIG['tamano_lote'] filas; cada
+bloque se normaliza (RFC, nombre de búsqueda, fechas) y se inserta en su
+propia transacción, así que la memoria no depende del tamaño del archivo.
+
+Con IMPORT_CONFIG['load_data_local'] los bloques normalizados se escriben en
+un archivo temporal que se carga con un solo LOAD DATA LOCAL INFILE.
+
+La carga se hace en una tabla de staging con la misma estructura; al
+validarla se intercambia con la tabla viva en un solo RENAME TABLE. La
+generación anterior se guarda después en el almacén de backups (backups.py)
+y su tabla se elimina; 'procesar_restauracion' hace el camino inverso.
+"""
+
+import os
+import time
+import uuid
+import itertools
+import tempfile
+from datetime import datetime
+
+import pandas as pd
+import mysql.connector
+
+from config import DB_CONFIG, IMPORT_CONFIG
+from db import obtener_conexion
+from normalizacion import normalizar_columna_rfc, agregar_nombre_busqueda, normalizar_fechas
+from cache_datos import incrementar_version
+from resumen import refrescar_precalculados
+from rfc_index import reconstruir_si_habilitado
+from snapshot import programar_snapshot_si_habilitado
+from delta import aplicar_delta, actualizar_hashes
+from backups import respaldar_tabla, limpiar_backups, obtener_backup, leer_snapshot, MOTIVOS_PARCIALES
+from metricas import observar, sumar
+
+# ---------------------------------------------------------
+# Mapeo de encabezados del CSV → columnas de la base
+# ---------------------------------------------------------
+
+MAPEO_DEFINITIVOS = {
+    "No.": "numero",
+    "RFC": "rfc",
+    "Nombre del Contribuyente": "nombre_contribuyente",
+    "Situación del contribuyente": "situacion_contribuyente",
+    "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
+    "Publicación página SAT presuntos": "publicacion_sat_presuntos",
+    "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
+    "Publicación DOF presuntos": "publicacion_dof_presuntos",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
+    "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
+    "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados",
+    "Número y fecha de oficio global de definitivos SAT": "oficio_definitivo_sat",
+    "Publicación página SAT definitivos": "publicacion_sat_definitivos",
+    "Número y fecha de oficio global de definitivos DOF": "oficio_definitivo_dof",
+    "Publicación DOF definitivos": "publicacion_dof_definitivos",
+    "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
+    "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
+    "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
+    "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
+}
+
+MAPEO_PRESUNTOS = {
+    "No.": "numero",
+    "RFC": "rfc",
+    "Nombre del Contribuyente": "nombre_contribuyente",
+    "Situación del contribuyente": "situacion_contribuyente",
+    "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
+    "Publicación página SAT presuntos": "publicacion_sat_presuntos",
+    "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
+    "Publicación DOF presuntos": "publicacion_dof_presuntos"
+}
+
+MAPEO_DESVIRTUADOS = {
+    "No.": "numero",
+    "RFC": "rfc",
+    "Nombre del Contribuyente": "nombre_contribuyente",
+    "Situación del contribuyente": "situacion_contribuyente",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
+    "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
+    "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados"
+}
+
+MAPEO_SENTENCIAS = {
+    "No.": "numero",
+    "RFC": "rfc",
+    "Nombre del Contribuyente": "nombre_contribuyente",
+    "Situación del contribuyente": "situacion_contribuyente",
+    "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
+    "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
+    "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
+    "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
+}
+
+MAPEO_LISTADO_COMPLETO = {
+    "No.": "numero",
+    "RFC": "rfc",
+    "Nombre del Contribuyente": "nombre_contribuyente",
+    "Situación del contribuyente": "situacion_contribuyente",
+    "Número y fecha de oficio global de presunción SAT": "oficio_presuncion_sat",
+    "Publicación página SAT presuntos": "publicacion_sat_presuntos",
+    "Número y fecha de oficio global de presunción DOF": "oficio_presuncion_dof",
+    "Publicación DOF presuntos": "publicacion_dof_presuntos",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron SAT": "oficio_desvirtuado_sat",
+    "Publicación página SAT desvirtuados": "publicacion_sat_desvirtuados",
+    "Número y fecha de oficio global de contribuyentes que desvirtuaron DOF": "oficio_desvirtuado_dof",
+    "Publicación DOF desvirtuados": "publicacion_dof_desvirtuados",
+    "Número y fecha de oficio global de definitivos SAT": "oficio_definitivo_sat",
+    "Publicación página SAT definitivos": "publicacion_sat_definitivos",
+    "Número y fecha de oficio global de definitivos DOF": "oficio_definitivo_dof",
+    "Publicación DOF definitivos": "publicacion_dof_definitivos",
+    "Número y fecha de oficio global de sentencia favorable SAT": "oficio_sentencia_sat",
+    "Publicación página SAT sentencia favorable": "publicacion_sat_sentencia",
+    "Número y fecha de oficio global de sentencia favorable DOF": "oficio_sentencia_dof",
+    "Publicación DOF sentencia favorable": "publicacion_dof_sentencia"
+}
+
+MAPEOS = {
+    "Definitivos": MAPEO_DEFINITIVOS,
+    "Presuntos": MAPEO_PRESUNTOS,
+    "Desvirtuados": MAPEO_DESVIRTUADOS,
+    "SentenciasFavorables": MAPEO_SENTENCIAS,
+    "Listado_Completo_69_B": MAPEO_LISTADO_COMPLETO
+}
+
+COLUMNAS_FECHA = [
+    "publicacion_sat_presuntos",
+    "publicacion_dof_presuntos",
+    "publicacion_sat_desvirtuados",
+    "publicacion_dof_desvirtuados",
+    "publicacion_sat_definitivos",
+    "publicacion_dof_definitivos",
+    "publicacion_sat_sentencia",
+    "publicacion_dof_sentencia",
+    "fecha_actualizacion"
+]
+
+# ---------------------------------------------------------
+# Lectura y normalización
+# ---------------------------------------------------------
+
+def leer_texto_legal(stream):
+    """Las dos primeras líneas del CSV (texto legal del SAT) sin leer el resto"""
+    stream.seek(0)
+    linea1 = stream.readline().decode("latin1").rstrip("\r\n")
+    linea2 = stream.readline().decode("latin1").rstrip("\r\n")
+    stream.seek(0)
+    return linea1, linea2
+
+
+def normalizar_lote(df, tabla):
+    """Devuelve (df, sin_rfc, rfc_invalidos, conteo_fechas) listo para insertar"""
+    df = df.rename(columns=MAPEOS.get(tabla, {}))
+    df, sin_rfc, rfc_invalidos = normalizar_columna_rfc(df)
+    df = agregar_nombre_busqueda(df)
+    df, fechas = normalizar_fechas(df, COLUMNAS_FECHA)
+    return df, sin_rfc, rfc_invalidos, fechas
+
+
+def leer_lotes(stream, tabla, tamano_lote=None, codificacion="utf-8"):
+    """Genera (df, sin_rfc, rfc_invalidos, conteo_fechas) por bloque; encabezados en la línea 3"""
+    tamano_lote = tamano_lote or IMPORT_CONFIG["tamano_lote"]
+    for bloque in pd.read_csv(stream, header=2, chunksize=tamano_lote, encoding=codificacion):
+        yield normalizar_lote(bloque, tabla)
+
+
+def filas_lote(df, columnas):
+    """Filas como listas de Python con None en lugar de NaN"""
+    df = df.reindex(columns=columnas).astype(object)
+    return df.where(pd.notnull(df), None).values.tolist()
+
+# ---------------------------------------------------------
+# Escritura
+# ---------------------------------------------------------
+
+def insertar_lotes(conn, cursor, tabla, columnas, lotes, progreso=None):
+    """Un executemany y un commit por bloque; progreso(total) después de cada uno"""
+    placeholders = ", ".join(["%s"] * len(columnas))
+    query = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({placeholders})"
+
+    total = 0
+    for filas in lotes:
+        if not filas:
+            continue
+        cursor.executemany(query, filas)
+        conn.commit()
+        total += len(filas)
+        if progreso:
+            progreso(total)
+    return total
+
+
+def local_infile_habilitado(cursor):
+    """El servidor debe aceptar LOAD DATA LOCAL (variable local_infile)"""
+    try:
+        cursor.execute("SHOW GLOBAL VARIABLES LIKE 'local_infile'")
+        fila = cursor.fetchone()
+    except Exception:
+        return False
+    if not fila:
+        return False
+    valor = fila["Value"] if isinstance(fila, dict) else fila[1]
+    return str(valor).upper() in ("ON", "1")
+
+
+def _valor_archivo(valor):
+    if valor is None:
+        return "NULL"
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return '"' + str(valor).replace('"', '""') + '"'
+
+
+def cargar_load_data(tabla, columnas, lotes):
+    """
+    Escribe los bloques normalizados en un archivo temporal y los carga con
+    LOAD DATA LOCAL INFILE en una conexión dedicada (allow_local_infile).
+    NULL sin comillas se lee como NULL; "NULL" entre comillas es texto.
+    """
+    archivo = tempfile.NamedTemporaryFile("w", encoding="utf-8", suffix=".csv", newline="", delete=False)
+    total = 0
+    try:
+        with archivo:
+            for filas in lotes:
+                for fila in filas:
+                    archivo.write(",".join(_valor_archivo(v) for v in fila) + "\n")
+                total += len(filas)
+
+        conn = mysql.connector.connect(**DB_CONFIG, allow_local_infile=True)
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"""
+                LOAD DATA LOCAL INFILE %s
+                INTO TABLE {tabla}
+                CHARACTER SET utf8mb4
+                FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+                LINES TERMINATED BY '\\n'
+                ({', '.join(columnas)})
+            """, (archivo.name,))
+            conn.commit()
+            cursor.close()
+        finally:
+            conn.close()
+    finally:
+        os.remove(archivo.name)
+
+    return total
+
+
+def cargar(conn, cursor, tabla, columnas, lotes, modo="lotes", progreso=None):
+    """
+    Inserta los bloques (listas de filas) con el modo indicado.
+    Devuelve {'modo', 'registros', 'segundos', 'filas_por_segundo'}.
+    """
+    inicio = time.perf_counter()
+    if modo == "load_data":
+        total = cargar_load_data(tabla, columnas, lotes)
+        if progreso:
+            progreso(total)
+    else:
+        total = insertar_lotes(conn, cursor, tabla, columnas, lotes, progreso)
+    segundos = time.perf_counter() - inicio
+
+    return {
+        "modo": modo,
+        "registros": total,
+        "segundos": round(segundos, 3),
+        "filas_por_segundo": round(total / segundos) if segundos > 0 else total
+    }
+
+# ---------------------------------------------------------
+# Tabla de staging e intercambio atómico
+# ---------------------------------------------------------
+
+def crear_staging(cursor, tabla, sufijo):
+    """
+    Tabla vacía con las mismas columnas e índices (incluido FULLTEXT). El
+    nombre lleva un sufijo aleatorio: dos cargas de la misma tabla en el
+    mismo segundo no comparten (ni borran) la tabla de la otra.
+    """
+    staging = f"{tabla}_staging_{sufijo}_{uuid.uuid4().hex[:8]}"
+    cursor.execute(f"CREATE TABLE {staging} LIKE {tabla}")
+    return staging
+
+
+def nombre_backup(tabla, fecha):
+    """Nombre de la generación reemplazada; mismo sufijo aleatorio que el staging"""
+    return f"{tabla}_backup_{fecha}_{uuid.uuid4().hex[:8]}"
+
+
+def validar_staging(cursor, staging, esperados):
+    """La tabla nueva no puede quedar vacía ni con menos filas de las cargadas"""
+    cursor.execute(f"SELECT COUNT(*) AS total FROM {staging}")
+    fila = cursor.fetchone()
+    total = fila["total"] if isinstance(fila, dict) else fila[0]
+    if total == 0:
+        raise ValueError("La carga no produjo registros; la tabla actual no se modificó")
+    if total != esperados:
+        raise ValueError(
+            f"La tabla de carga tiene {total} registros y se esperaban {esperados}; "
+            f"la tabla actual no se modificó"
+        )
+    return total
+
+
+def intercambiar(cursor, tabla, staging, backup):
+    """
+    RENAME TABLE de varias tablas es atómico: ninguna consulta ve la tabla
+    vacía o a medias. La generación anterior queda como 'backup'.
+    """
+    cursor.execute(f"RENAME TABLE {tabla} TO {backup}, {staging} TO {tabla}")
+
+
+def descartar_staging(cursor, staging):
+    try:
+        cursor.execute(f"DROP TABLE IF EXISTS {staging}")
+    except Exception as e:
+        print(f"⚠️ No se pudo eliminar la tabla de carga {staging}: {e}")
+
+
+def respaldar_generacion(trabajo, conn, cursor, origen, tabla, motivo, eliminar=True, filtro=None):
+    """
+    Guarda 'origen' en el almacén de backups y aplica la retención. Si falla
+    (p. ej. falta la migración 007) la tabla 'origen' se conserva como antes.
+    Con 'eliminar' la tabla se borra solo cuando el backup ya está confirmado.
+    Con 'filtro' solo se guardan esas filas (backup parcial, no restaurable).
+    """
+    try:
+        respaldo = respaldar_tabla(cursor, origen, tabla, motivo, filtro=filtro)
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        if eliminar:
+            trabajo.aviso("warning", f"⚠️ No se pudo comprimir el backup ({e}); se conserva la tabla "
+                                     f"<strong>{origen}</strong>")
+        else:
+            trabajo.aviso("warning", f"⚠️ No se pudo crear el backup previo: {e}")
+        return None
+
+    if eliminar:
+        try:
+            cursor.execute(f"DROP TABLE IF EXISTS {origen}")
+        except Exception as e:
+            trabajo.aviso("warning", f"⚠️ El backup #{respaldo['id']} se creó pero no se pudo eliminar la tabla "
+                                     f"<strong>{origen}</strong>: {e}")
+
+    try:
+        limpiar_backups(conn, cursor)
+    except Exception as e:
+        conn.rollback()
+        trabajo.aviso("warning", f"⚠️ No se pudo aplicar la retención de backups: {e}")
+
+    detalle = "contenido idéntico a un backup existente" if respaldo["deduplicado"] else \
+        f"{respaldo['bytes'] // 1024} KB comprimido"
+    trabajo.aviso(
+        "info",
+        f"✅ Backup #{respaldo['id']} creado correctamente: {respaldo['registros']} registros ({detalle})"
+    )
+    return respaldo
+
+# ---------------------------------------------------------
+# Carga completa (trabajo en segundo plano de /carga_csv)
+# ---------------------------------------------------------
+
+def procesar_carga(trabajo, ruta, nombre_archivo, tabla, incremental=False):
+    """
+    Reemplaza 'tabla' con el CSV en 'ruta'. Reporta filas leídas e insertadas
+    con trabajo.avanzar() y los avisos para el usuario con trabajo.aviso().
+    Con 'incremental' solo se aplican las diferencias (delta.py) en lugar
+    de intercambiar la tabla completa.
+    Cualquier error deja la tabla viva sin cambios.
+    """
+    conn = None
+    cursor = None
+    staging = None
+    inicio = time.perf_counter()
+
+    try:
+        with open(ruta, "rb") as archivo:
+            # Leer CSV por bloques (encabezados en línea 3)
+            trabajo.avanzar(etapa="leyendo", filas_leidas=0, filas_insertadas=0)
+            linea1, linea2 = leer_texto_legal(archivo)
+            lotes = leer_lotes(archivo, tabla)
+
+            primero = next(lotes, None)
+            if primero is None or primero[0].empty:
+                raise ValueError("El archivo CSV está vacío")
+
+            conn = obtener_conexion()
+            cursor = conn.cursor(dictionary=True)
+
+            # Validar columnas con el primer bloque
+            cursor.execute(f"DESCRIBE {tabla}")
+            columnas_tabla = [col["Field"] for col in cursor.fetchall()]
+
+            columnas_validas = [c for c in primero[0].columns if c in columnas_tabla]
+            if not columnas_validas:
+                raise ValueError("El CSV no contiene columnas válidas para esta tabla. No se realizaron cambios.")
+
+            modo = "lotes"
+            if IMPORT_CONFIG["load_data_local"] and local_infile_habilitado(cursor):
+                modo = "load_data"
+
+            # Cargar en una tabla de staging; la tabla viva no se toca hasta el intercambio
+            fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+            tabla_backup = nombre_backup(tabla, fecha)
+            staging = crear_staging(cursor, tabla, fecha)
+            conn.commit()
+
+            # Insertar datos nuevos bloque por bloque
+            descartes = {"sin_rfc": 0, "rfc_invalidos": 0}
+            fechas = {"formato": 0, "flexible": 0, "vacias": 0, "invalidas": 0}
+            leidas = [0]
+
+            def filas_por_bloque():
+                for df, sin_rfc, rfc_invalidos, conteo in itertools.chain([primero], lotes):
+                    descartes["sin_rfc"] += sin_rfc
+                    descartes["rfc_invalidos"] += rfc_invalidos
+                    for clave, valor in conteo.items():
+                        fechas[clave] += valor
+                    leidas[0] += len(df)
+                    trabajo.avanzar(etapa="cargando", filas_leidas=leidas[0])
+                    yield filas_lote(df, columnas_validas)
+
+            resultado = cargar(
+                conn, cursor, staging, columnas_validas, filas_por_bloque(), modo,
+                progreso=lambda total: trabajo.avanzar(filas_insertadas=total)
+            )
+
+        trabajo.avanzar(etapa="validando", forzar=True)
+        total = validar_staging(cursor, staging, resultado["registros"])
+
+        if incremental:
+            # Solo altas, cambios y bajas sobre la tabla viva; se respaldan las filas que se reemplazan
+            def respaldar_reemplazadas(filtro):
+                trabajo.avanzar(etapa="respaldando", forzar=True)
+                respaldar_generacion(trabajo, conn, cursor, tabla, tabla, "incremental_filas",
+                                     eliminar=False, filtro=filtro)
+                trabajo.avanzar(etapa="comparando", forzar=True)
+
+            trabajo.avanzar(etapa="comparando", forzar=True)
+            delta = aplicar_delta(conn, cursor, tabla, staging, respaldar=respaldar_reemplazadas)
+            descartar_staging(cursor, staging)
+            staging = None
+            trabajo.avanzar(**{k: v for k, v in delta.items() if k != "tabla"})
+            trabajo.aviso(
+                "info",
+                f"🔁 Importación incremental: {delta['altas']} altas, {delta['cambios']} cambios, "
+                f"{delta['bajas']} bajas, {delta['sin_cambios']} sin cambios "
+                f"({delta['renumeradas']} con número actualizado)<br>"
+                f"🔁 Cambios de situación registrados: {delta['transiciones']}"
+            )
+        else:
+            actualizar_hashes(cursor, staging)
+            conn.commit()
+
+            # Intercambio atómico; la generación anterior pasa al almacén de backups
+            intercambiar(cursor, tabla, staging, tabla_backup)
+            staging = None
+
+            trabajo.avanzar(etapa="respaldando", forzar=True)
+            respaldar_generacion(trabajo, conn, cursor, tabla_backup, tabla, "carga_csv")
+
+        if descartes["sin_rfc"] or descartes["rfc_invalidos"]:
+            trabajo.aviso(
+                "warning",
+                f"⚠️ Filas sin RFC descartadas: {descartes['sin_rfc']}<br>"
+                f"⚠️ RFC con formato no estándar (se conservan): {descartes['rfc_invalidos']}"
+            )
+
+        trabajo.aviso(
+            "info",
+            f"📅 Fechas: {fechas['formato']} con formato estándar, "
+            f"{fechas['flexible']} por análisis flexible, "
+            f"{fechas['invalidas']} no reconocidas (se guardan vacías)"
+        )
+
+        cursor.execute("DELETE FROM Texto_Legal_Tablas WHERE tabla = %s", (tabla,))
+        cursor.execute("""
+            INSERT INTO Texto_Legal_Tablas (tabla, linea1, linea2)
+            VALUES (%s, %s, %s)
+        """, (tabla, linea1, linea2))
+        conn.commit()
+
+        # Registrar en historial
+        cursor.execute("""
+            INSERT INTO Historial_Cargas (nombre_archivo, tabla, registros)
+            VALUES (%s, %s, %s)
+        """, (nombre_archivo, tabla, total))
+        conn.commit()
+
+        trabajo.avanzar(etapa="publicando", forzar=True)
+        incrementar_version(cursor)
+        refrescar_precalculados(cursor)
+        conn.commit()
+
+        reconstruir_si_habilitado(cursor)
+
+        programar_snapshot_si_habilitado()
+
+        observar("sat_carga_duracion_segundos", time.perf_counter() - inicio,
+                 tabla=tabla, modo="incremental" if incremental else "completa")
+        sumar("sat_carga_registros_total", total, tabla=tabla)
+
+        trabajo.avanzar(etapa="terminado")
+        trabajo.aviso(
+            "success",
+            f"✅ Tabla {tabla} {'actualizada' if incremental else 'reemplazada'} correctamente<br>"
+            f"✅ Registros cargados: {total} "
+            f"({resultado['filas_por_segundo']} filas/s, modo {resultado['modo']})"
+        )
+
+    except Exception:
+        if staging and cursor:
+            descartar_staging(cursor, staging)
+        raise
+
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        except Exception:
+            pass
+
+# ---------------------------------------------------------
+# Restauración de un backup (trabajo en segundo plano de /backups)
+# ---------------------------------------------------------
+
+def procesar_restauracion(trabajo, id_backup):
+    """
+    Carga el backup en una tabla de staging y la intercambia con la tabla
+    viva en un solo RENAME TABLE. La generación reemplazada se respalda, así
+    que la restauración también se puede deshacer.
+    """
+    conn = None
+    cursor = None
+    staging = None
+    inicio = time.perf_counter()
+
+    try:
+        conn = obtener_conexion()
+        cursor = conn.cursor(dictionary=True)
+
+        backup = obtener_backup(cursor, id_backup)
+        if backup is None:
+            raise ValueError(f"El backup #{id_backup} no existe")
+        tabla = backup["tabla"]
+        if backup["motivo"] in MOTIVOS_PARCIALES:
+            raise ValueError(
+                f"El backup #{id_backup} solo contiene las filas reemplazadas por una carga incremental; "
+                f"no se puede restaurar como tabla completa"
+            )
+
+        encabezado, filas = leer_snapshot(backup["archivo"])
+        cursor.execute(f"DESCRIBE {tabla}")
+        columnas_tabla = {col["Field"] for col in cursor.fetchall()}
+        posiciones = [i for i, c in enumerate(encabezado["columnas"]) if c in columnas_tabla]
+        columnas = [encabezado["columnas"][i] for i in posiciones]
+        omitidas = [c for c in encabezado["columnas"] if c not in columnas_tabla]
+
+        fecha = datetime.now().strftime("%Y%m%d_%H%M%S")
+        staging = crear_staging(cursor, tabla, fecha)
+        conn.commit()
+
+        def bloques():
+            for bloque in iter(lambda: list(itertools.islice(filas, IMPORT_CONFIG["tamano_lote"])), []):
+                yield [tuple(fila[i] for i in posiciones) for fila in bloque]
+
+        trabajo.avanzar(etapa="cargando", filas_insertadas=0, registros=backup["registros"], forzar=True)
+        total = insertar_lotes(
+            conn, cursor, staging, columnas, bloques(),
+            progreso=lambda total: trabajo.avanzar(filas_insertadas=total)
+        )
+
+        trabajo.avanzar(etapa="validando", forzar=True)
+        validar_staging(cursor, staging, backup["registros"])
+        actualizar_hashes(cursor, staging)
+        conn.commit()
+
+        tabla_anterior = nombre_backup(tabla, fecha)
+        intercambiar(cursor, tabla, staging, tabla_anterior)
+        staging = None
+
+        trabajo.avanzar(etapa="respaldando", forzar=True)
+        respaldar_generacion(trabajo, conn, cursor, tabla_anterior, tabla, "antes_de_restaurar")
+
+        cursor.execute("""
+            INSERT INTO Historial_Cargas (nombre_archivo, tabla, registros)
+            VALUES (%s, %s, %s)
+        """, (f"Restauración backup #{id_backup}", tabla, total))
+        conn.commit()
+
+        trabajo.avanzar(etapa="publicando", forzar=True)
+        incrementar_version(cursor)
+        refrescar_precalculados(cursor)
+        conn.commit()
+
+        reconstruir_si_habilitado(cursor)
+
+        programar_snapshot_si_habilitado()
+
+        observar("sat_carga_duracion_segundos", time.perf_counter() - inicio, tabla=tabla, modo="restauracion")
+        sumar("sat_carga_registros_total", total, tabla=tabla)
+
+        trabajo.avanzar(etapa="terminado")
+        if omitidas:
+            trabajo.aviso("warning", f"⚠️ Columnas del backup que ya no existen en la tabla: {', '.join(omitidas)}")
+        trabajo.aviso(
+            "success",
+            f"✅ Tabla {tabla} restaurada desde el backup #{id_backup} "
+            f"({backup['creado']:%d/%m/%Y %H:%M})<br>"
+            f"✅ Registros cargados: {total}"
+        )
+
+    except Exception:
+        if staging and cursor:
+            descartar_staging(cursor, staging)
+        raise
+
+    finally:
+        try:
+            if cursor:
+                cursor.close()
+            if conn:
+                conn.close()
+        except Exception:
+            pass
@@ -7,13 +7,33 @@ Carga el Listado Completo 69-B y separa automáticamente en:
 - Presuntos
 - Sentencias Favorables
 Además llena la tabla Listado_Completo_69_B
+
+El listado se inserta una sola vez; las cuatro tablas derivadas se llenan en
+el servidor con INSERT ... SELECT, en paralelo y con conexiones del pool.
+Con --incremental todo se carga en tablas de staging y en las tablas vivas
+solo se aplican las diferencias (delta.py).
+
+Uso:
+    python init_db.py [--incremental] [--benchmark]
 """
 
-import pandas as pd
-import mysql.connector
+import time
+import argparse
 import traceback
-from datetime import datetime
-from config import DB_CONFIG
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from config import DB_POOL_CONFIG, IMPORT_CONFIG
+from db import obtener_conexion
+from ingesta import insertar_lotes, filas_lote, crear_staging, descartar_staging
+from delta import aplicar_delta, actualizar_hashes
+from normalizacion import normalizar_columna_rfc, agregar_nombre_busqueda, normalizar_fechas
+from rfc_index import reconstruir_si_habilitado
+from snapshot import actualizar_snapshot_si_habilitado
+from cache_datos import incrementar_version
+from resumen import refrescar_precalculados
+from metricas import observar, sumar
 
 # ---------------------------------------------------------
 # Mapeo de columnas del CSV → columnas de la base de datos
@@ -53,114 +73,237 @@ COLUMN_MAP = {
 
 def conectar_db():
     try:
-        return mysql.connector.connect(**DB_CONFIG)
+        return obtener_conexion()
     except Exception as e:
         print("❌ Error conectando a la base de datos:", e)
         exit(1)
 
 # ---------------------------------------------------------
-# Limpieza de fechas
+# Tiempos por etapa (--benchmark)
 # ---------------------------------------------------------
 
-def parse_fecha(valor):
-    if pd.isna(valor):
-        return None
+TIEMPOS = {}
+
+
+@contextmanager
+def etapa(nombre):
+    inicio = time.perf_counter()
     try:
-        return datetime.strptime(str(valor), "%d/%m/%Y").date()
-    except:
-        return None
+        yield
+    finally:
+        TIEMPOS[nombre] = time.perf_counter() - inicio
+
+
+def imprimir_tiempos():
+    print("\n⏱️ TIEMPOS POR ETAPA")
+    for nombre, segundos in TIEMPOS.items():
+        print(f"   {nombre:<40} {segundos:>8.3f}s")
 
 # ---------------------------------------------------------
 # Inserción en tabla
 # ---------------------------------------------------------
-def insertar_en_tabla(tabla, registros):
-    if not registros:
-        return 0
 
+TABLA_LISTADO = "Listado_Completo_69_B"
+
+TIPOS = {
+    "Definitivo": "Definitivos",
+    "Desvirtuado": "Desvirtuados",
+    "Presunto": "Presuntos",
+    "Sentencia Favorable": "SentenciasFavorables",
+}
+
+
+def columnas_de(cursor, tabla):
+    cursor.execute(f"DESCRIBE {tabla}")
+    return [col["Field"] for col in cursor.fetchall()]
+
+
+def insertar_listado(df, destino=TABLA_LISTADO):
+    """Inserta el listado completo por bloques; devuelve (total, columnas insertadas)"""
     conn = conectar_db()
     cursor = conn.cursor(dictionary=True)
+    try:
+        columnas_tabla = columnas_de(cursor, destino)
+        columnas = [c for c in df.columns if c in columnas_tabla]
+        if not columnas:
+            print(f"⚠️ No hay columnas válidas para insertar en {destino}")
+            return 0, []
+
+        tamano = IMPORT_CONFIG["tamano_lote"]
+        lotes = (filas_lote(df.iloc[i:i + tamano], columnas) for i in range(0, len(df), tamano))
+        total = insertar_lotes(conn, cursor, destino, columnas, lotes)
+    finally:
+        cursor.close()
+        conn.close()
+
+    print(f"✅ Insertados {total} registros en {destino}")
+    return total, columnas
+
+
+def derivar_tabla(tipo, tabla, columnas_listado, origen=TABLA_LISTADO, destino=None):
+    """Copia en el servidor las filas del listado con la situación indicada"""
+    destino = destino or tabla
+    with etapa(f"derivar {tabla}"):
+        conn = conectar_db()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            columnas = [c for c in columnas_de(cursor, tabla) if c in columnas_listado]
+            if not columnas:
+                print(f"⚠️ No hay columnas válidas para insertar en {tabla}")
+                return 0
+
+            columnas_sql = ", ".join(columnas)
+            cursor.execute(f"""
+                INSERT INTO {destino} ({columnas_sql})
+                SELECT {columnas_sql}
+                FROM {origen}
+                WHERE situacion_contribuyente = %s
+            """, (tipo,))
+            conn.commit()
+            total = cursor.rowcount
+        finally:
+            cursor.close()
+            conn.close()
+
+    print(f"✅ Insertados {total} registros en {destino}")
+    return total
 
-    # Obtener columnas reales de la tabla
-    cursor.execute(f"DESCRIBE {tabla}")
-    columnas_tabla = [col["Field"] for col in cursor.fetchall()]
 
-    # Filtrar registros para incluir solo columnas válidas
-    registros_filtrados = []
-    for r in registros:
-        limpio = {k: v for k, v in r.items() if k in columnas_tabla}
-        registros_filtrados.append(limpio)
+def en_paralelo(funcion, argumentos):
+    """Ejecuta funcion(*args) para cada tabla independiente con conexiones del pool"""
+    hilos = max(1, min(len(argumentos), DB_POOL_CONFIG["tamano"] - 1))
+    with ThreadPoolExecutor(max_workers=hilos) as ejecutor:
+        futuros = [ejecutor.submit(funcion, *args) for args in argumentos]
+        return [f.result() for f in futuros]
 
-    if not registros_filtrados:
-        print(f"⚠️ No hay columnas válidas para insertar en {tabla}")
-        return 0
 
-    columnas = registros_filtrados[0].keys()
-    placeholders = ", ".join(["%s"] * len(columnas))
-    columnas_sql = ", ".join(columnas)
+def derivar_tablas(columnas_listado, origen=TABLA_LISTADO, destinos=None):
+    """Las cuatro tablas son independientes entre sí: se llenan en paralelo"""
+    destinos = destinos or {}
+    return sum(en_paralelo(derivar_tabla, [
+        (tipo, tabla, columnas_listado, origen, destinos.get(tabla))
+        for tipo, tabla in TIPOS.items()
+    ]))
 
-    query = f"INSERT INTO {tabla} ({columnas_sql}) VALUES ({placeholders})"
-    valores = [tuple(r.values()) for r in registros_filtrados]
 
-    cursor.executemany(query, valores)
-    conn.commit()
+def aplicar_delta_tabla(tabla, staging):
+    with etapa(f"delta {tabla}"):
+        conn = conectar_db()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            resumen = aplicar_delta(conn, cursor, tabla, staging)
+            descartar_staging(cursor, staging)
+        finally:
+            cursor.close()
+            conn.close()
+
+    print(f"🔁 {tabla}: {resumen['altas']} altas | {resumen['cambios']} cambios | "
+          f"{resumen['bajas']} bajas | {resumen['sin_cambios']} sin cambios | "
+          f"{resumen['transiciones']} cambios de situación")
+    return resumen
 
-    total = cursor.rowcount
 
+def carga_incremental(df):
+    """Listado y tablas derivadas en staging; en las tablas vivas solo se aplican las diferencias"""
+    sufijo = time.strftime("%Y%m%d_%H%M%S")
+    conn = conectar_db()
+    cursor = conn.cursor(dictionary=True)
+    stagings = {tabla: crear_staging(cursor, tabla, sufijo) for tabla in [TABLA_LISTADO, *TIPOS.values()]}
+    conn.commit()
     cursor.close()
     conn.close()
 
-    print(f"✅ Insertados {total} registros en {tabla}")
-    return total
-
-
+    try:
+        with etapa(f"insertar {stagings[TABLA_LISTADO]}"):
+            _, columnas_listado = insertar_listado(df, stagings[TABLA_LISTADO])
+
+        with etapa("derivar tablas en staging (total, en paralelo)"):
+            derivar_tablas(columnas_listado, stagings[TABLA_LISTADO], stagings)
+
+        with etapa("aplicar diferencias (total, en paralelo)"):
+            en_paralelo(aplicar_delta_tabla, list(stagings.items()))
+    except Exception:
+        conn = conectar_db()
+        cursor = conn.cursor(dictionary=True)
+        for staging in stagings.values():
+            descartar_staging(cursor, staging)
+        cursor.close()
+        conn.close()
+        raise
 
 # ---------------------------------------------------------
 # Proceso principal
 # ---------------------------------------------------------
 
 def main():
+    parser = argparse.ArgumentParser(description="Inicialización de la base de datos SAT")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Aplica solo altas, cambios y bajas respecto a las tablas actuales")
+    parser.add_argument("--benchmark", action="store_true", help="Imprime el tiempo de cada etapa")
+    args = parser.parse_args()
+
     print("\n🚀 INICIALIZACIÓN DE BASE DE DATOS SAT")
     print("--------------------------------------")
 
+    inicio = time.perf_counter()
+
     # Cargar CSV principal
-    df = pd.read_csv(
-        "data/Listado_Completo_69-B.csv",
-        encoding="latin1",
-        skiprows=2,
-        on_bad_lines="skip"
-    )
-
-    # Renombrar columnas
-    df = df.rename(columns=COLUMN_MAP)
-
-    # Limpiar columnas desconocidas
-    df = df[[c for c in df.columns if c in COLUMN_MAP.values()]]
-
-    # Limpiar fechas
-    for col in df.columns:
-        if "publicacion" in col:
-            df[col] = df[col].apply(parse_fecha)
-
-    # Convertir NaN → None
-    df = df.where(pd.notnull(df), None)
-
-    # Convertir a diccionarios
-    registros = df.to_dict(orient="records")
-
-    # Insertar en tabla completa
-    insertar_en_tabla("Listado_Completo_69_B", registros)
-
-    # Separar por tipo
-    tipos = {
-        "Definitivo": "Definitivos",
-        "Desvirtuado": "Desvirtuados",
-        "Presunto": "Presuntos",
-        "Sentencia Favorable": "SentenciasFavorables",
-    }
-
-    for tipo, tabla in tipos.items():
-        subset = [r for r in registros if r.get("situacion_contribuyente") == tipo]
-        insertar_en_tabla(tabla, subset)
+    with etapa("leer CSV"):
+        df = pd.read_csv(
+            "data/Listado_Completo_69-B.csv",
+            encoding="latin1",
+            skiprows=2,
+            on_bad_lines="skip"
+        )
+
+    with etapa("normalizar"):
+        # Renombrar columnas
+        df = df.rename(columns=COLUMN_MAP)
+
+        # Limpiar columnas desconocidas
+        df = df[[c for c in df.columns if c in COLUMN_MAP.values()]]
+
+        # Normalizar RFC (mayúsculas, sin espacios)
+        df, sin_rfc, rfc_invalidos = normalizar_columna_rfc(df)
+        df = agregar_nombre_busqueda(df)
+        print(f"ℹ️ Filas sin RFC descartadas: {sin_rfc} | RFC con formato no estándar: {rfc_invalidos}")
+
+        # Limpiar fechas (vectorizado; solo lo que no coincide con un formato conocido se analiza celda por celda)
+        df, fechas = normalizar_fechas(df, [c for c in df.columns if "publicacion" in c])
+        print(f"ℹ️ Fechas: {fechas['formato']} con formato estándar | {fechas['flexible']} por análisis flexible | "
+              f"{fechas['invalidas']} no reconocidas")
+
+    if args.incremental:
+        carga_incremental(df)
+    else:
+        # Insertar en tabla completa (una sola vez)
+        with etapa(f"insertar {TABLA_LISTADO}"):
+            _, columnas_listado = insertar_listado(df)
+
+        # Separar por tipo en el servidor
+        with etapa("derivar tablas (total, en paralelo)"):
+            derivar_tablas(columnas_listado)
+
+    # Publicar nueva versión de los datos, resumen del dashboard e índice de RFCs
+    with etapa("publicar versión, resumen e índice"):
+        conn = conectar_db()
+        cursor = conn.cursor(dictionary=True)
+        for tabla in [TABLA_LISTADO, *TIPOS.values()]:
+            actualizar_hashes(cursor, tabla)
+        incrementar_version(cursor)
+        refrescar_precalculados(cursor)
+        conn.commit()
+        reconstruir_si_habilitado(cursor)
+        actualizar_snapshot_si_habilitado(cursor)
+        cursor.close()
+        conn.close()
+
+    TIEMPOS["total"] = time.perf_counter() - inicio
+    modo = "init_db_incremental" if args.incremental else "init_db"
+    observar("sat_carga_duracion_segundos", TIEMPOS["total"], tabla=TABLA_LISTADO, modo=modo)
+    sumar("sat_carga_registros_total", len(df), tabla=TABLA_LISTADO)
+    if args.benchmark:
+        imprimir_tiempos()
 
     print("\n✅ PROCESO COMPLETADO")
 
@@ -0,0 +1,348 @@
+"""
+Métricas en formato Prometheus (/metrics)
+Cada proceso acumula en memoria histogramas, contadores y valores por ruta
+y cada 'intervalo_segundos' los escribe en METRICAS_CONFIG['carpeta'] como
+<pid>-<inicio>.json (os.replace, como el puntero del snapshot). /metrics
+suma los archivos de todos los workers de gunicorn; los de procesos que ya
+terminaron se consolidan en acumulado.json para que los contadores no
+retrocedan cuando un worker se reinicia.
+
+Las consultas se cuentan en los cursores del pool (db.py) y del snapshot,
+y se atribuyen a la ruta de la petición en curso o al trabajo en segundo
+plano ('trabajo:<tipo>') que las ejecuta en ese hilo.
+"""
+
+import os
+import json
+import time
+import fcntl
+import atexit
+import threading
+from contextlib import contextmanager
+
+from config import METRICAS_CONFIG
+
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000)
+BUCKETS_CARGA = (1, 5, 10, 30, 60, 120, 300, 600, 1800, 3600)
+BUCKETS_LOTE = (1, 10, 100, 500, 1000, 2000, 5000, 10000, 50000, 100000)
+
+# nombre → (tipo, ayuda, buckets)
+METRICAS = {
+    "sat_peticiones_duracion_segundos": (
+        "histogram", "Duración de las peticiones HTTP por ruta (incluye el envío de respuestas en streaming)",
+        BUCKETS_SEGUNDOS),
+    "sat_db_consultas_total": ("counter", "Consultas a la base por ruta o trabajo", None),
+    "sat_db_consultas_segundos_total": ("counter", "Tiempo en consultas a la base por ruta o trabajo", None),
+    "sat_db_consultas_por_peticion": (
+        "histogram", "Consultas a la base por petición o trabajo", BUCKETS_CONSULTAS),
+    "sat_trabajo_duracion_segundos": ("histogram", "Duración de los trabajos en segundo plano", BUCKETS_CARGA),
+    "sat_carga_duracion_segundos": ("histogram", "Duración de las cargas por tabla", BUCKETS_CARGA),
+    "sat_carga_registros_total": ("counter", "Registros cargados por tabla", None),
+    "sat_screening_lote_rfcs": ("histogram", "RFCs únicos por lote de screening", BUCKETS_LOTE),
+    "sat_tabla_registros": ("gauge", "Registros por tabla (resumen de la última carga)", None),
+    "sat_workers_reportando": ("gauge", "Procesos con métricas vigentes en la carpeta compartida", None),
+}
+
+# ---------------------------------------------------------
+# Registro del proceso
+# ---------------------------------------------------------
+
+_series = {}
+_lock = threading.Lock()
+_local = threading.local()
+_proceso = {"pid": None, "archivo": None, "guardado": 0.0}
+
+
+def _clave(nombre, etiquetas):
+    return nombre, tuple(sorted((k, str(v)) for k, v in etiquetas.items()))
+
+
+def _iniciar_proceso():
+    """Archivo propio y guardado periódico; se repite en cada proceso bifurcado (fork)"""
+    if _proceso["pid"] == os.getpid():
+        return
+    with _lock:
+        if _proceso["pid"] == os.getpid():
+            return
+        _series.clear()
+        _proceso["pid"] = os.getpid()
+        _proceso["archivo"] = os.path.join(METRICAS_CONFIG["carpeta"], f"{os.getpid()}-{time.time_ns()}.json")
+        _proceso["guardado"] = time.monotonic()
+    threading.Thread(target=_guardar_periodicamente, name="metricas", daemon=True).start()
+
+
+def _guardar_periodicamente():
+    pid = os.getpid()
+    while _proceso["pid"] == pid:
+        time.sleep(METRICAS_CONFIG["intervalo_segundos"])
+        guardar(forzar=True)
+
+
+def observar(nombre, valor, **etiquetas):
+    """Histograma"""
+    if not METRICAS_CONFIG["habilitado"]:
+        return
+    _iniciar_proceso()
+    buckets = METRICAS[nombre][2]
+    with _lock:
+        serie = _series.setdefault(_clave(nombre, etiquetas), {"buckets": [0] * len(buckets), "suma": 0.0, "cuenta": 0})
+        for i, limite in enumerate(buckets):
+            if valor <= limite:
+                serie["buckets"][i] += 1
+        serie["suma"] += valor
+        serie["cuenta"] += 1
+
+
+def sumar(nombre, valor=1, **etiquetas):
+    """Contador"""
+    if not METRICAS_CONFIG["habilitado"]:
+        return
+    _iniciar_proceso()
+    clave = _clave(nombre, etiquetas)
+    with _lock:
+        _series[clave] = _series.get(clave, 0) + valor
+
+
+def fijar(nombre, valor, **etiquetas):
+    """Valor actual; al combinar procesos gana el más reciente"""
+    if not METRICAS_CONFIG["habilitado"]:
+        return
+    _iniciar_proceso()
+    with _lock:
+        _series[_clave(nombre, etiquetas)] = [valor, time.time()]
+
+# ---------------------------------------------------------
+# Contexto: ruta o trabajo del hilo actual
+# ---------------------------------------------------------
+
+def iniciar_contexto(ruta):
+    _local.contexto = {"ruta": ruta, "consultas": 0, "segundos": 0.0}
+    return _local.contexto
+
+
+def terminar_contexto():
+    """Registra las consultas del contexto y lo cierra; devuelve el contexto"""
+    contexto = getattr(_local, "contexto", None)
+    _local.contexto = None
+    if contexto is not None:
+        observar("sat_db_consultas_por_peticion", contexto["consultas"], ruta=contexto["ruta"])
+        if contexto["consultas"]:
+            sumar("sat_db_consultas_total", contexto["consultas"], ruta=contexto["ruta"])
+            sumar("sat_db_consultas_segundos_total", contexto["segundos"], ruta=contexto["ruta"])
+    return contexto
+
+
+@contextmanager
+def contexto(ruta):
+    iniciar_contexto(ruta)
+    try:
+        yield
+    finally:
+        terminar_contexto()
+
+
+def ruta_actual():
+    contexto = getattr(_local, "contexto", None)
+    return contexto["ruta"] if contexto is not None else "sin_contexto"
+
+
+def _consulta(segundos):
+    contexto = getattr(_local, "contexto", None)
+    if contexto is not None:
+        contexto["consultas"] += 1
+        contexto["segundos"] += segundos
+    else:
+        sumar("sat_db_consultas_total", ruta="sin_contexto")
+        sumar("sat_db_consultas_segundos_total", segundos, ruta="sin_contexto")
+
+
+class CursorMedido:
+    """Envuelve un cursor; execute y executemany cuentan como una consulta cada uno"""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def execute(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.execute(*args, **kwargs)
+        finally:
+            _consulta(time.perf_counter() - inicio)
+
+    def executemany(self, *args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return self._cursor.executemany(*args, **kwargs)
+        finally:
+            _consulta(time.perf_counter() - inicio)
+
+
+def medir_cursor(cursor):
+    return CursorMedido(cursor) if METRICAS_CONFIG["habilitado"] else cursor
+
+# ---------------------------------------------------------
+# Archivos compartidos entre workers
+# ---------------------------------------------------------
+
+def _serializar(series):
+    return [[nombre, dict(etiquetas), valor] for (nombre, etiquetas), valor in series.items()]
+
+
+def _escribir(ruta, texto):
+    temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(temporal, "w") as f:
+        f.write(texto)
+    os.replace(temporal, ruta)
+
+
+def guardar(forzar=False):
+    """Escribe las series del proceso (como máximo cada 'intervalo_segundos' salvo con forzar)"""
+    if not METRICAS_CONFIG["habilitado"] or _proceso["pid"] != os.getpid():
+        return
+    ahora = time.monotonic()
+    if not forzar and ahora - _proceso["guardado"] < METRICAS_CONFIG["intervalo_segundos"]:
+        return
+    _proceso["guardado"] = ahora
+    with _lock:
+        texto = json.dumps({"pid": os.getpid(), "series": _serializar(_series)})
+    try:
+        os.makedirs(METRICAS_CONFIG["carpeta"], exist_ok=True)
+        _escribir(_proceso["archivo"], texto)
+    except OSError as e:
+        print(f"⚠️ No se pudieron guardar las métricas: {e}")
+
+
+atexit.register(guardar, True)
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def _combinar(total, series):
+    for nombre, etiquetas, valor in series:
+        if nombre not in METRICAS:
+            continue
+        clave = _clave(nombre, etiquetas)
+        tipo = METRICAS[nombre][0]
+        actual = total.get(clave)
+        if actual is None:
+            total[clave] = json.loads(json.dumps(valor))
+        elif tipo == "counter":
+            total[clave] = actual + valor
+        elif tipo == "gauge":
+            if valor[1] > actual[1]:
+                total[clave] = valor
+        elif len(actual["buckets"]) == len(valor["buckets"]):
+            actual["buckets"] = [a + b for a, b in zip(actual["buckets"], valor["buckets"])]
+            actual["suma"] += valor["suma"]
+            actual["cuenta"] += valor["cuenta"]
+
+
+def _leer(ruta):
+    try:
+        with open(ruta) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def fijar_en(series, nombre, valor, **etiquetas):
+    series[_clave(nombre, etiquetas)] = [valor, time.time()]
+
+
+def combinar_procesos():
+    """Series de todos los procesos; consolida en acumulado.json los que ya terminaron"""
+    carpeta = METRICAS_CONFIG["carpeta"]
+    os.makedirs(carpeta, exist_ok=True)
+    acumulado = os.path.join(carpeta, "acumulado.json")
+
+    with open(os.path.join(carpeta, ".lock"), "w") as candado:
+        fcntl.flock(candado, fcntl.LOCK_EX)
+        consolidado = {}
+        _combinar(consolidado, (_leer(acumulado) or {}).get("series", []))
+
+        vigentes = []
+        terminados = []
+        for nombre in sorted(os.listdir(carpeta)):
+            if not nombre.endswith(".json") or nombre == "acumulado.json":
+                continue
+            ruta = os.path.join(carpeta, nombre)
+            pid = int(nombre.split("-")[0])
+            # Un pid reutilizado por otro proceso no hace vigente un archivo anterior
+            if ruta == _proceso["archivo"] or (pid != os.getpid() and _proceso_vivo(pid)):
+                vigentes.append(ruta)
+            else:
+                terminados.append(ruta)
+
+        if terminados:
+            for ruta in terminados:
+                _combinar(consolidado, (_leer(ruta) or {}).get("series", []))
+            _escribir(acumulado, json.dumps({"pid": None, "series": _serializar(consolidado)}))
+            for ruta in terminados:
+                os.remove(ruta)
+
+    total = consolidado
+    for ruta in vigentes:
+        _combinar(total, (_leer(ruta) or {}).get("series", []))
+    fijar_en(total, "sat_workers_reportando", len(vigentes))
+    return total
+
+# ---------------------------------------------------------
+# Formato de exposición de Prometheus
+# ---------------------------------------------------------
+
+def _escapar(valor):
+    return str(valor).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _etiquetas(etiquetas, extra=None):
+    pares = list(etiquetas) + ([extra] if extra else [])
+    if not pares:
+        return ""
+    return "{" + ",".join(f'{k}="{_escapar(v)}"' for k, v in pares) + "}"
+
+
+def _numero(valor):
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def exposicion(series):
+    lineas = []
+    for nombre, (tipo, ayuda, buckets) in METRICAS.items():
+        propias = sorted(((c, v) for c, v in series.items() if c[0] == nombre), key=lambda par: par[0])
+        if not propias:
+            continue
+        lineas.append(f"# HELP {nombre} {ayuda}")
+        lineas.append(f"# TYPE {nombre} {tipo}")
+        for (_, etiquetas), valor in propias:
+            if tipo == "histogram":
+                for limite, cuenta in zip(buckets, valor["buckets"]):
+                    lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, ('le', _numero(float(limite))))} {cuenta}")
+                lineas.append(f"{nombre}_bucket{_etiquetas(etiquetas, ('le', '+Inf'))} {valor['cuenta']}")
+                lineas.append(f"{nombre}_sum{_etiquetas(etiquetas)} {_numero(float(valor['suma']))}")
+                lineas.append(f"{nombre}_count{_etiquetas(etiquetas)} {valor['cuenta']}")
+            elif tipo == "gauge":
+                lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor[0])}")
+            else:
+                lineas.append(f"{nombre}{_etiquetas(etiquetas)} {_numero(valor)}")
+    return "\n".join(lineas) + "\n"
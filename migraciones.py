@@ -0,0 +1,314 @@
+#!/usr/bin/env python3
+"""
+Migraciones de esquema del Sistema SAT
+Cada migración es idempotente y se registra en la tabla Migraciones_Aplicadas.
+
+Uso:
+    python migraciones.py              # aplica las migraciones pendientes
+    python migraciones.py --verificar  # comprueba con EXPLAIN que se usan los índices
+"""
+
+import sys
+import argparse
+import traceback
+
+from config import TABLAS_CONSULTA
+from consultas import COLUMNA_FECHA_FILTRO
+from db import obtener_conexion
+from normalizacion import plegar_texto
+from resumen import refrescar_resumen, refrescar_estadisticas
+from delta import actualizar_hashes
+
+TIPOS_TEXTO = {"text", "tinytext", "mediumtext", "longtext", "blob"}
+
+# ---------------------------------------------------------
+# Utilidades de esquema
+# ---------------------------------------------------------
+
+def existe_indice(cursor, tabla, indice):
+    cursor.execute("""
+        SELECT COUNT(*) AS total
+        FROM information_schema.statistics
+        WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s
+    """, (tabla, indice))
+    return cursor.fetchone()["total"] > 0
+
+
+def tipo_columna(cursor, tabla, columna):
+    cursor.execute("""
+        SELECT DATA_TYPE AS tipo
+        FROM information_schema.columns
+        WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s
+    """, (tabla, columna))
+    fila = cursor.fetchone()
+    return fila["tipo"].lower() if fila else None
+
+
+def existe_columna(cursor, tabla, columna):
+    return tipo_columna(cursor, tabla, columna) is not None
+
+
+def crear_indice(cursor, tabla, indice, columnas, prefijo=13):
+    """Crea el índice si no existe; usa un prefijo de 'prefijo' caracteres en columnas TEXT"""
+    if existe_indice(cursor, tabla, indice):
+        print(f"   = {tabla}.{indice} ya existe")
+        return False
+
+    partes = []
+    for columna in columnas:
+        if tipo_columna(cursor, tabla, columna) in TIPOS_TEXTO:
+            partes.append(f"{columna}({prefijo})")
+        else:
+            partes.append(columna)
+
+    cursor.execute(f"CREATE INDEX {indice} ON {tabla} ({', '.join(partes)})")
+    print(f"   + {tabla}.{indice} creado")
+    return True
+
+# ---------------------------------------------------------
+# Migraciones
+# ---------------------------------------------------------
+
+def m001_rfc_normalizado(cursor):
+    """RFC en mayúsculas y sin espacios + índice idx_rfc en cada tabla"""
+    for tabla in TABLAS_CONSULTA:
+        cursor.execute(f"""
+            UPDATE {tabla}
+            SET rfc = UPPER(TRIM(rfc))
+            WHERE rfc IS NOT NULL AND BINARY rfc <> BINARY UPPER(TRIM(rfc))
+        """)
+        print(f"   ~ {tabla}: {cursor.rowcount} RFC normalizados")
+        crear_indice(cursor, tabla, "idx_rfc", ["rfc"])
+
+
+def rellenar_nombre_busqueda(cursor, tabla, tamano=1000):
+    """
+    Pliega los nombres por bloques de id: cada bloque se lee por llave
+    primaria y se escribe con un solo UPDATE ... CASE id (nombre_contribuyente
+    no tiene índice, un UPDATE por nombre recorrería la tabla cada vez).
+    """
+    ultimo = 0
+    plegados = 0
+    while True:
+        cursor.execute(f"""
+            SELECT id, nombre_contribuyente AS nombre, nombre_busqueda
+            FROM {tabla}
+            WHERE id > %s
+            ORDER BY id
+            LIMIT %s
+        """, (ultimo, tamano))
+        filas = cursor.fetchall()
+        if not filas:
+            return plegados
+        primero, ultimo = filas[0]["id"], filas[-1]["id"]
+
+        pendientes = [f for f in filas if f["nombre"] is not None and f["nombre_busqueda"] is None]
+        if pendientes:
+            casos = " ".join("WHEN %s THEN %s" for _ in pendientes)
+            parametros = [v for f in pendientes for v in (f["id"], plegar_texto(f["nombre"]))]
+            cursor.execute(f"""
+                UPDATE {tabla}
+                SET nombre_busqueda = CASE id {casos} END
+                WHERE id BETWEEN %s AND %s AND nombre_busqueda IS NULL
+            """, (*parametros, primero, ultimo))
+            plegados += len(pendientes)
+
+
+def m002_nombre_busqueda_fulltext(cursor):
+    """Columna nombre_busqueda (sin acentos) con índice FULLTEXT ngram"""
+    for tabla in TABLAS_CONSULTA:
+        if not existe_columna(cursor, tabla, "nombre_busqueda"):
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN nombre_busqueda VARCHAR(500) NULL")
+            print(f"   + {tabla}.nombre_busqueda agregada")
+
+        plegados = rellenar_nombre_busqueda(cursor, tabla)
+        print(f"   ~ {tabla}: {plegados} nombres plegados")
+
+        if not existe_indice(cursor, tabla, "ft_nombre_busqueda"):
+            cursor.execute(
+                f"ALTER TABLE {tabla} ADD FULLTEXT INDEX ft_nombre_busqueda (nombre_busqueda) WITH PARSER ngram"
+            )
+            print(f"   + {tabla}.ft_nombre_busqueda creado")
+
+
+def m003_version_y_paginacion(cursor):
+    """Tabla Version_Datos + índices para paginación por numero y filtros"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Version_Datos (
+            id TINYINT PRIMARY KEY,
+            version BIGINT NOT NULL,
+            actualizado DATETIME NOT NULL
+        )
+    """)
+    cursor.execute("INSERT IGNORE INTO Version_Datos (id, version, actualizado) VALUES (1, 1, NOW())")
+
+    for tabla in TABLAS_CONSULTA:
+        crear_indice(cursor, tabla, "idx_numero", ["numero"])
+        crear_indice(cursor, tabla, "idx_situacion_numero", ["situacion_contribuyente", "numero"], prefijo=30)
+        crear_indice(cursor, tabla, "idx_fecha_numero", [COLUMNA_FECHA_FILTRO[tabla], "numero"])
+
+
+def m004_resumen_dashboard(cursor):
+    """Tabla Resumen_Dashboard (una fila JSON) + índice por fecha en Historial_Cargas"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Resumen_Dashboard (
+            id TINYINT PRIMARY KEY,
+            datos JSON NOT NULL,
+            actualizado DATETIME NOT NULL
+        )
+    """)
+    crear_indice(cursor, "Historial_Cargas", "idx_fecha", ["fecha"])
+    refrescar_resumen(cursor)
+
+
+def m005_estadisticas_datos(cursor):
+    """Tabla Estadisticas_Datos (una fila JSON con versión de datos)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Estadisticas_Datos (
+            id TINYINT PRIMARY KEY,
+            datos JSON NOT NULL,
+            version BIGINT NULL,
+            actualizado DATETIME NOT NULL
+        )
+    """)
+    refrescar_estadisticas(cursor)
+
+
+def m006_hash_fila_y_cambios(cursor):
+    """hash_fila por tabla (importación incremental) y bitácora Cambios_Situacion"""
+    for tabla in TABLAS_CONSULTA:
+        if not existe_columna(cursor, tabla, "hash_fila"):
+            cursor.execute(f"ALTER TABLE {tabla} ADD COLUMN hash_fila CHAR(32) NULL")
+            print(f"   + {tabla}.hash_fila")
+        total = actualizar_hashes(cursor, tabla)
+        print(f"   ✓ {tabla}: {total} hashes calculados")
+        crear_indice(cursor, tabla, "idx_rfc_hash", ["rfc", "hash_fila"])
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Cambios_Situacion (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            tabla VARCHAR(64) NOT NULL,
+            rfc VARCHAR(20) NOT NULL,
+            situacion_anterior VARCHAR(100) NULL,
+            situacion_nueva VARCHAR(100) NULL,
+            fecha DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            INDEX idx_rfc (rfc),
+            INDEX idx_fecha (fecha)
+        )
+    """)
+
+
+def m007_catalogo_backups(cursor):
+    """Catálogo Backups del almacén comprimido (las tablas *_backup_* se importan con backups.py)"""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Backups (
+            id BIGINT AUTO_INCREMENT PRIMARY KEY,
+            tabla VARCHAR(64) NOT NULL,
+            archivo CHAR(64) NOT NULL,
+            registros INT NOT NULL,
+            bytes BIGINT NOT NULL,
+            motivo VARCHAR(30) NOT NULL,
+            creado DATETIME NOT NULL,
+            INDEX idx_tabla_creado (tabla, creado),
+            INDEX idx_creado (creado),
+            INDEX idx_archivo (archivo)
+        )
+    """)
+
+
+def m008_hash_sin_numero(cursor):
+    """Recalcula hash_fila sin 'numero' (el SAT renumera el listado en cada publicación)"""
+    for tabla in TABLAS_CONSULTA:
+        if existe_columna(cursor, tabla, "hash_fila"):
+            total = actualizar_hashes(cursor, tabla, solo_vacios=False)
+            print(f"   ✓ {tabla}: {total} hashes recalculados")
+
+
+MIGRACIONES = [
+    ("001_rfc_normalizado", m001_rfc_normalizado),
+    ("002_nombre_busqueda_fulltext", m002_nombre_busqueda_fulltext),
+    ("003_version_y_paginacion", m003_version_y_paginacion),
+    ("004_resumen_dashboard", m004_resumen_dashboard),
+    ("005_estadisticas_datos", m005_estadisticas_datos),
+    ("006_hash_fila_y_cambios", m006_hash_fila_y_cambios),
+    ("007_catalogo_backups", m007_catalogo_backups),
+    ("008_hash_sin_numero", m008_hash_sin_numero),
+]
+
+# ---------------------------------------------------------
+# Verificación con EXPLAIN
+# ---------------------------------------------------------
+
+def verificar_indices(cursor):
+    """Comprueba que las búsquedas por RFC y nombre usan sus índices en lugar de un full scan"""
+    ok = True
+    for tabla in TABLAS_CONSULTA:
+        cursor.execute(f"EXPLAIN SELECT numero FROM {tabla} WHERE rfc = %s", ("AAA010101AAA",))
+        plan = cursor.fetchone()
+        usa_indice = plan.get("key") == "idx_rfc" and plan.get("type") in ("ref", "eq_ref", "const")
+        marca = "✅" if usa_indice else "❌"
+        print(f"{marca} {tabla}: type={plan.get('type')} key={plan.get('key')} rows={plan.get('rows')}")
+        ok = ok and usa_indice
+
+        cursor.execute(
+            f"EXPLAIN SELECT numero FROM {tabla} "
+            f"WHERE MATCH(nombre_busqueda) AGAINST (%s IN BOOLEAN MODE)", ('+"NANDU"',)
+        )
+        plan = cursor.fetchone()
+        usa_fulltext = plan.get("type") == "fulltext"
+        marca = "✅" if usa_fulltext else "❌"
+        print(f"{marca} {tabla} (nombre): type={plan.get('type')} key={plan.get('key')}")
+        ok = ok and usa_fulltext
+    return ok
+
+# ---------------------------------------------------------
+# Proceso principal
+# ---------------------------------------------------------
+
+def aplicar(cursor, conn):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS Migraciones_Aplicadas (
+            nombre VARCHAR(100) PRIMARY KEY,
+            aplicada DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT nombre FROM Migraciones_Aplicadas")
+    aplicadas = {row["nombre"] for row in cursor.fetchall()}
+
+    for nombre, migracion in MIGRACIONES:
+        if nombre in aplicadas:
+            continue
+        print(f"\n🔧 Aplicando {nombre}: {migracion.__doc__}")
+        migracion(cursor)
+        cursor.execute("INSERT INTO Migraciones_Aplicadas (nombre) VALUES (%s)", (nombre,))
+        conn.commit()
+
+    print("\n✅ Migraciones al día")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migraciones de esquema del Sistema SAT")
+    parser.add_argument("--verificar", action="store_true", help="Solo comprobar índices con EXPLAIN")
+    args = parser.parse_args()
+
+    conn = obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+
+    try:
+        if args.verificar:
+            ok = verificar_indices(cursor)
+        else:
+            aplicar(cursor, conn)
+            ok = verificar_indices(cursor)
+    except Exception:
+        traceback.print_exc()
+        ok = False
+    finally:
+        cursor.close()
+        conn.close()
+
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Normalización de datos del SAT antes de escribirlos en la base
+Compartido por carga_csv (app.py) e init_db.py para que todas las cargas
+guarden los valores con el mismo formato que usan las consultas.
+"""
+
+import re
+import unicodedata
+
+import pandas as pd
+import dateutil.parser
+
+# RFC: 3 letras (moral) o 4 (física), fecha AAMMDD y homoclave de 3 caracteres
+RFC_REGEX = re.compile(r"^[A-ZÑ&]{3,4}[0-9]{6}[A-Z0-9]{3}$")
+
+# ---------------------------------------------------------
+# RFC
+# ---------------------------------------------------------
+
+def normalizar_rfc(valor):
+    """Mayúsculas y sin espacios; None si viene vacío"""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    valor = str(valor).strip().upper()
+    return valor or None
+
+
+def rfc_valido(rfc):
+    return bool(rfc) and RFC_REGEX.match(rfc) is not None
+
+
+def normalizar_columna_rfc(df):
+    """
+    Normaliza la columna rfc de un DataFrame (vectorizado).
+    Descarta filas sin RFC y devuelve (df, descartadas, invalidos).
+    Los RFC con formato inválido se conservan porque el SAT los publica así,
+    pero se reportan para revisión.
+    """
+    if "rfc" not in df.columns:
+        return df, 0, 0
+
+    rfc = df["rfc"].astype("string").str.strip().str.upper()
+    vacios = rfc.isna() | (rfc == "")
+    df = df.loc[~vacios].copy()
+    df["rfc"] = rfc[~vacios].astype(object)
+
+    invalidos = int((~df["rfc"].str.match(RFC_REGEX.pattern)).sum())
+    return df, int(vacios.sum()), invalidos
+
+# ---------------------------------------------------------
+# Nombres (búsqueda sin acentos ni mayúsculas)
+# ---------------------------------------------------------
+
+def plegar_texto(valor):
+    """'Ñandú, S.A. de C.V.' → 'NANDU S A DE C V'"""
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return None
+    texto = unicodedata.normalize("NFKD", str(valor).upper())
+    texto = "".join(c for c in texto if not unicodedata.combining(c))
+    texto = re.sub(r"[^A-Z0-9&]+", " ", texto).strip()
+    return texto or None
+
+
+def agregar_nombre_busqueda(df):
+    """Agrega la columna nombre_busqueda (nombre plegado) usada por el índice FULLTEXT"""
+    if "nombre_contribuyente" in df.columns:
+        df["nombre_busqueda"] = df["nombre_contribuyente"].map(plegar_texto)
+    return df
+
+# ---------------------------------------------------------
+# Fechas de publicación
+# ---------------------------------------------------------
+
+# Formatos del SAT que se convierten en bloque. Año-mes-día no se incluye:
+# el análisis flexible con dayfirst lo interpreta como año-día-mes y el
+# resultado debe ser el mismo por cualquiera de los dos caminos.
+FORMATOS_FECHA = ["%d/%m/%Y", "%d-%m-%Y"]
+
+VALORES_SIN_FECHA = ["", "nan", "null", "-", "--", "—"]
+
+
+def convertir_fecha(valor):
+    """Análisis flexible de una celda; solo para lo que no coincide con FORMATOS_FECHA"""
+    if not valor or str(valor).strip() == "" or str(valor).lower() in VALORES_SIN_FECHA:
+        return None
+    try:
+        valor = str(valor).replace("\n", " ").strip()
+        fecha = dateutil.parser.parse(valor, dayfirst=True, fuzzy=True)
+        return fecha.strftime("%Y-%m-%d")
+    except Exception:
+        return None
+
+
+def normalizar_fechas(df, columnas):
+    """
+    Convierte las columnas de fecha a 'AAAA-MM-DD' (o None) de forma vectorizada:
+    primero pd.to_datetime con cada formato conocido y solo lo que sobra pasa
+    por convertir_fecha. Devuelve (df, conteo) con cuántos valores tomó cada
+    camino: formato, flexible, vacias, invalidas.
+    """
+    conteo = {"formato": 0, "flexible": 0, "vacias": 0, "invalidas": 0}
+
+    for col in columnas:
+        if col not in df.columns:
+            continue
+
+        texto = df[col].astype("string").str.replace("\n", " ", regex=False).str.strip()
+        vacias = (texto.isna() | texto.str.lower().isin(VALORES_SIN_FECHA)).fillna(True).astype(bool)
+
+        fechas = pd.Series(pd.NaT, index=df.index, dtype="datetime64[ns]")
+        pendientes = ~vacias
+        for formato in FORMATOS_FECHA:
+            if not pendientes.any():
+                break
+            convertidas = pd.to_datetime(texto.where(pendientes), format=formato, errors="coerce")
+            fechas = fechas.fillna(convertidas)
+            pendientes &= convertidas.isna()
+
+        salida = fechas.dt.strftime("%Y-%m-%d").astype(object)
+        flexibles = texto[pendientes].astype(object).map(convertir_fecha)
+        salida[pendientes] = flexibles
+        df[col] = salida.where(salida.notna(), None)
+
+        resueltas_flexible = int(flexibles.notna().sum())
+        conteo["vacias"] += int(vacias.sum())
+        conteo["formato"] += int((~vacias).sum() - pendientes.sum())
+        conteo["flexible"] += resueltas_flexible
+        conteo["invalidas"] += int(pendientes.sum()) - resueltas_flexible
+
+    return df, conteo
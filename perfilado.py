@@ -0,0 +1,321 @@
+"""
+Diagnóstico de rendimiento en producción
+- Consultas lentas: los cursores del pool (db.py) y del snapshot registran en
+  <carpeta>/consultas_lentas.jsonl cada consulta que supera
+  'consultas_lentas_ms', con sus parámetros, la ruta o trabajo que la ejecutó
+  y un EXPLAIN automático (EXPLAIN QUERY PLAN con SQLite).
+- Perfil por petición: con el token de administración (encabezado
+  X-Admin-Token) y ?perfilar=1 o el encabezado X-Perfilar, la petición se
+  ejecuta bajo cProfile y se guardan <carpeta>/perfiles/<nombre>.prof
+  (snakeviz, flameprof, gprof2dot) y un resumen en texto.
+
+Los ajustes se guardan en <carpeta>/ajustes.json; cada worker revisa el
+archivo cada 'revisar_ajustes_segundos', así que cambian sin reiniciar.
+"""
+
+import os
+import io
+import re
+import json
+import time
+import pstats
+import cProfile
+import threading
+from collections import deque
+
+from config import PERFILADO_CONFIG
+from metricas import ruta_actual
+
+# ajuste → tipo
+AJUSTABLES = {
+    "consultas_lentas_ms": float,
+    "explain": bool,
+    "perfilado_peticiones": bool
+}
+
+EXPLICABLES = ("SELECT", "WITH")
+
+
+def _explicable(texto):
+    """SELECT o WITH, también entre paréntesis: (SELECT ...) UNION ALL (SELECT ...)"""
+    palabra = texto.lstrip("( \t\n").split(" ", 1)[0].split("(", 1)[0]
+    return palabra.upper() in EXPLICABLES
+
+# ---------------------------------------------------------
+# Ajustes en caliente
+# ---------------------------------------------------------
+
+_estado = {"valores": None, "mtime": None, "revisado": 0.0}
+_lock_registro = threading.Lock()
+
+
+def _ruta(*partes):
+    return os.path.join(PERFILADO_CONFIG["carpeta"], *partes)
+
+
+def ajustes():
+    """Valores de PERFILADO_CONFIG con los cambios de ajustes.json"""
+    ahora = time.monotonic()
+    if _estado["valores"] is None or ahora - _estado["revisado"] >= PERFILADO_CONFIG["revisar_ajustes_segundos"]:
+        _estado["revisado"] = ahora
+        try:
+            mtime = os.stat(_ruta("ajustes.json")).st_mtime_ns
+        except OSError:
+            mtime = None
+        if _estado["valores"] is None or mtime != _estado["mtime"]:
+            valores = {clave: PERFILADO_CONFIG[clave] for clave in AJUSTABLES}
+            if mtime is not None:
+                try:
+                    with open(_ruta("ajustes.json")) as f:
+                        guardados = json.load(f)
+                    valores.update({k: v for k, v in guardados.items() if k in AJUSTABLES})
+                except (OSError, ValueError) as e:
+                    print(f"⚠️ Ajustes de diagnóstico ilegibles: {e}")
+            _estado["valores"] = valores
+            _estado["mtime"] = mtime
+    return _estado["valores"]
+
+
+def _convertir(clave, valor):
+    if AJUSTABLES[clave] is bool:
+        if isinstance(valor, str):
+            return valor.strip().lower() in ("1", "true", "si", "sí", "on")
+        return bool(valor)
+    valor = float(valor)
+    if valor < 0:
+        raise ValueError(f"{clave} no puede ser negativo")
+    return valor
+
+
+def cambiar_ajustes(cambios):
+    """Valida y guarda los cambios para todos los workers; devuelve los ajustes vigentes"""
+    desconocidos = set(cambios) - set(AJUSTABLES)
+    if desconocidos:
+        raise ValueError(f"Ajustes no reconocidos: {', '.join(sorted(desconocidos))}")
+
+    valores = dict(ajustes())
+    for clave, valor in cambios.items():
+        valores[clave] = _convertir(clave, valor)
+
+    os.makedirs(PERFILADO_CONFIG["carpeta"], exist_ok=True)
+    temporal = _ruta(f"ajustes.json.{os.getpid()}.tmp")
+    with open(temporal, "w") as f:
+        json.dump(valores, f)
+    os.replace(temporal, _ruta("ajustes.json"))
+
+    _estado["valores"] = None
+    return ajustes()
+
+# ---------------------------------------------------------
+# Consultas lentas
+# ---------------------------------------------------------
+
+def _parametros(parametros):
+    """Los lotes de screening llevan miles de RFCs; se guardan los primeros"""
+    if parametros is None:
+        return None
+    if isinstance(parametros, dict):
+        return {k: str(v) for k, v in list(parametros.items())[:PERFILADO_CONFIG["max_parametros"]]}
+    parametros = list(parametros)
+    guardados = [None if v is None else str(v) for v in parametros[:PERFILADO_CONFIG["max_parametros"]]]
+    if len(parametros) > len(guardados):
+        guardados.append(f"... ({len(parametros)} en total)")
+    return guardados
+
+
+def _anotar(registro):
+    linea = json.dumps(registro, ensure_ascii=False, default=str) + "\n"
+    ruta = _ruta("consultas_lentas.jsonl")
+    try:
+        with _lock_registro:
+            os.makedirs(PERFILADO_CONFIG["carpeta"], exist_ok=True)
+            if os.path.exists(ruta) and os.path.getsize(ruta) > PERFILADO_CONFIG["max_bytes_registro"]:
+                os.replace(ruta, ruta + ".1")
+            with open(ruta, "a", encoding="utf-8") as f:
+                f.write(linea)
+    except OSError as e:
+        print(f"⚠️ No se pudo registrar la consulta lenta: {e}")
+    print(f"🐢 Consulta lenta ({registro['ms']} ms, {registro['ruta']}): {registro['sql'][:120]}")
+
+
+def _explain(crear_cursor, motor, sql, parametros):
+    prefijo = "EXPLAIN QUERY PLAN " if motor == "sqlite" else "EXPLAIN "
+    cursor = crear_cursor()
+    try:
+        if parametros is None:
+            cursor.execute(prefijo + sql)
+        else:
+            cursor.execute(prefijo + sql, parametros)
+        return [
+            {k: (v if isinstance(v, (int, float)) or v is None else str(v)) for k, v in dict(fila).items()}
+            for fila in cursor.fetchall()
+        ]
+    finally:
+        cursor.close()
+
+
+class CursorVigilado:
+    """
+    Envuelve un cursor y registra las consultas lentas. El EXPLAIN se hace en
+    la misma conexión (ve las tablas temporales de la sesión) cuando ya se
+    leyó el resultado: al cerrar el cursor o antes de la siguiente consulta.
+    """
+
+    def __init__(self, cursor, crear_cursor):
+        self._cursor = cursor
+        self._crear_cursor = crear_cursor
+        self._pendiente = None
+
+    def __getattr__(self, nombre):
+        return getattr(self._cursor, nombre)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def execute(self, sql, *args, **kwargs):
+        self._explicar_pendiente()
+        inicio = time.perf_counter()
+        resultado = self._cursor.execute(sql, *args, **kwargs)
+        parametros = args[0] if args else kwargs.get("params")
+        self._revisar(sql, parametros, time.perf_counter() - inicio)
+        return resultado
+
+    def executemany(self, sql, filas, *args, **kwargs):
+        self._explicar_pendiente()
+        inicio = time.perf_counter()
+        resultado = self._cursor.executemany(sql, filas, *args, **kwargs)
+        self._revisar(sql, None, time.perf_counter() - inicio, explicable=False)
+        return resultado
+
+    def close(self):
+        self._explicar_pendiente()
+        return self._cursor.close()
+
+    def _revisar(self, sql, parametros, segundos, explicable=True):
+        valores = ajustes()
+        umbral = valores["consultas_lentas_ms"]
+        if not umbral or segundos * 1000 < umbral:
+            return
+
+        texto = " ".join(sql.split())
+        registro = {
+            "fecha": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "pid": os.getpid(),
+            "ruta": ruta_actual(),
+            "ms": round(segundos * 1000, 1),
+            "filas": getattr(self._cursor, "rowcount", None),
+            "sql": texto,
+            "parametros": _parametros(parametros)
+        }
+        if explicable and valores["explain"] and _explicable(texto):
+            self._pendiente = (registro, sql, parametros)
+        else:
+            _anotar(registro)
+
+    def _explicar_pendiente(self):
+        if self._pendiente is None:
+            return
+        registro, sql, parametros = self._pendiente
+        self._pendiente = None
+        try:
+            registro["explain"] = _explain(
+                self._crear_cursor, getattr(self._cursor, "motor", "mysql"), sql, parametros
+            )
+        except Exception as e:
+            registro["explain_error"] = str(e)
+        _anotar(registro)
+
+
+def vigilar_cursor(cursor, crear_cursor):
+    """crear_cursor: cursor sin envolver de la misma conexión para el EXPLAIN"""
+    return CursorVigilado(cursor, crear_cursor) if PERFILADO_CONFIG["habilitado"] else cursor
+
+
+def consultas_lentas(limite=50):
+    """Últimas consultas lentas registradas (todos los workers), de la más reciente a la más antigua"""
+    try:
+        with open(_ruta("consultas_lentas.jsonl"), encoding="utf-8") as f:
+            ultimas = deque(f, maxlen=limite)
+    except OSError:
+        return []
+    registros = []
+    for linea in reversed(ultimas):
+        try:
+            registros.append(json.loads(linea))
+        except ValueError:
+            continue
+    return registros
+
+# ---------------------------------------------------------
+# Perfil de una petición
+# ---------------------------------------------------------
+
+PATRON_PERFIL = re.compile(r"^[\w.-]+$")
+
+
+def iniciar_perfil(ruta):
+    """(perfil, nombre) o None si el perfilado está deshabilitado u ocupado"""
+    if not ajustes()["perfilado_peticiones"]:
+        return None
+    perfil = cProfile.Profile()
+    try:
+        perfil.enable()
+    except ValueError:
+        # Python 3.12+: un solo perfil activo por proceso
+        return None
+    etiqueta = re.sub(r"[^\w]+", "_", ruta).strip("_") or "raiz"
+    return perfil, f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{etiqueta}"
+
+
+def terminar_perfil(perfil, nombre, descripcion, segundos):
+    perfil.disable()
+    carpeta = _ruta("perfiles")
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        perfil.dump_stats(os.path.join(carpeta, f"{nombre}.prof"))
+
+        texto = io.StringIO()
+        texto.write(f"{descripcion}\nDuración: {segundos * 1000:.1f} ms\n\n")
+        stats = pstats.Stats(perfil, stream=texto)
+        stats.sort_stats("cumulative").print_stats(60)
+        stats.sort_stats("tottime").print_stats(30)
+        with open(os.path.join(carpeta, f"{nombre}.txt"), "w", encoding="utf-8") as f:
+            f.write(texto.getvalue())
+
+        _limpiar_perfiles(carpeta)
+    except OSError as e:
+        print(f"⚠️ No se pudo guardar el perfil {nombre}: {e}")
+        return
+    print(f"🔬 Perfil guardado: {nombre} ({segundos * 1000:.1f} ms)")
+
+
+def _limpiar_perfiles(carpeta):
+    nombres = sorted({os.path.splitext(a)[0] for a in os.listdir(carpeta) if a.endswith(".prof")})
+    for nombre in nombres[:-PERFILADO_CONFIG["max_perfiles"]]:
+        for extension in (".prof", ".txt"):
+            try:
+                os.remove(os.path.join(carpeta, nombre + extension))
+            except OSError:
+                pass
+
+
+def listar_perfiles():
+    try:
+        archivos = os.listdir(_ruta("perfiles"))
+    except OSError:
+        return []
+    return sorted((os.path.splitext(a)[0] for a in archivos if a.endswith(".prof")), reverse=True)
+
+
+def ruta_perfil(nombre, formato="txt"):
+    """Ruta del perfil o None si el nombre no es válido o no existe"""
+    if not PATRON_PERFIL.match(nombre) or formato not in ("txt", "prof"):
+        return None
+    ruta = os.path.join(_ruta("perfiles"), f"{nombre}.{formato}")
+    return os.path.abspath(ruta) if os.path.exists(ruta) else None
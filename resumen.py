@@ -0,0 +1,190 @@
+"""
+Datos precalculados del dashboard y de /estadisticas
+Los conteos por tabla, por situación, de cargas por día y las métricas de
+calidad (duplicados, nulos, RFC inválidos) se calculan una sola vez cuando
+termina una carga (carga_csv / init_db) y se guardan como JSON en
+Resumen_Dashboard y Estadisticas_Datos. Las páginas solo leen esas filas
+por llave primaria.
+"""
+
+import json
+from datetime import date
+
+from config import TABLAS_CONSULTA
+from consultas import COLUMNA_FECHA_FILTRO
+from normalizacion import RFC_REGEX
+from cache_datos import obtener_version
+
+# ---------------------------------------------------------
+# Cálculo (solo en cargas)
+# ---------------------------------------------------------
+
+def calcular_resumen(cursor):
+    registros_por_tabla = {}
+    for tabla in TABLAS_CONSULTA:
+        cursor.execute(f"SELECT COUNT(*) AS count FROM {tabla}")
+        registros_por_tabla[tabla] = cursor.fetchone()["count"]
+
+    cursor.execute("""
+        SELECT situacion_contribuyente AS situacion, COUNT(*) AS total
+        FROM Listado_Completo_69_B
+        GROUP BY situacion_contribuyente
+        ORDER BY total DESC
+    """)
+    situaciones = [{"situacion": s["situacion"], "total": s["total"]} for s in cursor.fetchall()]
+
+    cursor.execute("""
+        SELECT DATE(fecha) AS dia, COUNT(*) AS total
+        FROM Historial_Cargas
+        GROUP BY DATE(fecha)
+        ORDER BY dia DESC
+        LIMIT 7
+    """)
+    cargas_por_dia = [{"dia": str(c["dia"]), "total": c["total"]} for c in cursor.fetchall()]
+
+    cursor.execute("SELECT fecha FROM Historial_Cargas ORDER BY fecha DESC LIMIT 1")
+    ultima = cursor.fetchone()
+
+    return {
+        "registros_por_tabla": registros_por_tabla,
+        "situaciones": situaciones,
+        "cargas_por_dia": cargas_por_dia,
+        "ultima_carga": str(ultima["fecha"]) if ultima else "N/A"
+    }
+
+
+def refrescar_resumen(cursor):
+    """Recalcula y guarda el resumen; nunca interrumpe la carga que lo llama"""
+    try:
+        resumen = calcular_resumen(cursor)
+        cursor.execute("""
+            REPLACE INTO Resumen_Dashboard (id, datos, actualizado)
+            VALUES (1, %s, NOW())
+        """, (json.dumps(resumen),))
+        return resumen
+    except Exception as e:
+        print(f"⚠️ No se pudo actualizar el resumen del dashboard: {e}")
+        return None
+
+# ---------------------------------------------------------
+# Lectura (dashboard)
+# ---------------------------------------------------------
+
+def leer_resumen(cursor):
+    """Una lectura por llave primaria; None si el resumen aún no existe"""
+    try:
+        cursor.execute("SELECT datos FROM Resumen_Dashboard WHERE id = 1")
+        fila = cursor.fetchone()
+    except Exception:
+        return None
+    return json.loads(fila["datos"]) if fila else None
+
+
+def procesados_hoy(resumen):
+    """Cargas de hoy; si hoy no hubo cargas el resumen no tiene el día y vale 0"""
+    hoy = date.today().isoformat()
+    return next((c["total"] for c in resumen["cargas_por_dia"] if c["dia"] == hoy), 0)
+
+# ---------------------------------------------------------
+# Estadísticas de calidad (/estadisticas)
+# ---------------------------------------------------------
+
+def calcular_estadisticas(cursor):
+    stats = {}
+    duplicates = {}
+    calidad = {}
+    actualizaciones = []
+
+    for tabla in TABLAS_CONSULTA:
+        cursor.execute(f"""
+            SELECT
+                COUNT(*) AS total,
+                SUM(rfc IS NULL OR rfc = '') AS sin_rfc,
+                SUM(rfc IS NOT NULL AND rfc <> '' AND rfc NOT REGEXP %s) AS rfc_invalidos,
+                SUM(nombre_contribuyente IS NULL OR nombre_contribuyente = '') AS sin_nombre,
+                SUM(situacion_contribuyente IS NULL) AS sin_situacion,
+                SUM({COLUMNA_FECHA_FILTRO[tabla]} IS NULL) AS sin_publicacion,
+                MAX(fecha_actualizacion) AS ultima_actualizacion
+            FROM {tabla}
+        """, (RFC_REGEX.pattern,))
+        fila = cursor.fetchone()
+        total = fila["total"]
+
+        stats[tabla] = total
+        calidad[tabla] = {
+            clave: int(fila[clave] or 0)
+            for clave in ("sin_rfc", "rfc_invalidos", "sin_nombre", "sin_situacion", "sin_publicacion")
+        }
+        actualizaciones.append({
+            "table_name": tabla,
+            "ultima_actualizacion": fila["ultima_actualizacion"].strftime("%d/%m/%Y") if fila["ultima_actualizacion"] else None,
+            "total_registros": total
+        })
+
+        cursor.execute(f"""
+            SELECT COUNT(*) AS duplicate_count
+            FROM (
+                SELECT rfc, COUNT(*) AS count
+                FROM {tabla}
+                WHERE rfc IS NOT NULL
+                GROUP BY rfc
+                HAVING COUNT(*) > 1
+            ) AS dups
+        """)
+        duplicates[tabla] = cursor.fetchone()["duplicate_count"]
+
+    cursor.execute("""
+        SELECT situacion_contribuyente, COUNT(*) AS count
+        FROM Listado_Completo_69_B
+        GROUP BY situacion_contribuyente
+        ORDER BY count DESC
+    """)
+    situaciones = cursor.fetchall()
+
+    try:
+        cursor.execute("SELECT tabla, linea1, linea2 FROM Texto_Legal_Tablas")
+        textos_legales = cursor.fetchall()
+    except Exception:
+        textos_legales = []
+
+    return {
+        "stats": stats,
+        "duplicates": duplicates,
+        "calidad": calidad,
+        "situaciones": situaciones,
+        "actualizaciones": sorted(actualizaciones, key=lambda a: a["table_name"]),
+        "textos_legales": textos_legales
+    }
+
+
+def refrescar_estadisticas(cursor):
+    """Recalcula y guarda las estadísticas con la versión de datos actual"""
+    try:
+        datos = calcular_estadisticas(cursor)
+        version = obtener_version(cursor)
+        cursor.execute("""
+            REPLACE INTO Estadisticas_Datos (id, datos, version, actualizado)
+            VALUES (1, %s, %s, NOW())
+        """, (json.dumps(datos), version))
+        return leer_estadisticas(cursor) or {"datos": datos, "version": version, "actualizado": None}
+    except Exception as e:
+        print(f"⚠️ No se pudieron actualizar las estadísticas: {e}")
+        return None
+
+
+def leer_estadisticas(cursor):
+    """Devuelve {'datos', 'version', 'actualizado'} o None si aún no existen"""
+    try:
+        cursor.execute("SELECT datos, version, actualizado FROM Estadisticas_Datos WHERE id = 1")
+        fila = cursor.fetchone()
+    except Exception:
+        return None
+    if not fila:
+        return None
+    return {"datos": json.loads(fila["datos"]), "version": fila["version"], "actualizado": fila["actualizado"]}
+
+
+def refrescar_precalculados(cursor):
+    """Se llama al final de cada carga, antes del commit"""
+    refrescar_resumen(cursor)
+    refrescar_estadisticas(cursor)
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+"""
+Índice de RFCs compartido en memoria (mmap)
+Un arreglo NumPy ordenado de RFCs de ancho fijo (13 bytes) con una máscara de
+bits de las tablas donde aparece cada RFC. Los archivos se abren con
+mmap_mode='r', así que todos los workers de gunicorn comparten la misma copia
+a través del page cache del sistema operativo.
+
+Estructura en disco (en la carpeta de RFC_INDEX_CONFIG['ruta']):
+- rfc_index.json                 → puntero con versión, tablas y archivos activos
+- rfc_index.<version>.rfcs.npy   → RFCs ordenados (dtype S13)
+- rfc_index.<version>.mask.npy   → máscara por RFC (bit i = TABLAS_CONSULTA[i])
+
+La reconstrucción escribe una versión nueva y reemplaza el puntero con
+os.replace(), de modo que los workers detectan el cambio sin reiniciarse.
+El puntero guarda la versión de Version_Datos con la que se construyó: si los
+datos son más nuevos (la reconstrucción falló o sigue en curso), el índice no
+se usa y las consultas van a MySQL.
+"""
+
+import os
+import json
+import glob
+import threading
+from datetime import datetime
+
+import numpy as np
+from config import TABLAS_CONSULTA, RFC_INDEX_CONFIG
+from cache_datos import obtener_version
+
+ANCHO_RFC = 13
+VERSIONES_CONSERVADAS = 2
+
+# ---------------------------------------------------------
+# Codificación de RFCs
+# ---------------------------------------------------------
+
+def codificar(rfcs):
+    """Convierte RFCs a un arreglo S13; los RFCs inválidos quedan vacíos"""
+    valores = []
+    for rfc in rfcs:
+        rfc = (rfc or "").strip().upper().encode("latin1", "replace")
+        valores.append(rfc if len(rfc) <= ANCHO_RFC else b"")
+    return np.array(valores, dtype=f"S{ANCHO_RFC}")
+
+# ---------------------------------------------------------
+# Construcción
+# ---------------------------------------------------------
+
+def construir_indice(cursor, ruta=None, tablas=None):
+    """Lee los RFCs de cada tabla y publica una nueva versión del índice"""
+    ruta = ruta or RFC_INDEX_CONFIG["ruta"]
+    tablas = tablas or TABLAS_CONSULTA
+    carpeta = os.path.dirname(ruta) or "."
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    os.makedirs(carpeta, exist_ok=True)
+
+    # Se lee antes que los RFCs: una carga que termine a la mitad deja el índice viejo
+    version_datos = obtener_version(cursor)
+
+    arreglos = []
+    bits = []
+    for i, tabla in enumerate(tablas):
+        cursor.execute(f"SELECT DISTINCT UPPER(TRIM(rfc)) AS rfc FROM {tabla} WHERE rfc IS NOT NULL")
+        filas = [row["rfc"] if isinstance(row, dict) else row[0] for row in cursor.fetchall()]
+        arreglo = codificar(filas)
+        arreglo = arreglo[arreglo != b""]
+        arreglos.append(arreglo)
+        bits.append(np.full(len(arreglo), 1 << i, dtype=np.uint8))
+
+    todos = np.concatenate(arreglos) if arreglos else np.array([], dtype=f"S{ANCHO_RFC}")
+    todos_bits = np.concatenate(bits) if bits else np.array([], dtype=np.uint8)
+
+    rfcs, inverso = np.unique(todos, return_inverse=True)
+    mascaras = np.zeros(len(rfcs), dtype=np.uint8)
+    np.bitwise_or.at(mascaras, inverso, todos_bits)
+
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    archivo_rfcs = f"{base}.{version}.rfcs.npy"
+    archivo_mask = f"{base}.{version}.mask.npy"
+    np.save(os.path.join(carpeta, archivo_rfcs), rfcs)
+    np.save(os.path.join(carpeta, archivo_mask), mascaras)
+
+    puntero = {
+        "version": version,
+        "version_datos": version_datos,
+        "tablas": list(tablas),
+        "rfcs": archivo_rfcs,
+        "mascaras": archivo_mask,
+        "total": int(len(rfcs)),
+        "generado": datetime.now().isoformat(timespec="seconds")
+    }
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w") as f:
+        json.dump(puntero, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+
+    _limpiar_versiones(carpeta, base, version)
+    return puntero
+
+
+def _limpiar_versiones(carpeta, base, actual):
+    """Borra versiones viejas; en Linux los workers que aún las mapean no se ven afectados"""
+    versiones = sorted({
+        os.path.basename(p).split(".")[1]
+        for p in glob.glob(os.path.join(carpeta, f"{base}.*.rfcs.npy"))
+    })
+    for version in versiones[:-VERSIONES_CONSERVADAS]:
+        if version == actual:
+            continue
+        for sufijo in ("rfcs", "mask"):
+            try:
+                os.remove(os.path.join(carpeta, f"{base}.{version}.{sufijo}.npy"))
+            except OSError:
+                pass
+
+
+def retirar_indice(ruta=None):
+    """Quita el puntero; los workers dejan de usar el índice en la siguiente consulta"""
+    try:
+        os.remove(ruta or RFC_INDEX_CONFIG["ruta"])
+    except FileNotFoundError:
+        pass
+
+
+def reconstruir_si_habilitado(cursor):
+    """Reconstruye el índice después de una carga; nunca interrumpe la carga"""
+    if not RFC_INDEX_CONFIG["habilitado"]:
+        return None
+    try:
+        puntero = construir_indice(cursor)
+        print(f"✅ Índice de RFCs actualizado: versión {puntero['version']} ({puntero['total']} RFCs)")
+        return puntero
+    except Exception as e:
+        print(f"⚠️ No se pudo reconstruir el índice de RFCs: {e}")
+        try:
+            retirar_indice()
+            print("⚠️ Índice de RFCs retirado; las consultas irán a MySQL hasta la próxima reconstrucción")
+        except OSError as e:
+            print(f"⚠️ No se pudo retirar el índice de RFCs: {e}")
+        return None
+
+# ---------------------------------------------------------
+# Consulta
+# ---------------------------------------------------------
+
+class IndiceRFC:
+    """Vista de solo lectura del índice; se recarga sola al cambiar la versión"""
+
+    def __init__(self, ruta):
+        self.ruta = ruta
+        self._firma = None
+        self._rfcs = None
+        self._mascaras = None
+        self.tablas = []
+        self.version = None
+        self.version_datos = None
+        self._lock = threading.Lock()
+
+    def _recargar_si_cambio(self):
+        try:
+            st = os.stat(self.ruta)
+        except OSError:
+            self._rfcs = None
+            self._firma = None
+            return
+
+        firma = (st.st_ino, st.st_mtime_ns)
+        if firma == self._firma:
+            return
+
+        with self._lock:
+            if firma == self._firma:
+                return
+            with open(self.ruta) as f:
+                puntero = json.load(f)
+            carpeta = os.path.dirname(self.ruta) or "."
+            self._rfcs = np.load(os.path.join(carpeta, puntero["rfcs"]), mmap_mode="r")
+            self._mascaras = np.load(os.path.join(carpeta, puntero["mascaras"]), mmap_mode="r")
+            self.tablas = puntero["tablas"]
+            self.version = puntero["version"]
+            self.version_datos = puntero.get("version_datos")
+            self._firma = firma
+
+    def disponible(self):
+        try:
+            self._recargar_si_cambio()
+        except Exception as e:
+            print(f"⚠️ Índice de RFCs no disponible: {e}")
+            self._rfcs = None
+        return self._rfcs is not None
+
+    def vigente(self, version_datos):
+        """True si el índice se construyó con esta versión de los datos o una posterior"""
+        if version_datos is None or self.version_datos is None:
+            return False
+        return self.version_datos >= version_datos
+
+    def buscar(self, rfcs):
+        """Devuelve {rfc: [tablas]} con un searchsorted vectorizado sobre todo el lote"""
+        rfcs = list(rfcs)
+        resultado = {rfc: [] for rfc in rfcs}
+        if not rfcs or not len(self._rfcs):
+            return resultado
+
+        claves = codificar(rfcs)
+        posiciones = np.searchsorted(self._rfcs, claves)
+        posiciones = np.minimum(posiciones, len(self._rfcs) - 1)
+        halladas = (self._rfcs[posiciones] == claves) & (claves != b"")
+        mascaras = np.where(halladas, self._mascaras[posiciones], 0)
+
+        for rfc, mascara in zip(rfcs, mascaras.tolist()):
+            if mascara:
+                resultado[rfc] = [t for i, t in enumerate(self.tablas) if mascara & (1 << i)]
+        return resultado
+
+
+indice_rfc = IndiceRFC(RFC_INDEX_CONFIG["ruta"])
+
+
+if __name__ == "__main__":
+    import mysql.connector
+    from config import DB_CONFIG
+
+    conn = mysql.connector.connect(**DB_CONFIG)
+    cursor = conn.cursor(dictionary=True)
+    puntero = construir_indice(cursor)
+    print(f"✅ Índice generado: versión {puntero['version']} ({puntero['total']} RFCs)")
+    cursor.close()
+    conn.close()
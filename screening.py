@@ -0,0 +1,181 @@
+"""
+Motor de consulta masiva de RFCs (screening)
+Resuelve en qué tablas del SAT aparece cada RFC de una lista usando
+consultas por conjuntos en lugar de un SELECT por RFC y por tabla:
+- Listas pequeñas: lotes IN (...) combinados con UNION ALL
+- Listas grandes: tabla temporal de sesión + un JOIN por tabla
+- Opcional: índice mmap compartido (rfc_index.py) sin tocar MySQL
+'detalle_rfcs' devuelve además las filas (situación y publicaciones) para
+la API por lotes.
+"""
+
+from config import TABLAS_CONSULTA, SCREENING_CONFIG, DB_SETTINGS, RFC_INDEX_CONFIG
+from rfc_index import indice_rfc
+from cache_datos import estampa_datos
+from consultas import buscar_por_rfcs
+from metricas import observar
+
+TABLA_TEMPORAL = "tmp_screening_rfcs"
+
+# ---------------------------------------------------------
+# Utilidades
+# ---------------------------------------------------------
+
+def normalizar_lista(rfcs):
+    """Limpia, convierte a mayúsculas y elimina duplicados conservando el orden"""
+    unicos = {}
+    for rfc in rfcs:
+        rfc = (rfc or "").strip().upper()
+        if rfc:
+            unicos.setdefault(rfc, None)
+    return list(unicos)
+
+
+def _tabla_y_rfc(row):
+    if isinstance(row, dict):
+        return row["tabla"], row["rfc"]
+    return row[0], row[1]
+
+
+def _lotes(valores, tamano):
+    for i in range(0, len(valores), tamano):
+        yield valores[i:i + tamano]
+
+# ---------------------------------------------------------
+# Estrategias de consulta
+# ---------------------------------------------------------
+
+def _por_lotes_in(cursor, rfcs, tablas, tamano_lote):
+    """Una consulta UNION ALL por lote de RFCs"""
+    for lote in _lotes(rfcs, tamano_lote):
+        placeholders = ", ".join(["%s"] * len(lote))
+        partes = [
+            f"SELECT DISTINCT '{tabla}' AS tabla, rfc "
+            f"FROM {tabla} WHERE rfc IN ({placeholders})"
+            for tabla in tablas
+        ]
+        cursor.execute(" UNION ALL ".join(partes), tuple(lote) * len(tablas))
+        for row in cursor.fetchall():
+            yield _tabla_y_rfc(row)
+
+
+def _por_tabla_temporal(cursor, rfcs, tablas, tamano_lote):
+    """Carga los RFCs en una tabla temporal de sesión y hace un JOIN por tabla"""
+    cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {TABLA_TEMPORAL}")
+    cursor.execute(f"""
+        CREATE TEMPORARY TABLE {TABLA_TEMPORAL} (
+            rfc VARCHAR(20) NOT NULL PRIMARY KEY
+        ) ENGINE=MEMORY
+          DEFAULT CHARSET={DB_SETTINGS['charset']}
+          COLLATE={DB_SETTINGS['collation']}
+    """)
+
+    try:
+        for lote in _lotes(rfcs, tamano_lote):
+            valores = ", ".join(["(%s)"] * len(lote))
+            cursor.execute(f"INSERT IGNORE INTO {TABLA_TEMPORAL} (rfc) VALUES {valores}", tuple(lote))
+
+        # MySQL no permite abrir una tabla temporal dos veces en la misma
+        # consulta, por eso se hace un JOIN por tabla en lugar de UNION ALL
+        for tabla in tablas:
+            cursor.execute(f"""
+                SELECT DISTINCT '{tabla}' AS tabla, t.rfc
+                FROM {TABLA_TEMPORAL} t
+                JOIN {tabla} x ON x.rfc = t.rfc
+            """)
+            for row in cursor.fetchall():
+                yield _tabla_y_rfc(row)
+
+    finally:
+        cursor.execute(f"DROP TEMPORARY TABLE IF EXISTS {TABLA_TEMPORAL}")
+
+# ---------------------------------------------------------
+# API pública
+# ---------------------------------------------------------
+
+def consultar_rfcs(cursor, rfcs, tablas=None):
+    """
+    Devuelve {rfc: [tablas donde aparece]} para cada RFC único de la lista.
+    Las tablas se devuelven en el orden de TABLAS_CONSULTA.
+    """
+    tablas = tablas or TABLAS_CONSULTA
+    rfcs = normalizar_lista(rfcs)
+    resultado = {rfc: [] for rfc in rfcs}
+    observar("sat_screening_lote_rfcs", len(rfcs), funcion="consultar_rfcs")
+
+    if not rfcs:
+        return resultado
+
+    tamano_lote = SCREENING_CONFIG["tamano_lote"]
+    # Las tablas temporales MEMORY son de MySQL; el snapshot SQLite usa lotes IN
+    if len(rfcs) >= SCREENING_CONFIG["umbral_tabla_temporal"] and getattr(cursor, "motor", "mysql") == "mysql":
+        filas = _por_tabla_temporal(cursor, rfcs, tablas, tamano_lote)
+    else:
+        filas = _por_lotes_in(cursor, rfcs, tablas, tamano_lote)
+
+    encontradas = {}
+    for tabla, rfc in filas:
+        encontradas.setdefault(rfc.upper(), set()).add(tabla)
+
+    for rfc, conjunto in encontradas.items():
+        if rfc in resultado:
+            resultado[rfc] = [t for t in tablas if t in conjunto]
+
+    return resultado
+
+
+def consultar_indice(rfcs, version=None):
+    """
+    Resuelve la lista con el índice mmap (sin MySQL).
+    Devuelve None si el índice no está habilitado, todavía no existe o es
+    anterior a la versión de los datos (por omisión, la de estampa_datos).
+    """
+    if not RFC_INDEX_CONFIG["habilitado"] or not indice_rfc.disponible():
+        return None
+    if version is None:
+        estampa = estampa_datos()
+        version = estampa[0] if estampa else None
+    if not indice_rfc.vigente(version):
+        return None
+
+    encontradas = indice_rfc.buscar(normalizar_lista(rfcs))
+    return {
+        rfc: [t for t in TABLAS_CONSULTA if t in tablas]
+        for rfc, tablas in encontradas.items()
+    }
+
+
+def detalle_rfcs(cursor, rfcs):
+    """
+    {rfc: [filas de cada tabla donde aparece]} para los RFCs de un bloque.
+    Con el índice mmap solo se consultan en MySQL los RFCs que aparecen y
+    solo en sus tablas; un bloque sin coincidencias no toca la base.
+    """
+    rfcs = normalizar_lista(rfcs)
+    resultado = {rfc: [] for rfc in rfcs}
+    observar("sat_screening_lote_rfcs", len(rfcs), funcion="detalle_rfcs")
+
+    tablas = None
+    encontradas = consultar_indice(rfcs)
+    if encontradas is not None:
+        rfcs = [rfc for rfc in rfcs if encontradas.get(rfc)]
+        tablas = [t for t in TABLAS_CONSULTA if any(t in encontradas[rfc] for rfc in rfcs)]
+
+    for lote in _lotes(rfcs, SCREENING_CONFIG["tamano_lote"]):
+        for fila in buscar_por_rfcs(cursor, lote, tablas):
+            resultado.setdefault(fila["rfc"].upper(), []).append(fila)
+
+    return resultado
+
+
+def resultados_por_linea(rfcs, encontradas):
+    """Arma la lista de resultados respetando el orden (y repeticiones) del archivo"""
+    resultados = []
+    for rfc in rfcs:
+        tablas = encontradas.get(rfc, [])
+        resultados.append({
+            "rfc": rfc,
+            "encontrado": bool(tablas),
+            "tablas": tablas
+        })
+    return resultados
@@ -0,0 +1,253 @@
+"""
+Servicio de consulta asíncrono (ASGI, solo lectura)
+Atiende las búsquedas por RFC y por nombre con un pool de conexiones
+asíncrono (aiomysql), así que un proceso sostiene miles de consultas
+simultáneas sin ocupar un worker de gunicorn por cada una. Usa el mismo
+SQL que la aplicación Flask (consultas.py) y responde JSON.
+
+Uso:
+    pip install aiomysql uvicorn
+    uvicorn servicio_async:app --host 0.0.0.0 --port 8001
+
+Rutas:
+    GET /api/contribuyente/<rfc>          (mismo formato que la app Flask)
+    GET /search?q=...&type=rfc|nombre&page=N
+    GET /salud
+"""
+
+import json
+import time
+import asyncio
+from decimal import Decimal
+from datetime import date
+from urllib.parse import parse_qs, unquote
+
+from werkzeug.http import http_date
+
+from config import DB_CONFIG, ASYNC_CONFIG, TABLAS_CONSULTA, CACHE_HTTP_CONFIG
+from consultas import sql_por_rfc, consultas_por_nombre, ERRORES_SIN_FULLTEXT
+from normalizacion import normalizar_rfc
+from screening import consultar_indice
+
+POR_PAGINA = 50
+
+# ---------------------------------------------------------
+# Pool de conexiones asíncrono
+# ---------------------------------------------------------
+
+_pool = None
+_pool_lock = asyncio.Lock()
+
+
+async def crear_pool():
+    try:
+        import aiomysql
+    except ImportError:
+        raise RuntimeError("El servicio asíncrono requiere aiomysql (pip install aiomysql)")
+
+    return await aiomysql.create_pool(
+        host=DB_CONFIG["host"],
+        user=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        db=DB_CONFIG["database"],
+        charset="utf8mb4",
+        autocommit=True,
+        minsize=ASYNC_CONFIG["pool_minimo"],
+        maxsize=ASYNC_CONFIG["pool_maximo"],
+        pool_recycle=ASYNC_CONFIG["reciclar_segundos"],
+        cursorclass=aiomysql.DictCursor
+    )
+
+
+async def obtener_pool():
+    global _pool
+    if _pool is None:
+        async with _pool_lock:
+            if _pool is None:
+                _pool = await crear_pool()
+    return _pool
+
+
+def usar_pool(pool):
+    """Sustituye el pool (benchmark con una base simulada)"""
+    global _pool
+    _pool = pool
+
+
+async def cerrar_pool():
+    global _pool
+    if _pool is not None:
+        _pool.close()
+        await _pool.wait_closed()
+        _pool = None
+
+# ---------------------------------------------------------
+# Consultas
+# ---------------------------------------------------------
+
+def _errno(error):
+    return error.args[0] if error.args and isinstance(error.args[0], int) else None
+
+
+async def _ejecutar(consultas):
+    """
+    Ejecuta la primera consulta (sql, parámetros) y usa las siguientes como
+    respaldo si la base aún no tiene el índice FULLTEXT.
+    """
+    pool = await obtener_pool()
+    conn = await asyncio.wait_for(pool.acquire(), ASYNC_CONFIG["timeout_segundos"])
+    try:
+        async with conn.cursor() as cursor:
+            for i, (sql, parametros) in enumerate(consultas):
+                try:
+                    await cursor.execute(sql, parametros)
+                    break
+                except Exception as e:
+                    if i == len(consultas) - 1 or _errno(e) not in ERRORES_SIN_FULLTEXT:
+                        raise
+            filas = await cursor.fetchall()
+    finally:
+        pool.release(conn)
+
+    for fila in filas:
+        fila.pop("orden_tabla", None)
+    return list(filas)
+
+
+_version = {"valor": None, "leida": 0.0}
+
+
+async def version_datos():
+    """Versión de Version_Datos, releída como máximo cada 'segundos_version'"""
+    if _version["valor"] is not None and time.monotonic() - _version["leida"] < CACHE_HTTP_CONFIG["segundos_version"]:
+        return _version["valor"]
+    try:
+        filas = await _ejecutar([("SELECT version FROM Version_Datos WHERE id = 1", ())])
+    except Exception:
+        filas = []
+    _version["valor"] = filas[0]["version"] if filas else None
+    _version["leida"] = time.monotonic()
+    return _version["valor"]
+
+
+async def buscar_rfc(rfc):
+    tablas = TABLAS_CONSULTA
+    version = await version_datos()
+    encontradas = None
+    if version is not None:
+        # searchsorted sobre el mmap puede leer del disco: fuera del ciclo de eventos
+        encontradas = await asyncio.to_thread(consultar_indice, [rfc], version)
+    if encontradas is not None:
+        tablas = encontradas.get(rfc, [])
+        if not tablas:
+            return []
+    return await _ejecutar([(sql_por_rfc(tablas), (rfc,) * len(tablas))])
+
+
+async def buscar_nombre(nombre, pagina):
+    consultas = consultas_por_nombre(nombre, pagina, POR_PAGINA)
+    if consultas is None:
+        return [], False
+    filas = await _ejecutar(list(consultas))
+    return filas[:POR_PAGINA], len(filas) > POR_PAGINA
+
+# ---------------------------------------------------------
+# ASGI
+# ---------------------------------------------------------
+
+def _json_por_defecto(valor):
+    """Mismo formato que el proveedor JSON de Flask"""
+    if isinstance(valor, date):
+        return http_date(valor)
+    if isinstance(valor, Decimal):
+        return str(valor)
+    raise TypeError(f"Objeto no serializable: {type(valor).__name__}")
+
+
+async def _responder(send, estado, datos):
+    cuerpo = json.dumps(datos, default=_json_por_defecto, ensure_ascii=False).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": estado,
+        "headers": [
+            (b"content-type", b"application/json; charset=utf-8"),
+            (b"content-length", str(len(cuerpo)).encode())
+        ]
+    })
+    await send({"type": "http.response.body", "body": cuerpo})
+
+
+def _sin_cuerpo(send):
+    """HEAD: mismos encabezados (incluido content-length) y cuerpo vacío"""
+    async def enviar(mensaje):
+        if mensaje["type"] == "http.response.body":
+            mensaje = {**mensaje, "body": b""}
+        await send(mensaje)
+    return enviar
+
+
+async def _ciclo_de_vida(receive, send):
+    while True:
+        mensaje = await receive()
+        if mensaje["type"] == "lifespan.startup":
+            try:
+                await obtener_pool()
+            except Exception as e:
+                await send({"type": "lifespan.startup.failed", "message": str(e)})
+                return
+            await send({"type": "lifespan.startup.complete"})
+        elif mensaje["type"] == "lifespan.shutdown":
+            await cerrar_pool()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await _ciclo_de_vida(receive, send)
+    if scope["type"] != "http":
+        return
+
+    ruta = scope["path"]
+    if scope["method"] not in ("GET", "HEAD"):
+        return await _responder(send, 405, {"error": "Método no permitido"})
+    if scope["method"] == "HEAD":
+        send = _sin_cuerpo(send)
+
+    try:
+        if ruta.startswith("/api/contribuyente/"):
+            rfc = normalizar_rfc(unquote(ruta[len("/api/contribuyente/"):]))
+            return await _responder(send, 200, await buscar_rfc(rfc) if rfc else [])
+
+        if ruta == "/search":
+            parametros = parse_qs(scope.get("query_string", b"").decode("utf-8"))
+            query = parametros.get("q", [""])[0].strip().upper()
+            tipo = parametros.get("type", ["rfc"])[0]
+            try:
+                pagina = max(int(parametros.get("page", ["1"])[0]), 1)
+            except ValueError:
+                pagina = 1
+
+            if not query:
+                resultados, hay_siguiente = [], False
+            elif tipo == "rfc":
+                resultados, hay_siguiente = await buscar_rfc(normalizar_rfc(query)), False
+            else:
+                resultados, hay_siguiente = await buscar_nombre(query, pagina)
+            return await _responder(send, 200, {
+                "query": query,
+                "type": tipo,
+                "page": pagina,
+                "hay_siguiente": hay_siguiente,
+                "results": resultados
+            })
+
+        if ruta == "/salud":
+            return await _responder(send, 200, {"estado": "ok"})
+
+        return await _responder(send, 404, {"error": "Ruta no encontrada"})
+
+    except asyncio.TimeoutError:
+        return await _responder(send, 503, {"error": "No hay conexiones disponibles"})
+    except Exception as e:
+        return await _responder(send, 500, {"error": str(e)})
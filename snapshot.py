@@ -0,0 +1,344 @@
+#!/usr/bin/env python3
+"""
+Snapshot de solo lectura en SQLite para búsquedas sin MySQL
+Copia compacta de las tablas de consulta (solo las columnas que usan las
+búsquedas, la API y el screening) con índice por RFC. Se genera desde MySQL
+después de cada carga (en un trabajo en segundo plano) o directamente desde los CSV de CSV_FILES, y app.py
+lo usa cuando MySQL no responde o cuando SNAPSHOT_CONFIG['backend'] lo pide.
+
+Estructura en disco (en la carpeta de SNAPSHOT_CONFIG['ruta']):
+- snapshot.json              → puntero con versión, origen, conteos y tiempo de generación
+- snapshot.<version>.db      → base SQLite (nunca se modifica una vez publicada)
+
+Como rfc_index.py, cada generación escribe una versión nueva y reemplaza el
+puntero con os.replace(); los workers abren la versión vigente en cada uso.
+
+Uso:
+    python snapshot.py              # desde MySQL
+    python snapshot.py --desde-csv  # desde los CSV de data/
+"""
+
+import os
+import re
+import json
+import glob
+import time
+import sqlite3
+import argparse
+from datetime import date, datetime
+
+from config import TABLAS_CONSULTA, CSV_FILES, SNAPSHOT_CONFIG
+from consultas import COLUMNAS_PUBLICACION
+from cache_datos import obtener_version
+from metricas import medir_cursor
+from perfilado import vigilar_cursor
+from trabajos import crear_trabajo
+
+VERSIONES_CONSERVADAS = 2
+COLUMNAS_BASE = ["numero", "rfc", "nombre_contribuyente", "situacion_contribuyente", "nombre_busqueda"]
+TAMANO_BLOQUE = 5000
+
+# ---------------------------------------------------------
+# Esquema
+# ---------------------------------------------------------
+
+def columnas_publicacion(tabla):
+    """Columnas de fecha que usan las consultas de la tabla (ver COLUMNAS_PUBLICACION)"""
+    columnas = []
+    for expresion in COLUMNAS_PUBLICACION[tabla]:
+        for columna in re.findall(r"publicacion_\w+", expresion):
+            if columna not in columnas:
+                columnas.append(columna)
+    return columnas
+
+
+def columnas_snapshot(tabla):
+    return COLUMNAS_BASE + columnas_publicacion(tabla)
+
+
+def _crear_tablas(db, tablas):
+    for tabla in tablas:
+        definicion = ", ".join(
+            f"{c} {'INTEGER' if c == 'numero' else 'DATE' if c.startswith('publicacion_') else 'TEXT'}"
+            for c in columnas_snapshot(tabla)
+        )
+        db.execute(f"CREATE TABLE {tabla} ({definicion})")
+
+
+def _indexar(db, tablas):
+    for tabla in tablas:
+        db.execute(f"CREATE INDEX idx_{tabla}_rfc ON {tabla} (rfc)")
+        db.execute(f"CREATE INDEX idx_{tabla}_numero ON {tabla} (numero)")
+
+
+def _valor(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()[:10]
+    if isinstance(valor, float):
+        return None if valor != valor else (int(valor) if valor.is_integer() else valor)
+    return valor
+
+# ---------------------------------------------------------
+# Construcción
+# ---------------------------------------------------------
+
+def _publicar(carpeta, base, version, db_ruta, datos):
+    ruta = SNAPSHOT_CONFIG["ruta"]
+    puntero = {"version": version, "archivo": os.path.basename(db_ruta), **datos}
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, "w") as f:
+        json.dump(puntero, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temporal, ruta)
+    _limpiar_versiones(carpeta, base, version)
+    return puntero
+
+
+def _limpiar_versiones(carpeta, base, actual):
+    versiones = sorted({
+        os.path.basename(p).split(".")[1]
+        for p in glob.glob(os.path.join(carpeta, f"{base}.*.db"))
+    })
+    for version in versiones[:-VERSIONES_CONSERVADAS]:
+        if version != actual:
+            try:
+                os.remove(os.path.join(carpeta, f"{base}.{version}.db"))
+            except OSError:
+                pass
+
+
+def construir_snapshot(origen, nombre_origen, version_datos=None, tablas=None):
+    """
+    Escribe una versión nueva con las filas de 'origen(tabla, columnas)'
+    (iterador de bloques de filas) y la publica. Devuelve el puntero.
+    """
+    tablas = tablas or TABLAS_CONSULTA
+    ruta = SNAPSHOT_CONFIG["ruta"]
+    carpeta = os.path.dirname(ruta) or "."
+    base = os.path.splitext(os.path.basename(ruta))[0]
+    os.makedirs(carpeta, exist_ok=True)
+
+    inicio = time.perf_counter()
+    version = datetime.now().strftime("%Y%m%d%H%M%S%f")
+    db_ruta = os.path.join(carpeta, f"{base}.{version}.db")
+    temporal = db_ruta + ".tmp"
+
+    conteos = {}
+    db = sqlite3.connect(temporal)
+    try:
+        db.execute("PRAGMA journal_mode=OFF")
+        db.execute("PRAGMA synchronous=OFF")
+        _crear_tablas(db, tablas)
+        for tabla in tablas:
+            columnas = columnas_snapshot(tabla)
+            sql = f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES ({', '.join('?' * len(columnas))})"
+            conteos[tabla] = 0
+            for filas in origen(tabla, columnas):
+                db.executemany(sql, [[_valor(v) for v in fila] for fila in filas])
+                conteos[tabla] += len(filas)
+        _indexar(db, tablas)
+        db.commit()
+        db.execute("VACUUM")
+    except Exception:
+        db.close()
+        os.remove(temporal)
+        raise
+    db.close()
+    os.replace(temporal, db_ruta)
+
+    return _publicar(carpeta, base, version, db_ruta, {
+        "origen": nombre_origen,
+        "version_datos": version_datos,
+        "tablas": conteos,
+        "bytes": os.path.getsize(db_ruta),
+        "segundos": round(time.perf_counter() - inicio, 3),
+        "generado": datetime.now().isoformat(timespec="seconds")
+    })
+
+
+def desde_mysql(cursor):
+    """Origen: las tablas cargadas en MySQL, leídas por bloques"""
+    def origen(tabla, columnas):
+        cursor.execute("DESCRIBE " + tabla)
+        existentes = {col["Field"] for col in cursor.fetchall()}
+        seleccion = ", ".join(c if c in existentes else f"NULL AS {c}" for c in columnas)
+        cursor.execute(f"SELECT {seleccion} FROM {tabla}")
+        while True:
+            filas = cursor.fetchmany(TAMANO_BLOQUE)
+            if not filas:
+                break
+            yield [[fila[c] for c in columnas] for fila in filas]
+    return origen
+
+
+def desde_csv():
+    """Origen: los CSV de CSV_FILES con la misma normalización que /carga_csv"""
+    from ingesta import leer_lotes, filas_lote
+
+    def origen(tabla, columnas):
+        ruta = CSV_FILES.get(tabla)
+        if not ruta or not os.path.exists(ruta):
+            print(f"⚠️ {tabla}: no se encontró el CSV ({ruta}); la tabla queda vacía")
+            return
+        with open(ruta, "rb") as archivo:
+            try:
+                archivo.read().decode("utf-8")
+                codificacion = "utf-8"
+            except UnicodeDecodeError:
+                codificacion = "latin1"
+            archivo.seek(0)
+            for df, _, _, _ in leer_lotes(archivo, tabla, TAMANO_BLOQUE, codificacion):
+                yield filas_lote(df, columnas)
+    return origen
+
+
+def actualizar_snapshot_si_habilitado(cursor):
+    """Regenera el snapshot en el momento (init_db); nunca interrumpe la carga"""
+    if not SNAPSHOT_CONFIG["reconstruir_en_carga"]:
+        return None
+    try:
+        puntero = construir_snapshot(desde_mysql(cursor), "mysql", obtener_version(cursor))
+        print(f"✅ Snapshot actualizado: versión {puntero['version']} en {puntero['segundos']}s")
+        return puntero
+    except Exception as e:
+        print(f"⚠️ No se pudo generar el snapshot: {e}")
+        return None
+
+
+def procesar_snapshot(trabajo):
+    """Trabajo en segundo plano: regenera el snapshot desde MySQL con su propia conexión"""
+    from db import obtener_conexion
+
+    conn = obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    try:
+        version = obtener_version(cursor)
+        vigente = leer_puntero()
+        if vigente and vigente.get("origen") == "mysql" and version is not None \
+                and vigente.get("version_datos") == version:
+            # Otra carga ya programó (y terminó) la regeneración con estos datos
+            trabajo.aviso("info", f"✅ El snapshot ya corresponde a la versión {version} de los datos")
+            return None
+
+        trabajo.avanzar(etapa="generando", forzar=True)
+        puntero = construir_snapshot(desde_mysql(cursor), "mysql", version)
+        trabajo.avanzar(etapa="terminado", registros=sum(puntero["tablas"].values()))
+        trabajo.aviso("success", f"✅ Snapshot actualizado: versión {puntero['version']} en {puntero['segundos']}s")
+        return None
+    finally:
+        cursor.close()
+        conn.close()
+
+
+def programar_snapshot_si_habilitado():
+    """Encola la regeneración después de una carga web; la carga no la espera"""
+    if not SNAPSHOT_CONFIG["reconstruir_en_carga"]:
+        return None
+    try:
+        return crear_trabajo("snapshot", procesar_snapshot)
+    except Exception as e:
+        print(f"⚠️ No se pudo programar el snapshot: {e}")
+        return None
+
+# ---------------------------------------------------------
+# Lectura (mismo contrato que las conexiones de db.py)
+# ---------------------------------------------------------
+
+class CursorSnapshot:
+    """Cursor de diccionarios sobre SQLite; traduce los %s de mysql-connector"""
+
+    motor = "sqlite"
+
+    def __init__(self, db):
+        self._cursor = db.cursor()
+
+    def execute(self, sql, parametros=()):
+        self._cursor.execute(sql.replace("%s", "?"), parametros)
+
+    def _fila(self, valores):
+        fila = {}
+        for descripcion, valor in zip(self._cursor.description, valores):
+            nombre = descripcion[0]
+            if nombre.startswith("publicacion") and isinstance(valor, str):
+                try:
+                    valor = date.fromisoformat(valor)
+                except ValueError:
+                    pass
+            fila[nombre] = valor
+        return fila
+
+    def fetchone(self):
+        valores = self._cursor.fetchone()
+        return self._fila(valores) if valores is not None else None
+
+    def fetchmany(self, tamano):
+        return [self._fila(v) for v in self._cursor.fetchmany(tamano)]
+
+    def fetchall(self):
+        return [self._fila(v) for v in self._cursor.fetchall()]
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSnapshot:
+    def __init__(self, ruta, version):
+        self.version = version
+        self._db = sqlite3.connect(f"file:{ruta}?mode=ro&immutable=1", uri=True, check_same_thread=False)
+
+    def cursor(self, dictionary=True):
+        return vigilar_cursor(medir_cursor(CursorSnapshot(self._db)), lambda: CursorSnapshot(self._db))
+
+    def commit(self):
+        pass
+
+    def close(self):
+        self._db.close()
+
+
+def leer_puntero():
+    try:
+        with open(SNAPSHOT_CONFIG["ruta"]) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def abrir_snapshot():
+    """Conexión de solo lectura a la versión vigente; None si aún no hay snapshot"""
+    puntero = leer_puntero()
+    if puntero is None:
+        return None
+    ruta = os.path.join(os.path.dirname(SNAPSHOT_CONFIG["ruta"]) or ".", puntero["archivo"])
+    try:
+        return ConexionSnapshot(ruta, puntero["version"])
+    except sqlite3.Error as e:
+        print(f"⚠️ Snapshot no disponible: {e}")
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Snapshot de solo lectura del Sistema SAT")
+    parser.add_argument("--desde-csv", action="store_true", help="Generar desde CSV_FILES en lugar de MySQL")
+    args = parser.parse_args()
+
+    if args.desde_csv:
+        puntero = construir_snapshot(desde_csv(), "csv")
+    else:
+        from db import obtener_conexion
+        conn = obtener_conexion()
+        cursor = conn.cursor(dictionary=True)
+        try:
+            puntero = construir_snapshot(desde_mysql(cursor), "mysql", obtener_version(cursor))
+        finally:
+            cursor.close()
+            conn.close()
+
+    print(f"\n✅ Snapshot {puntero['version']} ({puntero['bytes'] // 1024} KB) en {puntero['segundos']}s")
+    for tabla, total in puntero["tablas"].items():
+        print(f"   {tabla:<25} {total:>8}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,306 @@
+"""
+Base local (SQLite) que sustituye a MySQL en los benchmarks
+Crea las tablas que usan las cargas, las búsquedas y la exportación con las
+columnas de MAPEOS y entrega conexiones con el mismo contrato que
+mysql-connector (cursor(dictionary=True), %s, rowcount, lastrowid). Traduce
+el subconjunto de SQL de MySQL que usa la aplicación:
+
+- DESCRIBE / SHOW COLUMNS FROM ... [LIKE ...]
+- CREATE TABLE ... LIKE ... (con sus índices) y RENAME TABLE a TO b, c TO d
+- INSERT IGNORE y ON DUPLICATE KEY UPDATE
+- UPDATE ... JOIN ... SET, DELETE x FROM ... JOIN, <=> y DROP TEMPORARY TABLE
+- NOW(), MD5(), CONCAT_WS(), REGEXP y DATABASE()
+
+Las búsquedas por nombre ven motor = "sqlite" y usan LIKE en lugar de
+FULLTEXT, igual que con el snapshot. Los demás SHOW no existen aquí y
+fallan como fallaría un servidor sin el permiso correspondiente.
+
+Uso (benchmark.py suite):
+    crear_base(ruta)
+    db.usar_pool(pool_sustituto(ruta))
+"""
+
+import re
+import sqlite3
+import hashlib
+import threading
+from datetime import date, datetime
+
+from config import TABLAS_CONSULTA, DB_POOL_CONFIG
+from db import PoolConexiones
+from ingesta import MAPEOS
+
+# ---------------------------------------------------------
+# Esquema
+# ---------------------------------------------------------
+
+TABLAS_AUXILIARES = [
+    """CREATE TABLE Historial_Cargas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        nombre_archivo TEXT, tabla TEXT, registros INTEGER,
+        fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE Texto_Legal_Tablas (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, tabla TEXT NOT NULL, linea1 TEXT, linea2 TEXT
+    )""",
+    "CREATE INDEX idx_texto_legal_tabla ON Texto_Legal_Tablas (tabla)",
+    "CREATE TABLE Version_Datos (id INTEGER PRIMARY KEY, version INTEGER NOT NULL, actualizado TIMESTAMP NOT NULL)",
+    "CREATE TABLE Resumen_Dashboard (id INTEGER PRIMARY KEY, datos TEXT NOT NULL, actualizado TIMESTAMP NOT NULL)",
+    """CREATE TABLE Estadisticas_Datos (
+        id INTEGER PRIMARY KEY, datos TEXT NOT NULL, version INTEGER, actualizado TIMESTAMP NOT NULL
+    )""",
+    """CREATE TABLE Cambios_Situacion (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabla TEXT NOT NULL, rfc TEXT NOT NULL,
+        situacion_anterior TEXT, situacion_nueva TEXT,
+        fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    )""",
+    """CREATE TABLE Backups (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        tabla TEXT NOT NULL, archivo TEXT NOT NULL, registros INTEGER NOT NULL,
+        bytes INTEGER NOT NULL, motivo TEXT NOT NULL, creado TIMESTAMP NOT NULL
+    )""",
+    "CREATE INDEX idx_backups_tabla_creado ON Backups (tabla, creado)",
+    "CREATE INDEX idx_historial_fecha ON Historial_Cargas (fecha)"
+]
+
+
+def _tipo(columna):
+    if columna == "numero":
+        return "INTEGER"
+    if columna.startswith("publicacion_"):
+        return "DATE"
+    return "TEXT"
+
+
+def crear_base(ruta):
+    """Base vacía con las tablas de consulta (misma estructura que tras las migraciones)"""
+    db = sqlite3.connect(ruta)
+    db.execute("PRAGMA journal_mode=WAL")
+    for tabla in TABLAS_CONSULTA:
+        columnas = list(dict.fromkeys(MAPEOS[tabla].values()))
+        definicion = ", ".join(f"{c} {_tipo(c)}" for c in columnas)
+        db.execute(f"""
+            CREATE TABLE {tabla} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {definicion},
+                nombre_busqueda TEXT,
+                fecha_actualizacion TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                hash_fila TEXT
+            )
+        """)
+        db.execute(f"CREATE INDEX idx_{tabla}_rfc ON {tabla} (rfc)")
+        db.execute(f"CREATE INDEX idx_{tabla}_numero ON {tabla} (numero)")
+        db.execute(f"CREATE INDEX idx_{tabla}_rfc_hash ON {tabla} (rfc, hash_fila)")
+    for sql in TABLAS_AUXILIARES:
+        db.execute(sql)
+    db.execute("INSERT INTO Version_Datos (id, version, actualizado) VALUES (1, 1, CURRENT_TIMESTAMP)")
+    db.commit()
+    db.close()
+
+# ---------------------------------------------------------
+# Traducción de SQL
+# ---------------------------------------------------------
+
+PATRON_DESCRIBE = re.compile(r"^(?:DESCRIBE|SHOW COLUMNS FROM)\s+(\w+)(?:\s+LIKE\s+'([^']*)')?$", re.I)
+PATRON_LIKE = re.compile(r"^CREATE TABLE\s+(\w+)\s+LIKE\s+(\w+)$", re.I)
+PATRON_RENAME = re.compile(r"^RENAME TABLE\s+(.+)$", re.I | re.S)
+
+_contador_indices = iter(range(1, 10 ** 9))
+_lock_indices = threading.Lock()
+
+
+PATRON_UPDATE_JOIN = re.compile(
+    r"^\s*UPDATE\s+(\w+)\s+(\w+)\s+JOIN\s+(\w+)\s+(\w+)\s+ON\s+(.+?)\s+SET\s+(.+?)(?:\s+WHERE\s+(.+?))?\s*$",
+    re.I | re.S
+)
+PATRON_DELETE_JOIN = re.compile(r"^\s*DELETE\s+(\w+)\s+FROM\s+(\w+)\s+(\w+)\s+(JOIN\s+.+?)\s*$", re.I | re.S)
+
+
+def _update_join(coincidencia):
+    """UPDATE a x JOIN b y ON ... SET x.c = ... → UPDATE a AS x SET c = ... FROM b AS y WHERE ..."""
+    tabla, alias, otra, otro_alias, union, asignaciones, where = coincidencia.groups()
+    asignaciones = re.sub(rf"\b{alias}\.(\w+)\s*=", r"\1 =", asignaciones)
+    condicion = f"({union})" + (f" AND ({where})" if where else "")
+    return f"UPDATE {tabla} AS {alias} SET {asignaciones} FROM {otra} AS {otro_alias} WHERE {condicion}"
+
+
+def _delete_join(coincidencia):
+    """DELETE x FROM a x JOIN ... → DELETE FROM a WHERE rowid IN (SELECT x.rowid FROM a x JOIN ...)"""
+    alias, tabla, alias_tabla, resto = coincidencia.groups()
+    return f"DELETE FROM {tabla} WHERE rowid IN (SELECT {alias}.rowid FROM {tabla} {alias_tabla} {resto})"
+
+
+def traducir(sql):
+    sql = sql.replace("%s", "?")
+    sql = PATRON_UPDATE_JOIN.sub(_update_join, sql)
+    sql = PATRON_DELETE_JOIN.sub(_delete_join, sql)
+    sql = sql.replace("<=>", " IS ")
+    sql = re.sub(r"\bDROP TEMPORARY TABLE\b", "DROP TABLE", sql, flags=re.I)
+    sql = re.sub(r"\bINSERT IGNORE\b", "INSERT OR IGNORE", sql, flags=re.I)
+    return re.sub(r"\bON DUPLICATE KEY UPDATE\b", "ON CONFLICT DO UPDATE SET", sql, flags=re.I)
+
+
+def _md5(valor):
+    return None if valor is None else hashlib.md5(str(valor).encode("utf-8")).hexdigest()
+
+
+def _concat_ws(separador, *valores):
+    return separador.join(str(v) for v in valores if v is not None)
+
+
+def _regexp(patron, valor):
+    return valor is not None and re.search(patron, str(valor)) is not None
+
+
+PATRON_FECHA = re.compile(r"^\d{4}-\d{2}-\d{2}(?:[ T]\d{2}:\d{2}:\d{2}(?:\.\d{1,6})?)?$")
+
+
+def _fecha(valor):
+    """Las fechas (DATE, DATETIME con o sin microsegundos) vuelven como date/datetime, igual que con mysql-connector"""
+    if isinstance(valor, str) and PATRON_FECHA.match(valor):
+        try:
+            return date.fromisoformat(valor) if len(valor) == 10 else datetime.fromisoformat(valor)
+        except ValueError:
+            pass
+    return valor
+
+# ---------------------------------------------------------
+# Cursor y conexión
+# ---------------------------------------------------------
+
+class CursorSustituto:
+
+    motor = "sqlite"
+
+    def __init__(self, db, diccionario):
+        self._db = db
+        self._cursor = db.cursor()
+        self._diccionario = diccionario
+        self._filas = None
+        self._nombres = None
+        self.rowcount = -1
+        self.lastrowid = None
+
+    def execute(self, sql, parametros=()):
+        texto = " ".join(sql.split())
+        self._filas = None
+
+        describe = PATRON_DESCRIBE.match(texto)
+        if describe:
+            return self._describir(describe[1], describe[2])
+        if texto.upper().startswith("SHOW "):
+            raise sqlite3.OperationalError(f"No soportado por la base local: {texto[:40]}")
+        like = PATRON_LIKE.match(texto)
+        if like:
+            return self._copiar_estructura(like[1], like[2])
+        rename = PATRON_RENAME.match(texto)
+        if rename:
+            for par in rename[1].split(","):
+                origen, destino = re.split(r"\s+TO\s+", par.strip(), flags=re.I)
+                self._cursor.execute(f"ALTER TABLE {origen} RENAME TO {destino}")
+            return
+
+        self._cursor.execute(traducir(sql), tuple(parametros or ()))
+        self._nombres = [d[0] for d in self._cursor.description] if self._cursor.description else None
+        self.rowcount = self._cursor.rowcount
+        self.lastrowid = self._cursor.lastrowid
+
+    def executemany(self, sql, filas):
+        self._filas = None
+        self._cursor.executemany(traducir(sql), filas)
+        self.rowcount = self._cursor.rowcount
+
+    def _describir(self, tabla, filtro):
+        columnas = self._db.execute(f"PRAGMA table_info({tabla})").fetchall()
+        if not columnas:
+            raise sqlite3.OperationalError(f"La tabla {tabla} no existe")
+        self._nombres = ["Field", "Type", "Null", "Key", "Default", "Extra"]
+        self._filas = [
+            (nombre, tipo, "NO" if no_nulo or pk else "YES", "PRI" if pk else "", defecto,
+             "auto_increment" if pk and tipo.upper() == "INTEGER" else "")
+            for _, nombre, tipo, no_nulo, defecto, pk in columnas
+            if filtro is None or nombre == filtro
+        ]
+        self.rowcount = len(self._filas)
+
+    def _copiar_estructura(self, nueva, existente):
+        """CREATE TABLE ... LIKE: misma definición e índices con nombres nuevos"""
+        definiciones = self._db.execute(
+            "SELECT type, sql FROM sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL", (existente,)
+        ).fetchall()
+        if not definiciones:
+            raise sqlite3.OperationalError(f"La tabla {existente} no existe")
+        for tipo, sql in sorted(definiciones, key=lambda d: d[0] != "table"):
+            if tipo == "table":
+                sql = re.sub(r"^CREATE TABLE\s+\"?\w+\"?", f"CREATE TABLE {nueva}", sql)
+            else:
+                with _lock_indices:
+                    numero = next(_contador_indices)
+                sql = re.sub(
+                    r"^CREATE INDEX\s+\"?\w+\"?\s+ON\s+\"?\w+\"?",
+                    f"CREATE INDEX idx_{nueva}_{numero} ON {nueva}", sql
+                )
+            self._cursor.execute(sql)
+
+    def _fila(self, valores):
+        valores = [_fecha(v) for v in valores]
+        return dict(zip(self._nombres, valores)) if self._diccionario else tuple(valores)
+
+    def fetchone(self):
+        if self._filas is not None:
+            valores = self._filas.pop(0) if self._filas else None
+        else:
+            valores = self._cursor.fetchone()
+        return self._fila(valores) if valores is not None else None
+
+    def fetchmany(self, tamano):
+        if self._filas is not None:
+            valores, self._filas = self._filas[:tamano], self._filas[tamano:]
+        else:
+            valores = self._cursor.fetchmany(tamano)
+        return [self._fila(v) for v in valores]
+
+    def fetchall(self):
+        if self._filas is not None:
+            valores, self._filas = self._filas, []
+        else:
+            valores = self._cursor.fetchall()
+        return [self._fila(v) for v in valores]
+
+    def close(self):
+        self._cursor.close()
+
+
+class ConexionSustituta:
+    def __init__(self, ruta):
+        self._db = sqlite3.connect(ruta, timeout=60, check_same_thread=False)
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.create_function("NOW", 0, lambda: datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        self._db.create_function("MD5", 1, _md5, deterministic=True)
+        self._db.create_function("CONCAT_WS", -1, _concat_ws, deterministic=True)
+        self._db.create_function("REGEXP", 2, _regexp, deterministic=True)
+        self._db.create_function("DATABASE", 0, lambda: "main")
+
+    def cursor(self, dictionary=False):
+        return CursorSustituto(self._db, dictionary)
+
+    def commit(self):
+        self._db.commit()
+
+    def rollback(self):
+        self._db.rollback()
+
+    def close(self):
+        self._db.close()
+
+
+def pool_sustituto(ruta, tamano=None):
+    """Pool de db.py con conexiones a la base local"""
+    return PoolConexiones(
+        lambda: ConexionSustituta(ruta),
+        tamano=tamano or DB_POOL_CONFIG["tamano"],
+        pre_ping=False,
+        reciclar_segundos=0,
+        timeout_segundos=DB_POOL_CONFIG["timeout_segundos"]
+    )
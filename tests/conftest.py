@@ -0,0 +1,39 @@
+"""
+Las pruebas usan la base local de sustituto_db.py (SQLite con el mismo
+esquema), así que no necesitan un servidor MySQL. Cada prueba corre en su
+propia carpeta temporal: índices, backups y trabajos se escriben ahí.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+import cache_datos
+from config import SNAPSHOT_CONFIG
+from sustituto_db import crear_base, pool_sustituto
+
+
+@pytest.fixture(autouse=True)
+def carpeta(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    # El trabajo en segundo plano del snapshot seguiría corriendo después de la prueba
+    monkeypatch.setitem(SNAPSHOT_CONFIG, "reconstruir_en_carga", False)
+    cache_datos.limpiar_cache()
+    yield tmp_path
+    cache_datos.limpiar_cache()
+
+
+@pytest.fixture
+def base(carpeta):
+    """Ruta de una base vacía con el pool del proceso apuntando a ella"""
+    ruta = str(carpeta / "sat.db")
+    crear_base(ruta)
+    pool = pool_sustituto(ruta)
+    db.usar_pool(pool)
+    yield ruta
+    pool.cerrar()
+    db.usar_pool(None)
@@ -0,0 +1,101 @@
+import csv
+import time
+
+import pytest
+
+import db
+import datos_sinteticos
+from trabajos import obtener_trabajo
+
+
+def cargar(cliente, ruta, incremental=False):
+    datos = {"tabla": "definitivos"}
+    if incremental:
+        datos["incremental"] = "1"
+    with open(ruta, "rb") as f:
+        respuesta = cliente.post(
+            "/carga_csv", data={**datos, "archivo": (f, "Definitivos.csv")},
+            headers={"Accept": "application/json"}
+        )
+    assert respuesta.status_code == 202
+    id_trabajo = respuesta.get_json()["id"]
+    for _ in range(1000):
+        trabajo = obtener_trabajo(id_trabajo)
+        if trabajo["terminado"]:
+            break
+        time.sleep(0.02)
+    assert trabajo["estado"] == "terminado", trabajo["error"]
+    return trabajo
+
+
+def consultar(sql, parametros=()):
+    conn = db.obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute(sql, parametros)
+    filas = cursor.fetchall()
+    cursor.close()
+    conn.close()
+    return filas
+
+
+@pytest.fixture
+def cliente(base):
+    import app as aplicacion
+    return aplicacion.app.test_client()
+
+
+@pytest.fixture
+def archivos(carpeta):
+    """Definitivos.csv y una publicación siguiente con una baja, un cambio y un alta, renumerada"""
+    datos_sinteticos.generar(str(carpeta / "data"), escala=0.02)
+    original = carpeta / "data" / "Definitivos.csv"
+    with open(original, encoding="utf-8-sig", newline="") as f:
+        lineas = list(csv.reader(f))
+    encabezado, filas = lineas[:3], lineas[3:]
+
+    eliminada = filas.pop(0)
+    cambiada = filas[0]
+    cambiada[2] = cambiada[2] + " REFORMADA"
+    nueva = list(filas[-1])
+    nueva[1] = "NUE010101AB1"
+    filas.append(nueva)
+    for numero, fila in enumerate(filas, 1):
+        fila[0] = str(numero)
+
+    siguiente = carpeta / "Definitivos_siguiente.csv"
+    with open(siguiente, "w", encoding="utf-8-sig", newline="") as f:
+        csv.writer(f).writerows(encabezado + filas)
+    return original, siguiente, eliminada, cambiada, len(filas)
+
+
+def test_carga_completa_y_despues_incremental(cliente, archivos):
+    original, siguiente, eliminada, cambiada, total = archivos
+    cargar(cliente, original)
+    antes = consultar("SELECT COUNT(*) AS total FROM Definitivos")[0]["total"]
+
+    trabajo = cargar(cliente, siguiente, incremental=True)
+    progreso = trabajo["progreso"]
+    assert (progreso["altas"], progreso["cambios"], progreso["bajas"]) == (1, 1, 1)
+    assert progreso["sin_cambios"] == antes - 2
+    assert progreso["renumeradas"] > 0
+
+    assert consultar("SELECT COUNT(*) AS total FROM Definitivos")[0]["total"] == antes
+    assert not consultar("SELECT id FROM Definitivos WHERE rfc = %s", (eliminada[1],))
+    assert consultar("SELECT nombre_contribuyente FROM Definitivos WHERE rfc = %s", (cambiada[1],))[0][
+        "nombre_contribuyente"].endswith("REFORMADA")
+    assert consultar("SELECT numero FROM Definitivos WHERE rfc = %s", ("NUE010101AB1",))[0]["numero"] == total
+
+    # Solo se respaldan las dos filas que la carga incremental eliminó o reemplazó
+    respaldo = consultar("SELECT registros FROM Backups WHERE motivo = 'incremental_filas'")
+    assert [fila["registros"] for fila in respaldo] == [2]
+
+
+def test_backup_parcial_no_se_restaura(cliente, archivos):
+    original, siguiente = archivos[:2]
+    cargar(cliente, original)
+    cargar(cliente, siguiente, incremental=True)
+    id_backup = consultar("SELECT id FROM Backups WHERE motivo = 'incremental_filas'")[0]["id"]
+
+    from ingesta import procesar_restauracion
+    with pytest.raises(ValueError, match="carga incremental"):
+        procesar_restauracion(None, id_backup)
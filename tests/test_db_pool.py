@@ -0,0 +1,108 @@
+import time
+
+import pytest
+
+import db
+from db import PoolConexiones, PoolAgotado
+from sustituto_db import ConexionSustituta
+
+
+@pytest.fixture
+def crear_pool(base):
+    def crear(**opciones):
+        return PoolConexiones(lambda: ConexionSustituta(base), **{
+            "tamano": 2, "pre_ping": False, "reciclar_segundos": 0, "timeout_segundos": 1, **opciones
+        })
+    return crear
+
+
+def test_prestamo_y_devolucion_reutiliza_la_conexion(crear_pool):
+    pool = crear_pool()
+    conn = pool.obtener()
+    real = conn._conexion
+    assert pool.estadisticas()["en_uso"] == 1
+
+    conn.close()
+    stats = pool.estadisticas()
+    assert (stats["en_uso"], stats["inactivas"]) == (0, 1)
+
+    otra = pool.obtener()
+    assert otra._conexion is real
+    otra.close()
+    stats = pool.estadisticas()
+    assert (stats["creadas"], stats["prestamos"]) == (1, 2)
+
+
+def test_pool_agotado_al_vencer_la_espera(crear_pool):
+    pool = crear_pool(tamano=1, timeout_segundos=0.05)
+    conn = pool.obtener()
+    with pytest.raises(PoolAgotado):
+        pool.obtener()
+    stats = pool.estadisticas()
+    assert (stats["esperas"], stats["timeouts"]) == (1, 1)
+
+    conn.close()
+    pool.obtener().close()
+
+
+def test_recicla_conexiones_por_antiguedad(crear_pool):
+    pool = crear_pool(reciclar_segundos=0.01)
+    conn = pool.obtener()
+    real = conn._conexion
+    conn.close()
+    time.sleep(0.02)
+
+    otra = pool.obtener()
+    assert otra._conexion is not real
+    otra.close()
+    stats = pool.estadisticas()
+    assert (stats["recicladas"], stats["creadas"]) == (1, 2)
+
+
+def test_pre_ping_reemplaza_una_conexion_muerta(crear_pool):
+    pool = crear_pool(pre_ping=True)
+    conn = pool.obtener()
+    real = conn._conexion
+    conn.close()
+    real.close()
+
+    otra = pool.obtener()
+    assert otra._conexion is not real
+    cursor = otra.cursor()
+    cursor.execute("SELECT 1")
+    assert cursor.fetchall() == [(1,)]
+    cursor.close()
+    otra.close()
+    stats = pool.estadisticas()
+    assert (stats["descartadas"], stats["creadas"]) == (1, 2)
+
+
+def test_descartar_cierra_la_conexion_y_libera_el_cupo(crear_pool):
+    pool = crear_pool(tamano=1, timeout_segundos=0.05)
+    conn = pool.obtener()
+    conn.descartar()
+    stats = pool.estadisticas()
+    assert (stats["en_uso"], stats["inactivas"], stats["descartadas"]) == (0, 0, 1)
+
+    # El cupo quedó libre: se crea una conexión nueva sin esperar
+    pool.obtener().close()
+    assert pool.estadisticas()["creadas"] == 2
+
+
+def test_api_db_pool_expone_las_estadisticas(crear_pool, monkeypatch):
+    import app as aplicacion
+
+    pool = crear_pool()
+    db.usar_pool(pool)
+    pool.obtener().close()
+    monkeypatch.setattr(aplicacion, "ADMIN_TOKEN", "secreto")
+    cliente = aplicacion.app.test_client()
+
+    assert cliente.get("/api/db_pool").status_code == 403
+    respuesta = cliente.get("/api/db_pool", headers={"X-Admin-Token": "secreto"})
+    assert respuesta.status_code == 200
+    stats = respuesta.get_json()
+    assert stats["tamano"] == 2
+    assert stats["prestamos"] >= 1
+    assert {"en_uso", "inactivas", "timeouts", "recicladas", "descartadas",
+            "espera_promedio_ms", "espera_max_ms", "pid"} <= set(stats)
@@ -0,0 +1,88 @@
+import sqlite3
+import tracemalloc
+
+import pytest
+
+import db
+from exportacion import generar_csv
+
+
+def llenar(base, filas):
+    with sqlite3.connect(base) as sqlite:
+        sqlite.execute("DELETE FROM Definitivos")
+        sqlite.executemany(
+            "INSERT INTO Definitivos (numero, rfc, nombre_contribuyente, situacion_contribuyente) VALUES (?, ?, ?, ?)",
+            ((i, f"AAA{i:09d}", f"CONTRIBUYENTE NÚMERO {i} SA DE CV", "Definitivo") for i in range(1, filas + 1))
+        )
+
+
+def pico_descarga(consumir):
+    """Memoria pico (tracemalloc) mientras se consume la descarga, sin conservar los fragmentos"""
+    tracemalloc.start()
+    try:
+        total = consumir()
+        return tracemalloc.get_traced_memory()[1], total
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.fixture
+def cliente(base):
+    import app as aplicacion
+    return aplicacion.app.test_client()
+
+
+def test_generar_csv_no_crece_con_las_filas(base):
+    def exportar(filas):
+        llenar(base, filas)
+        conn = db.obtener_conexion()
+        cursor = conn.cursor()
+        cursor.execute("SELECT numero, rfc, nombre_contribuyente FROM Definitivos ORDER BY numero")
+
+        def consumir():
+            return sum(len(f) for f in generar_csv(cursor, ["numero", "rfc", "nombre_contribuyente"]))
+
+        try:
+            return pico_descarga(consumir)
+        finally:
+            cursor.close()
+            conn.close()
+
+    pico_chico, bytes_chico = exportar(2000)
+    pico_grande, bytes_grande = exportar(40000)
+    assert bytes_grande > 15 * bytes_chico
+    assert pico_grande < 2 * pico_chico, (pico_chico, pico_grande)
+
+
+def test_exportar_tabla_no_crece_con_las_filas(base, cliente):
+    def exportar(filas):
+        llenar(base, filas)
+
+        def consumir():
+            respuesta = cliente.get("/exportar/definitivos?gzip=1", buffered=False)
+            try:
+                return sum(len(f) for f in respuesta.response)
+            finally:
+                respuesta.close()
+
+        return pico_descarga(consumir)
+
+    exportar(10)  # columnas y versión en caché antes de medir
+    pico_chico, _ = exportar(2000)
+    pico_grande, _ = exportar(40000)
+    assert pico_grande < 2 * pico_chico, (pico_chico, pico_grande)
+
+
+def test_descarga_interrumpida_descarta_la_conexion(base, cliente):
+    llenar(base, 5000)
+    antes = db.estadisticas_pool()
+
+    respuesta = cliente.get("/exportar/definitivos", buffered=False)
+    fragmentos = iter(respuesta.response)
+    assert next(fragmentos).startswith(b"id,numero,rfc,")
+    next(fragmentos)
+    respuesta.close()
+
+    despues = db.estadisticas_pool()
+    assert despues["descartadas"] == antes["descartadas"] + 1
+    assert despues["en_uso"] == antes["en_uso"]
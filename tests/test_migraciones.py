@@ -0,0 +1,32 @@
+import sqlite3
+
+import db
+from migraciones import rellenar_nombre_busqueda
+
+
+def test_rellenar_nombre_busqueda_por_bloques(base):
+    with sqlite3.connect(base) as sqlite:
+        sqlite.executemany(
+            "INSERT INTO Definitivos (numero, rfc, nombre_contribuyente, nombre_busqueda) VALUES (?, ?, ?, ?)",
+            [
+                (1, "AAA010101AA1", "PEÑA Y ASOCIADOS", None),
+                (2, "AAA010101AA2", None, None),
+                (3, "AAA010101AA3", "COMERCIALIZADORA MÉXICO", "YA PLEGADO"),
+                *((i, f"AAA{i:09d}", f"EMPRESA {i} ÁGIL", None) for i in range(4, 26))
+            ]
+        )
+
+    conn = db.obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    assert rellenar_nombre_busqueda(cursor, "Definitivos", tamano=4) == 23
+    conn.commit()
+
+    cursor.execute("SELECT numero, nombre_busqueda FROM Definitivos ORDER BY numero")
+    nombres = {fila["numero"]: fila["nombre_busqueda"] for fila in cursor.fetchall()}
+    cursor.close()
+    conn.close()
+
+    assert nombres[1] == "PENA Y ASOCIADOS"
+    assert nombres[2] is None
+    assert nombres[3] == "YA PLEGADO"
+    assert nombres[25] == "EMPRESA 25 AGIL"
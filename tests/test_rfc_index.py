@@ -0,0 +1,52 @@
+import os
+import sqlite3
+
+import pytest
+
+import db
+import rfc_index
+from cache_datos import incrementar_version, olvidar_estampa
+from config import RFC_INDEX_CONFIG
+from screening import consultar_indice
+
+
+@pytest.fixture
+def indice(base, monkeypatch):
+    monkeypatch.setitem(RFC_INDEX_CONFIG, "habilitado", True)
+    with sqlite3.connect(base) as sqlite:
+        sqlite.execute("INSERT INTO Definitivos (numero, rfc, nombre_contribuyente) VALUES (1, 'AAA010101AAA', 'UNO')")
+    conn = db.obtener_conexion()
+    cursor = conn.cursor(dictionary=True)
+    rfc_index.reconstruir_si_habilitado(cursor)
+    yield conn, cursor
+    cursor.close()
+    conn.close()
+
+
+def test_indice_vigente_resuelve_sin_mysql(indice):
+    assert rfc_index.indice_rfc.disponible()
+    assert consultar_indice(["AAA010101AAA", "ZZZ010101ZZZ"]) == {
+        "AAA010101AAA": ["Definitivos"],
+        "ZZZ010101ZZZ": []
+    }
+
+
+def test_indice_anterior_a_los_datos_no_se_usa(indice):
+    conn, cursor = indice
+    incrementar_version(cursor)
+    conn.commit()
+    olvidar_estampa()
+    assert consultar_indice(["AAA010101AAA"]) is None
+
+
+def test_reconstruccion_fallida_retira_el_indice(indice, monkeypatch):
+    conn, cursor = indice
+
+    def fallar(cursor):
+        raise RuntimeError("disco lleno")
+
+    monkeypatch.setattr(rfc_index, "construir_indice", fallar)
+    assert rfc_index.reconstruir_si_habilitado(cursor) is None
+    assert not os.path.exists(RFC_INDEX_CONFIG["ruta"])
+    assert not rfc_index.indice_rfc.disponible()
+    assert consultar_indice(["AAA010101AAA"]) is None
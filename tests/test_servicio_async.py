@@ -0,0 +1,47 @@
+import asyncio
+import threading
+
+import servicio_async
+
+
+def pedir(metodo, ruta):
+    mensajes = []
+
+    async def receive():
+        return {"type": "http.request", "body": b""}
+
+    async def send(mensaje):
+        mensajes.append(mensaje)
+
+    scope = {"type": "http", "method": metodo, "path": ruta, "query_string": b""}
+    asyncio.run(servicio_async.app(scope, receive, send))
+    inicio, cuerpo = mensajes
+    return inicio["status"], dict(inicio["headers"]), cuerpo["body"]
+
+
+def test_head_sin_cuerpo_con_los_mismos_encabezados():
+    estado, encabezados, cuerpo = pedir("GET", "/salud")
+    assert (estado, cuerpo) == (200, b'{"estado": "ok"}')
+
+    estado, encabezados_head, cuerpo = pedir("HEAD", "/salud")
+    assert (estado, cuerpo) == (200, b"")
+    assert encabezados_head == encabezados
+    assert encabezados_head[b"content-length"] == str(len(b'{"estado": "ok"}')).encode()
+
+
+def test_indice_de_rfcs_se_consulta_fuera_del_ciclo_de_eventos(monkeypatch):
+    hilos = []
+
+    def consultar_indice(rfcs, version):
+        hilos.append(threading.get_ident())
+        return {rfc: [] for rfc in rfcs}
+
+    async def version_datos():
+        return 1
+
+    monkeypatch.setattr(servicio_async, "consultar_indice", consultar_indice)
+    monkeypatch.setattr(servicio_async, "version_datos", version_datos)
+
+    estado, _, cuerpo = pedir("GET", "/api/contribuyente/AAA010101AAA")
+    assert (estado, cuerpo) == (200, b"[]")
+    assert hilos and hilos[0] != threading.get_ident()
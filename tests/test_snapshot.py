@@ -0,0 +1,33 @@
+import sqlite3
+import time
+
+from config import SNAPSHOT_CONFIG
+from snapshot import programar_snapshot_si_habilitado, leer_puntero
+from trabajos import obtener_trabajo
+
+
+def esperar(id_trabajo):
+    for _ in range(500):
+        trabajo = obtener_trabajo(id_trabajo)
+        if trabajo["terminado"]:
+            return trabajo
+        time.sleep(0.02)
+    raise AssertionError(f"El trabajo {id_trabajo} no terminó")
+
+
+def test_la_carga_encola_el_snapshot_en_segundo_plano(base, monkeypatch):
+    assert programar_snapshot_si_habilitado() is None
+
+    monkeypatch.setitem(SNAPSHOT_CONFIG, "reconstruir_en_carga", True)
+    with sqlite3.connect(base) as sqlite:
+        sqlite.execute("INSERT INTO Definitivos (numero, rfc) VALUES (1, 'AAA010101AAA')")
+
+    trabajo = esperar(programar_snapshot_si_habilitado())
+    assert trabajo["estado"] == "terminado", trabajo["error"]
+    puntero = leer_puntero()
+    assert (puntero["origen"], puntero["version_datos"], puntero["tablas"]["Definitivos"]) == ("mysql", 1, 1)
+
+    # Con los mismos datos, un segundo trabajo no vuelve a generarlo
+    trabajo = esperar(programar_snapshot_si_habilitado())
+    assert trabajo["estado"] == "terminado"
+    assert leer_puntero()["version"] == puntero["version"]
@@ -0,0 +1,45 @@
+import sqlite3
+
+import pytest
+
+import cache_datos
+from consultas import MAX_PAGINA_OFFSET
+
+
+@pytest.fixture
+def cliente(base):
+    with sqlite3.connect(base) as sqlite:
+        sqlite.executemany(
+            "INSERT INTO Definitivos (numero, rfc, situacion_contribuyente) VALUES (?, ?, ?)",
+            ((i, f"AAA{i:09d}", "Definitivo" if i % 2 else "Sentencia Favorable") for i in range(1, 301))
+        )
+    import app as aplicacion
+    return aplicacion.app.test_client()
+
+
+def claves_total():
+    return sorted(str(clave) for clave in cache_datos._cache if clave[0] == "total")
+
+
+def test_solo_se_guardan_conteos_de_valores_conocidos(cliente):
+    assert cliente.get("/tabla/definitivos").status_code == 200
+    assert cliente.get("/tabla/definitivos?situacion=Definitivo").status_code == 200
+    for i in range(5):
+        assert cliente.get(f"/tabla/definitivos?situacion=inventada{i}").status_code == 200
+    assert cliente.get("/tabla/definitivos?desde=2020-01-01").status_code == 200
+
+    assert claves_total() == [
+        str(("total", "Definitivos", "Definitivo")),
+        str(("total", "Definitivos", None))
+    ]
+
+
+def test_paginas_por_offset_tienen_limite(cliente):
+    assert cliente.get("/tabla/definitivos?page=2").status_code == 200
+
+    respuesta = cliente.get(f"/tabla/definitivos?page={MAX_PAGINA_OFFSET + 1}&situacion=Definitivo")
+    assert respuesta.status_code == 302
+    assert respuesta.headers["Location"].endswith("/tabla/definitivos?situacion=Definitivo")
+
+    # Los enlaces de la página usan la llave (numero), que no tiene límite
+    assert cliente.get(f"/tabla/definitivos?despues=250&page={MAX_PAGINA_OFFSET + 5}").status_code == 200
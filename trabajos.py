@@ -0,0 +1,268 @@
+"""
+Trabajos en segundo plano (cargas CSV y consultas masivas)
+Las rutas guardan el archivo subido, registran el trabajo y responden de
+inmediato con su id; un pool de hilos del proceso lo ejecuta. El estado y
+el progreso se guardan en una base SQLite compartida por todos los workers,
+así que /jobs/<id> responde desde cualquiera de ellos.
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import threading
+import traceback
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from config import TRABAJOS_CONFIG
+from metricas import iniciar_contexto, terminar_contexto, observar
+
+ESTADOS_FINALES = ("terminado", "error")
+
+# ---------------------------------------------------------
+# Almacenamiento (SQLite)
+# ---------------------------------------------------------
+
+def _ruta_db():
+    return os.path.join(TRABAJOS_CONFIG["carpeta"], "trabajos.db")
+
+
+def _conectar():
+    os.makedirs(TRABAJOS_CONFIG["carpeta"], exist_ok=True)
+    db = sqlite3.connect(_ruta_db(), timeout=30)
+    db.row_factory = sqlite3.Row
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("""
+        CREATE TABLE IF NOT EXISTS trabajos (
+            id TEXT PRIMARY KEY,
+            tipo TEXT NOT NULL,
+            estado TEXT NOT NULL,
+            progreso TEXT NOT NULL DEFAULT '{}',
+            mensajes TEXT NOT NULL DEFAULT '[]',
+            resultado TEXT,
+            nombre_resultado TEXT,
+            error TEXT,
+            pid INTEGER,
+            creado TEXT NOT NULL,
+            actualizado TEXT NOT NULL
+        )
+    """)
+    return db
+
+
+def _actualizar(id_trabajo, **campos):
+    campos["actualizado"] = datetime.now().isoformat(timespec="seconds")
+    asignaciones = ", ".join(f"{c} = ?" for c in campos)
+    db = _conectar()
+    try:
+        with db:
+            db.execute(f"UPDATE trabajos SET {asignaciones} WHERE id = ?", (*campos.values(), id_trabajo))
+    finally:
+        db.close()
+
+
+def carpeta_trabajo(id_trabajo):
+    carpeta = os.path.join(TRABAJOS_CONFIG["carpeta"], id_trabajo)
+    os.makedirs(carpeta, exist_ok=True)
+    return carpeta
+
+
+def _proceso_vivo(pid):
+    try:
+        os.kill(pid, 0)
+        return True
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+
+
+def obtener_trabajo(id_trabajo):
+    """Estado actual como dict; None si no existe"""
+    db = _conectar()
+    try:
+        fila = db.execute("SELECT * FROM trabajos WHERE id = ?", (id_trabajo,)).fetchone()
+    finally:
+        db.close()
+    if fila is None:
+        return None
+
+    trabajo = dict(fila)
+    trabajo["progreso"] = json.loads(trabajo["progreso"])
+    trabajo["mensajes"] = json.loads(trabajo["mensajes"])
+
+    # El worker que lo ejecutaba terminó (reinicio, timeout) sin cerrarlo
+    if trabajo["estado"] not in ESTADOS_FINALES and trabajo["pid"] and not _proceso_vivo(trabajo["pid"]):
+        trabajo["estado"] = "error"
+        trabajo["error"] = "El proceso que ejecutaba el trabajo se detuvo"
+        _actualizar(id_trabajo, estado="error", error=trabajo["error"])
+
+    trabajo["terminado"] = trabajo["estado"] in ESTADOS_FINALES
+    trabajo.pop("resultado", None)  # ruta interna; se descarga con /jobs/<id>/resultado
+    return trabajo
+
+
+def ruta_resultado(id_trabajo):
+    """(ruta, nombre de descarga) del archivo de resultado, o (None, None)"""
+    db = _conectar()
+    try:
+        fila = db.execute(
+            "SELECT resultado, nombre_resultado FROM trabajos WHERE id = ? AND estado = 'terminado'",
+            (id_trabajo,)
+        ).fetchone()
+    finally:
+        db.close()
+    if not fila or not fila["resultado"] or not os.path.exists(fila["resultado"]):
+        return None, None
+    return fila["resultado"], fila["nombre_resultado"]
+
+
+def limpiar_trabajos():
+    """Elimina trabajos terminados (y sus archivos) más antiguos que la retención"""
+    limite = (datetime.now() - timedelta(hours=TRABAJOS_CONFIG["retencion_horas"])).isoformat(timespec="seconds")
+    db = _conectar()
+    try:
+        with db:
+            viejos = [f["id"] for f in db.execute(
+                "SELECT id FROM trabajos WHERE actualizado < ? AND estado IN ('terminado', 'error')", (limite,)
+            )]
+            db.executemany("DELETE FROM trabajos WHERE id = ?", [(i,) for i in viejos])
+    finally:
+        db.close()
+    for id_trabajo in viejos:
+        shutil.rmtree(os.path.join(TRABAJOS_CONFIG["carpeta"], id_trabajo), ignore_errors=True)
+
+# ---------------------------------------------------------
+# Contexto que recibe cada trabajo
+# ---------------------------------------------------------
+
+class Trabajo:
+    """Progreso, avisos y archivos del trabajo en ejecución"""
+
+    def __init__(self, id_trabajo):
+        self.id = id_trabajo
+        self.progreso = {}
+        self.mensajes = []
+        self._ultimo_guardado = 0.0
+
+    def avanzar(self, forzar=False, **contadores):
+        """Actualiza contadores (valores absolutos); se guarda como máximo cada 'intervalo_progreso'"""
+        self.progreso.update(contadores)
+        ahora = time.monotonic()
+        if forzar or ahora - self._ultimo_guardado >= TRABAJOS_CONFIG["intervalo_progreso"]:
+            self._ultimo_guardado = ahora
+            _actualizar(self.id, progreso=json.dumps(self.progreso))
+
+    def aviso(self, categoria, texto):
+        self.mensajes.append([categoria, texto])
+        _actualizar(self.id, mensajes=json.dumps(self.mensajes))
+
+    def ruta(self, nombre):
+        return os.path.join(carpeta_trabajo(self.id), nombre)
+
+# ---------------------------------------------------------
+# Ejecución
+# ---------------------------------------------------------
+
+_ejecutor = None
+_ejecutor_pid = None
+_ejecutor_lock = threading.Lock()
+
+
+def _obtener_ejecutor():
+    """Pool de hilos por proceso; se recrea si el proceso fue bifurcado (fork)"""
+    global _ejecutor, _ejecutor_pid
+    if _ejecutor is None or _ejecutor_pid != os.getpid():
+        with _ejecutor_lock:
+            if _ejecutor is None or _ejecutor_pid != os.getpid():
+                _ejecutor = ThreadPoolExecutor(max_workers=TRABAJOS_CONFIG["hilos"], thread_name_prefix="trabajo")
+                _ejecutor_pid = os.getpid()
+    return _ejecutor
+
+
+def _ejecutar(trabajo, tipo, funcion, args):
+    _actualizar(trabajo.id, estado="en_proceso", pid=os.getpid())
+    iniciar_contexto(f"trabajo:{tipo}")
+    inicio = time.perf_counter()
+    estado = "terminado"
+    try:
+        resultado = funcion(trabajo, *args) or {}
+        trabajo.avanzar(forzar=True)
+        _actualizar(
+            trabajo.id,
+            estado="terminado",
+            resultado=resultado.get("ruta"),
+            nombre_resultado=resultado.get("nombre")
+        )
+    except Exception as e:
+        estado = "error"
+        traceback.print_exc()
+        trabajo.avanzar(forzar=True)
+        _actualizar(trabajo.id, estado="error", error=str(e))
+    finally:
+        terminar_contexto()
+        observar("sat_trabajo_duracion_segundos", time.perf_counter() - inicio, tipo=tipo, estado=estado)
+
+
+def crear_trabajo(tipo, funcion, *args, entrada=None):
+    """
+    Registra el trabajo y lo encola. 'funcion(trabajo, *args)' puede devolver
+    {'ruta': archivo de resultado, 'nombre': nombre de descarga}.
+    'entrada' (archivo subido con .save) se guarda en la carpeta del trabajo
+    y su ruta se pasa como primer argumento.
+    """
+    limpiar_trabajos()
+
+    id_trabajo = uuid.uuid4().hex
+    ahora = datetime.now().isoformat(timespec="seconds")
+    db = _conectar()
+    try:
+        with db:
+            db.execute(
+                "INSERT INTO trabajos (id, tipo, estado, creado, actualizado) VALUES (?, ?, 'pendiente', ?, ?)",
+                (id_trabajo, tipo, ahora, ahora)
+            )
+    finally:
+        db.close()
+
+    trabajo = Trabajo(id_trabajo)
+    if entrada is not None:
+        ruta = trabajo.ruta("entrada")
+        entrada.save(ruta)
+        args = (ruta,) + args
+
+    _obtener_ejecutor().submit(_ejecutar, trabajo, tipo, funcion, args)
+    return id_trabajo
+
+
+def eventos_trabajo(id_trabajo, intervalo=0.5, limite_segundos=None):
+    """
+    Genera mensajes server-sent events con el estado hasta que el trabajo
+    termina. Cada conexión dura como máximo 'sse_segundos' para no ocupar un
+    worker; EventSource se reconecta solo y recibe el estado actual.
+    """
+    limite_segundos = limite_segundos or TRABAJOS_CONFIG["sse_segundos"]
+    yield "retry: 1000\n\n"
+    anterior = None
+    inicio = ultimo_envio = time.monotonic()
+    while time.monotonic() - inicio < limite_segundos:
+        trabajo = obtener_trabajo(id_trabajo)
+        if trabajo is None:
+            yield "event: error\ndata: {\"error\": \"Trabajo no encontrado\"}\n\n"
+            return
+
+        datos = json.dumps(trabajo, ensure_ascii=False)
+        if datos != anterior:
+            anterior = datos
+            ultimo_envio = time.monotonic()
+            yield f"data: {datos}\n\n"
+        elif time.monotonic() - ultimo_envio >= 15:
+            ultimo_envio = time.monotonic()
+            yield ": sin cambios\n\n"  # mantiene viva la conexión con proxies
+
+        if trabajo["terminado"]:
+            return
+        time.sleep(intervalo)